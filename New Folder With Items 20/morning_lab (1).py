@@ -72,6 +72,14 @@ def test_time(hour, minute=0):
     dt = datetime.now().replace(hour=hour, minute=minute, second=0)
     _apply_freeze_datetime(dt)
 
+@service
+def hc_set_clock_speed(speed=60):
+    # Simulated seconds per real second for the home controller clock (0 = frozen);
+    # applying a time or advance_sim_time re-anchors the running clock
+    service.call("input_number", "set_value",
+                 entity_id="input_number.hc_clock_speed", value=speed)
+    log.info(f"[ML] Clock speed {speed}x")
+
 @service
 def hc_back_to_normal():
     service.call("input_boolean", "turn_off", entity_id="input_boolean.time_freeze_active")
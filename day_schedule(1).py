@@ -1,20 +1,25 @@
-
 """
 day_schedule.py — publishes today's sunrise/sunset as local ISO strings
 Used by home_controller.py for Evening window & Day gates.
+
+Times come from a local solar ephemeris (modules/solar_ephemeris.py) for the
+home's lat/lon, computed once per day, so sun.sun attribute churn no longer
+republishes the helpers (and re-runs the controller's daily constants).
 """
 
-from datetime import datetime, timedelta
+from datetime import datetime
+
+import solar_ephemeris
+
+# Leave as None to use zone.home's coordinates
+LATITUDE = None
+LONGITUDE = None
+
+_location_cache = None
 
 def _now_local():
     return datetime.now().astimezone()
 
-def _parse_aware(s):
-    try:
-        return datetime.fromisoformat(str(s))
-    except Exception:
-        return None
-
 def _to_local_iso(dt):
     if dt is None:
         return ""
@@ -23,44 +28,48 @@ def _to_local_iso(dt):
     except Exception:
         return ""
 
-def _compute_today_events():
-    """Derive sunrise_today & sunset_today from sun.sun's next events.
-       If we're past an event, subtract 1 day from the next event to approximate today's timestamp.
-       (Accuracy is within ~1–2 minutes, which is fine for a 15-minute window.)
-    """
-    now = _now_local()
-    next_rising  = _parse_aware(state.getattr("sun.sun").get("next_rising"))
-    next_setting = _parse_aware(state.getattr("sun.sun").get("next_setting"))
-
-    sunrise_today = None
-    sunset_today  = None
-
-    if next_rising:
-        if next_rising.astimezone(now.tzinfo).date() == now.date():
-            sunrise_today = next_rising
-        else:
-            # Past today's sunrise → approximate by subtracting 1 day
-            sunrise_today = next_rising - timedelta(days=1)
-
-    if next_setting:
-        if next_setting.astimezone(now.tzinfo).date() == now.date():
-            sunset_today = next_setting
+def _location():
+    """(lat, lon) from the constants above, else zone.home; cached once found"""
+    global _location_cache
+    if _location_cache is None:
+        if LATITUDE is not None and LONGITUDE is not None:
+            _location_cache = (float(LATITUDE), float(LONGITUDE))
         else:
-            # Past today's sunset → approximate by subtracting 1 day
-            sunset_today = next_setting - timedelta(days=1)
+            try:
+                home = state.getattr("zone.home") or {}
+                _location_cache = (float(home["latitude"]), float(home["longitude"]))
+            except Exception:
+                log.warning("[DS] zone.home has no latitude/longitude; set LATITUDE/LONGITUDE")
+                return None
+    return _location_cache
 
-    return _to_local_iso(sunrise_today), _to_local_iso(sunset_today)
+def _compute_today_events():
+    """Today's sunrise/sunset/solar noon from the ephemeris (None when location is unknown)"""
+    location = _location()
+    if location is None:
+        return None
+    now = _now_local()
+    return solar_ephemeris.sun_events(now.date(), location[0], location[1], now.tzinfo)
 
 def _publish():
-    sunrise_iso, sunset_iso = _compute_today_events()
-    state.set("pyscript.sunrise_today", sunrise_iso, {
+    events = _compute_today_events() or {}
+    state.set("pyscript.sunrise_today", _to_local_iso(events.get("sunrise")), {
         "friendly_name": "Sunrise (today, local ISO)",
         "icon": "mdi:weather-sunset-up"
     })
-    state.set("pyscript.sunset_today", sunset_iso, {
+    state.set("pyscript.sunset_today", _to_local_iso(events.get("sunset")), {
         "friendly_name": "Sunset (today, local ISO)",
         "icon": "mdi:weather-sunset-down"
     })
+    location = _location() or (None, None)
+    state.set("sensor.solar_ephemeris", _now_local().date().isoformat(), {
+        "friendly_name": "Solar Ephemeris (today)",
+        "icon": "mdi:sun-compass",
+        "latitude": location[0],
+        "longitude": location[1],
+        "solar_noon": _to_local_iso(events.get("solar_noon")),
+        "max_elevation": round(events["max_elevation"], 2) if events else None,
+    })
     state.set("sensor.day_schedule_last_update", _now_local().replace(microsecond=0).isoformat(), {
         "friendly_name": "Day Schedule Last Update",
         "icon": "mdi:clock-check"
@@ -71,11 +80,20 @@ def _on_startup():
     _publish()
 
 # Update shortly after midnight so values point to the new day
-@time_trigger("cron(0 1 0 * * *)")  # 00:01 local
+@time_trigger("cron(1 0 * * *)")  # 00:01 local
 def _after_midnight():
     _publish()
 
-# Also refresh when the sun entity changes significantly (rare, but safe)
-@state_trigger("sun.sun")
-def _on_sun_change(value=None):
-    _publish()
+@service("pyscript.solar_elevation", supports_response="optional")
+def solar_elevation(when=None):
+    """Sun elevation (deg) at `when` (ISO, default now) computed locally"""
+    location = _location()
+    if location is None:
+        return {"error": "location unknown"}
+    at = datetime.fromisoformat(str(when)) if when else _now_local()
+    if at.tzinfo is None:
+        at = at.astimezone()
+    return {
+        "at": at.replace(microsecond=0).isoformat(),
+        "elevation": round(solar_ephemeris.solar_elevation(at, location[0], location[1]), 3),
+    }
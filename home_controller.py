@@ -5,11 +5,25 @@ Every SET IN STONE requirement from REWORK is implemented exactly
 
 from datetime import datetime, date, time as dt_time, timedelta
 import asyncio
-import threading
+import contextvars
+from collections import deque
+import heapq
+import importlib.util
+from bisect import bisect_left
+from array import array
+import mmap
+import os
+import struct
+import sys
 import traceback
 import json
+import sqlite3
+import re
+from time import monotonic, perf_counter
 from typing import Optional
 
+import solar_ephemeris
+
 # ============================================================================
 # CONFIGURATION - SET IN STONE PER REWORK SPEC
 # ============================================================================
@@ -73,32 +87,127 @@ NOTIFY_TARGETS = [
 # Global state tracking
 _morning_motion_classified_date = None
 _morning_motion_profile = None
-_work_ramp_task = None
-_nonwork_ramp_task = None
 _bedroom_tv_task = None
-_evening_brightness_ramp_task = None
 _waiting_timeout_task = None
-_classification_lock = threading.Lock()
+_ramp_specs: dict = {}        # name → active ramp spec (see _ramp_engine_start)
+_ramp_heap: list = []         # (wake, seq, name); entries whose seq moved on are stale
+_ramp_seq = 0
+_ramp_supervisor_task = None
+_ramp_wakeup = None
+_transition_timer_task = None
+_transition_timer_at = None   # (wake datetime, reason) the timer is armed for
+_elevation_samples: list = [] # last two (time, elevation) readings from sun.sun
+_clock_cache: dict = {}       # simulation anchor; empty until _clock_load()
+_boolean_registry: dict = {}  # flag suffix → (entity_id, writer); see _resolve_boolean_entity
+_light_dispatch_last: dict = {}  # summary of the most recent bulk light command
+_on_light_index: dict = {}    # light entity → tags, for lights currently "on"
+_on_light_index_ready = False
+_mqtt_outbox: dict = {}       # topic → payload (or builder) awaiting the next flush
+_mqtt_outbox_task = None
+_mqtt_snapshot_dirty = False
+_retained_snapshot: dict = {} # last controller snapshot seen on the broker
+_startup_awaiting_snapshot = False  # startup ran before today's retained snapshot arrived
+_error_groups: dict = {}      # (function, type, normalized message) → counts/notify state
+_error_summary_task = None
+_error_group_seq = 0          # numbers the per-group notification ids
+_perf_enabled = False         # per-function timing in the catch_hc_* decorators
+_perf_stats: dict = {}        # wrapped name → {"calls", "total", "max", "buckets"}
+_memo_cache: dict = {}        # memo name → {(date, input values): result}
+_memo_stats: dict = {}        # memo name → {"hits", "misses"}
+_journal_pending: list = []   # journal rows not yet written to SQLite
+_journal_flush_task = None
+_journal_seq = 0
+_journal_triggers = 0         # trigger invocations so far (numbers the causal ids)
+# "<trigger>#<n>" of the trigger running in this task; a ContextVar so interleaved
+# trigger tasks never see each other's id (and tasks they spawn inherit it)
+_journal_cause = contextvars.ContextVar("hc_journal_cause", default=None)
+_journal_anchor: list = []    # [controller time, monotonic] of the last timed event
+_classification_flight = None  # {"opened", "entities", "profile", "attrs", "result" future} of the latest classification
 _cached_evening_start = None
 _cached_day_min_start = None
 _cached_day_elev_target = None
 _cached_cutoff_hm = None
 _ramp_service_warned = False
-_day_ready_hysteresis_active = False
 _day_ready_last_state = False
-_day_ready_candidate_state = None
-_day_ready_candidate_since = None
+_day_ready_plan = None        # today's predicted crossings (see _day_ready_plan_for)
 
 _suppress_home_state_trigger = False
 
 _missing_helper_notified: set[str] = set()
 
-_DAY_READY_DEBOUNCE_SECONDS = 120  # 2 minute debounce for day readiness
+_ELEVATION_PREDICT_HORIZON = timedelta(hours=2)  # ignore extrapolations further out
+_CLOCK_SPEED_HELPER = "input_number.hc_clock_speed"  # simulated seconds per real second (default 1)
+_CLOCK_FROZEN_HELPER = "input_boolean.hc_clock_frozen"  # explicit opt-in: simulated time stands still
+_CLOCK_FROZEN_POLL_SECONDS = 5.0     # re-check a frozen clock for sim jumps
+_CLOCK_MAX_REAL_SLEEP_SECONDS = 60.0 # re-check an accelerated clock for speed changes
 _MISSING_HELPER_NOTIFICATION_ID = "hc_missing_helper"
 _MAX_RAMP_RUNTIME = timedelta(hours=6)
+_RAMP_MIN_SLEEP_SECONDS = 1.0    # floor between ramp wakeups
+_RAMP_MAX_SLEEP_SECONDS = 300.0  # re-check cap (sim clock jumps, corrections)
+_RAMP_KELVIN_STEP = 50           # smallest colour-temperature step worth publishing
 _DEFAULT_DAY_FLOOR = dt_time(7, 30)
+_MEMO_MAX_ENTRIES = 4            # per memo; enough to absorb helpers flapping unknown ↔ value
+_CLASSIFICATION_MERGE_SECONDS = 2.0  # kitchen sensors firing within this share one classification
+# Inputs of the Day commit time, in priority order per candidate
+_DAY_FLOOR_HELPERS = ("input_datetime.day_earliest_time", "pyscript.day_earliest_time")
+_DAY_MIN_START_HELPERS = ("sensor.day_min_start", "pyscript.day_min_start")
+_DAY_LEARNED_HELPERS = (
+    "sensor.learned_day_start",
+    "sensor.day_learned_start",
+    "input_datetime.learned_day_start",
+    "pyscript.learned_day_start",
+)
+_DAY_TARGET_BRIGHTNESS_HELPERS = (
+    "sensor.day_target_brightness_teaching",
+    "sensor.day_target_brightness_adaptive",
+    "sensor.day_target_brightness_intelligent",
+    "input_number.day_target_brightness_fallback",
+    "pyscript.day_target_brightness_fallback",
+)
 
 _MQTT_PREFIX = "home/rework/controller"
+_MQTT_SNAPSHOT_TOPIC = "home/rework/controller/snapshot"
+_MQTT_DEBOUNCE_SECONDS = 2.0     # repeated publishes to a topic inside this window collapse
+# Helpers mirrored into the retained snapshot; writing any of them re-publishes it
+_MQTT_SNAPSHOT_ENTITIES = frozenset(
+    ["pyscript.home_state", "input_text.em_route_key", "input_datetime.em_start_ts",
+     "input_text.em_until", "sensor.pys_evening_preramp_start_time", "sensor.night_started_on"]
+    + [f"{domain}.{flag}"
+       for domain in ("binary_sensor", "input_boolean", "pyscript")
+       for flag in ("em_active", "sleep_in_ramp_active", "pys_evening_preramp_active")]
+)
+
+
+_ERROR_SUMMARY_INTERVAL = timedelta(minutes=15)  # repeats of one error are summarised this often
+_ERROR_RING_SIZE = 50
+_ERROR_GROUP_TTL = timedelta(hours=24)  # a group quiet this long is forgotten (next repeat alerts afresh)
+_ERROR_GROUPS_MAX = 100                 # least recently seen groups are dropped beyond this
+_ERROR_NORMALIZE = re.compile(r"0x[0-9a-fA-F]+|\d+(?:\.\d+)?|'[^']*'|\"[^\"]*\"")
+_error_ring = deque(maxlen=_ERROR_RING_SIZE)  # most recent errors, newest last
+_JOURNAL_PATH = "/config/home_controller_journal.db"
+_JOURNAL_FLUSH_SECONDS = 10.0    # batch window for the background writer
+_JOURNAL_RETENTION = timedelta(days=14)
+_JOURNAL_MAX_ROWS = 50000
+_JOURNAL_RING_SIZE = 1000
+_journal_ring = deque(maxlen=_JOURNAL_RING_SIZE)  # newest events, also the fast path for queries
+_PERF_HELPER = "input_boolean.hc_perf_enabled"
+_PERF_SENSOR = "sensor.pys_controller_perf"
+# Histogram bucket upper bounds (ms), roughly log-spaced; one extra bucket for slower calls
+_PERF_BUCKETS_MS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000)
+# Year-ahead schedule: header + one int32 row per day (seconds after local midnight, -1 = none)
+_SCHEDULE_PATH = "/config/home_controller_schedule.bin"
+_SCHEDULE_MAGIC = b"HCSCHED1"
+_SCHEDULE_HEADER = struct.Struct("<8siiddii")  # magic, first day ordinal, days, lat, lon, floor min, evening offset min
+_SCHEDULE_COLUMNS = ("sunrise", "sunset", "evening_start", "day_min_start", "day_ready", "projected_commit")
+_SCHEDULE_DAYS = 366
+_SCHEDULE_REBUILD_MARGIN = 30    # rebuild in the background when fewer days than this remain
+# modules/solar_ephemeris.py on disk: the executor build loads it as native Python, because the
+# `import solar_ephemeris` above gives pyscript-interpreted functions a worker thread cannot call
+_EPHEMERIS_PATH = "/config/pyscript/modules/solar_ephemeris.py"
+_EPHEMERIS_NATIVE = "hc_solar_ephemeris_native"
+_DAY_MIN_START_OFFSET = timedelta(minutes=30)
+_schedule: dict = {}             # mapped table: {"first", "days", "lat", "lon", "floor", "offset", "rows", "map"}
+_schedule_build_task = None
 
 
 def _offish(s: str) -> bool:
@@ -108,10 +217,61 @@ def _offish(s: str) -> bool:
 # ============================================================================
 # ERROR HANDLING
 # ============================================================================
+def _error_key(func_name: str, error: Exception) -> tuple:
+    """Group key: same function, exception type and message modulo numbers/quoted ids"""
+    return (func_name, type(error).__name__, _ERROR_NORMALIZE.sub("#", str(error))[:200])
+
+
+def _notify_error(title: str, message: str, notification_id: str):
+    for target in NOTIFY_TARGETS:
+        try:
+            domain, service_name = target.split(".", 1)
+            service.call(domain, service_name, title=title, message=message[:1200])
+        except Exception:
+            pass
+    try:
+        service.call("persistent_notification", "create",
+                    title=title,
+                    message=message,
+                    notification_id=notification_id)
+    except Exception:
+        pass
+
+
 def _send_home_controller_error_alert(func_name: str, error: Exception, context_data: dict = None):
-    """Send error notification to user"""
+    """Send error notification to user (first of a kind now, repeats as periodic summaries)"""
+    global _error_group_seq
+    now = datetime.now()
+    key = _error_key(func_name, error)
+    group = _error_groups.get(key)
+    _error_ring.append({
+        "time": now.isoformat(timespec="seconds"),
+        "function": func_name,
+        "type": key[1],
+        "message": str(error)[:200],
+        "repeat": group is not None,
+    })
+    log.error(f"[HOME_CONTROLLER_ERROR] {func_name}: {str(error)}")
+
+    if group is not None:
+        _error_groups[key] = _error_groups.pop(key)  # most recently seen last
+        group["count"] += 1
+        group["pending"] += 1
+        group["last"] = now
+        if now - group["notified_at"] >= _ERROR_SUMMARY_INTERVAL:
+            _flush_error_summaries()
+        else:
+            _schedule_error_summary()
+        return
+
+    _error_group_seq += 1
+    _error_groups[key] = {
+        "count": 1, "pending": 0, "first": now, "last": now, "notified_at": now,
+        "notification_id": f"hc_error_{_error_group_seq}_{int(now.timestamp())}",
+    }
+    _prune_error_groups(now)
     tb_text = traceback.format_exc()
-    timestamp = datetime.now().strftime("%H:%M:%S")
+    timestamp = now.strftime("%H:%M:%S")
     message = f"""HOME CONTROLLER ERROR
 
 FUNCTION: {func_name}
@@ -123,30 +283,69 @@ CONTEXT DATA:
 
 TRACEBACK:
 {tb_text[:1500]}"""
-    
-    for target in NOTIFY_TARGETS:
-        try:
-            domain, service_name = target.split(".", 1)
-            service.call(domain, service_name, 
-                        title=f"Home Controller Error [{timestamp}]", 
-                        message=message[:1200])
-        except Exception:
-            pass
-    
+    _notify_error(f"Home Controller Error [{timestamp}]", message,
+                  _error_groups[key]["notification_id"])
+
+
+def _prune_error_groups(now: datetime):
+    """Forget groups quiet for _ERROR_GROUP_TTL with nothing left to report, then cap the count"""
+    for key in [key for key, group in _error_groups.items()
+                if not group["pending"] and now - group["last"] >= _ERROR_GROUP_TTL]:
+        del _error_groups[key]
+    while len(_error_groups) > _ERROR_GROUPS_MAX:
+        del _error_groups[next(iter(_error_groups))]
+
+
+def _flush_error_summaries():
+    """One summary per error group that repeated since its last notification"""
+    now = datetime.now()
+    for (func_name, error_type, normalized), group in _error_groups.items():
+        if not group["pending"]:
+            continue
+        message = (f"HOME CONTROLLER ERROR (repeating)\n\n"
+                   f"FUNCTION: {func_name}\nERROR: {error_type}: {normalized}\n"
+                   f"{group['pending']} more since {group['notified_at'].strftime('%H:%M:%S')} "
+                   f"({group['count']} total since {group['first'].strftime('%H:%M:%S')}, "
+                   f"last at {group['last'].strftime('%H:%M:%S')})")
+        # Same notification id: the persistent notification updates in place
+        _notify_error(f"Home Controller Error x{group['count']} [{func_name}]", message,
+                      group["notification_id"])
+        group["pending"] = 0
+        group["notified_at"] = now
+    _prune_error_groups(now)
+
+
+def _schedule_error_summary():
+    global _error_summary_task
+    if _error_summary_task is not None and not _error_summary_task.done():
+        return
     try:
-        service.call("persistent_notification", "create",
-                    title=f"Home Controller Error [{timestamp}]",
-                    message=message,
-                    notification_id=f"hc_error_{datetime.now().timestamp()}")
-    except Exception:
-        pass
-    
-    log.error(f"[HOME_CONTROLLER_ERROR] {func_name}: {str(error)}")
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return  # no loop: the next repeat after the interval sends the summary
+    _error_summary_task = task.create(_error_summary_flusher())
+
+
+async def _error_summary_flusher():
+    await asyncio.sleep(_ERROR_SUMMARY_INTERVAL.total_seconds())
+    _flush_error_summaries()
+
+
+def _error_status() -> dict:
+    return {
+        "recent": list(_error_ring),
+        "groups": [
+            {"function": key[0], "type": key[1], "message": key[2], "count": group["count"],
+             "pending": group["pending"], "last": group["last"].isoformat(timespec="seconds")}
+            for key, group in _error_groups.items()
+        ],
+    }
 
 def catch_hc_error(name: str):
     """Decorator for error catching and reporting"""
     def deco(fn):
         def wrap(*args, **kw):
+            started = perf_counter() if _perf_enabled else None
             try:
                 return fn(*args, **kw)
             except Exception as e:
@@ -159,28 +358,391 @@ def catch_hc_error(name: str):
                 }
                 _send_home_controller_error_alert(name, e, context)
                 raise
+            finally:
+                if started is not None:
+                    _perf_record(name, perf_counter() - started)
         return wrap
     return deco
 
+def _trigger_failed(name: str, e: Exception, args, kw):
+    context = {
+        "args": str(args)[:200],
+        "kwargs": str(kw)[:200],
+        "home_state": str(state.get("pyscript.home_state") or "unknown"),
+        "trigger": name
+    }
+    _send_home_controller_error_alert(name, e, context)
+    log.error(f"[HC][TRIGGER_ERR] {name}: {e}")
+
+
+async def _run_trigger_coro(name: str, coro, cause: str, args, kw):
+    """Await an async trigger body under its causal id, with the same error handling"""
+    token = _journal_cause.set(cause)
+    try:
+        return await coro
+    except Exception as e:
+        _trigger_failed(name, e, args, kw)
+        return None
+    finally:
+        _journal_cause.reset(token)
+
+
 def catch_hc_trigger_error(name: str):
     """Decorator for triggers that logs errors but does not re-raise"""
     def deco(fn):
         def wrap(*args, **kw):
+            global _journal_triggers
+            started = perf_counter() if _perf_enabled else None
+            _journal_triggers += 1
+            cause = f"{name}#{_journal_triggers}"
+            token = _journal_cause.set(cause)
             try:
-                return fn(*args, **kw)
+                result = fn(*args, **kw)
+                if asyncio.iscoroutine(result):
+                    return _run_trigger_coro(name, result, cause, args, kw)
+                return result
             except Exception as e:
-                context = {
-                    "args": str(args)[:200],
-                    "kwargs": str(kw)[:200],
-                    "home_state": str(state.get("pyscript.home_state") or "unknown"),
-                    "trigger": name
-                }
-                _send_home_controller_error_alert(name, e, context)
-                log.error(f"[HC][TRIGGER_ERR] {name}: {e}")
+                _trigger_failed(name, e, args, kw)
                 return None
+            finally:
+                _journal_cause.reset(token)
+                if started is not None:
+                    _perf_record(name, perf_counter() - started)
         return wrap
     return deco
 
+# ============================================================================
+# EVENT JOURNAL - in-memory ring, batched into SQLite by a background writer
+# ============================================================================
+def _journal(kind: str, name: str, at: datetime = None, **detail):
+    """Record a controller event; never does I/O on the caller's path"""
+    global _journal_seq
+    _journal_seq += 1
+    mono = monotonic()
+    if at is not None:
+        _journal_anchor[:] = [at, mono]
+    elif _journal_anchor:
+        # No clock read on this path: project from the last event that carried one
+        at = _journal_anchor[0] + timedelta(seconds=mono - _journal_anchor[1])
+    else:
+        at = _now()
+        _journal_anchor[:] = [at, mono]
+    row = (_journal_seq, round(mono, 3), at.isoformat(timespec="seconds"),
+           kind, name, _journal_cause.get() or "", json.dumps(detail, default=str) if detail else "")
+    _journal_ring.append(row)
+    _journal_pending.append(row)
+    _journal_schedule_flush()
+
+
+def _journal_schedule_flush():
+    global _journal_flush_task
+    if _journal_flush_task is not None and not _journal_flush_task.done():
+        return
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return  # no loop (tooling/tests): rows wait in _journal_pending
+    _journal_flush_task = task.create(_journal_flusher())
+
+
+async def _journal_flusher():
+    await asyncio.sleep(_JOURNAL_FLUSH_SECONDS)
+    await _journal_flush()
+
+
+async def _journal_flush():
+    """Hand everything pending to the executor as one batch"""
+    if not _journal_pending:
+        return 0
+    rows = list(_journal_pending)
+    del _journal_pending[:]
+    cutoff = (_now() - _JOURNAL_RETENTION).isoformat(timespec="seconds")
+    try:
+        return await task.executor(_journal_write_batch, _JOURNAL_PATH, rows, cutoff, _JOURNAL_MAX_ROWS)
+    except Exception as exc:
+        log.warning(f"[HC] Journal flush of {len(rows)} events failed: {exc}")
+        return 0
+
+
+@pyscript_compile
+def _journal_connect(path: str):
+    conn = sqlite3.connect(path, timeout=10.0)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS hc_journal (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            seq INTEGER NOT NULL,
+            mono REAL NOT NULL,
+            at TEXT NOT NULL,
+            kind TEXT NOT NULL,
+            name TEXT NOT NULL,
+            cause TEXT NOT NULL,
+            detail TEXT NOT NULL
+        )
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS hc_journal_at ON hc_journal (at)")
+    return conn
+
+
+@pyscript_compile
+def _journal_write_batch(path: str, rows: list, cutoff: str, max_rows: int) -> int:
+    """Insert rows with one executemany, then apply age and size retention (runs in executor)"""
+    conn = _journal_connect(path)
+    try:
+        with conn:
+            conn.executemany(
+                "INSERT INTO hc_journal (seq, mono, at, kind, name, cause, detail) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+            conn.execute("DELETE FROM hc_journal WHERE at < ?", (cutoff,))
+            conn.execute(
+                "DELETE FROM hc_journal WHERE id <= (SELECT MAX(id) FROM hc_journal) - ?", (max_rows,)
+            )
+        return len(rows)
+    finally:
+        conn.close()
+
+
+@pyscript_compile
+def _journal_read(path: str, since: str, until: str, kind: str, limit: int) -> list:
+    """Journal rows in [since, until], newest last (runs in executor)"""
+    conn = _journal_connect(path)
+    try:
+        query = "SELECT seq, mono, at, kind, name, cause, detail FROM hc_journal WHERE at >= ? AND at <= ?"
+        params = [since or "", until or "9999"]
+        if kind:
+            query += " AND kind = ?"
+            params.append(kind)
+        query += " ORDER BY id DESC LIMIT ?"
+        params.append(int(limit))
+        return list(reversed(conn.execute(query, params).fetchall()))
+    finally:
+        conn.close()
+
+
+def _journal_row_dict(row) -> dict:
+    seq, mono, at, kind, name, cause, detail = row
+    return {"seq": seq, "mono": mono, "at": at, "kind": kind, "name": name,
+            "cause": cause, "detail": json.loads(detail) if detail else {}}
+
+# ============================================================================
+# PERFORMANCE COUNTERS - filled by the decorators above while enabled
+# ============================================================================
+def _perf_record(name: str, seconds: float):
+    """Add one timed call (inclusive of nested wrapped calls) to name's histogram"""
+    entry = _perf_stats.get(name)
+    if entry is None:
+        entry = _perf_stats[name] = {"calls": 0, "total": 0.0, "max": 0.0,
+                                     "buckets": [0] * (len(_PERF_BUCKETS_MS) + 1)}
+    entry["calls"] += 1
+    entry["total"] += seconds
+    if seconds > entry["max"]:
+        entry["max"] = seconds
+    entry["buckets"][bisect_left(_PERF_BUCKETS_MS, seconds * 1000.0)] += 1
+
+
+def _perf_set_enabled(enabled: bool):
+    global _perf_enabled
+    _perf_enabled = bool(enabled)
+
+
+def _perf_report(limit: int = 0) -> dict:
+    """Per-name timing summary, slowest cumulative time first"""
+    ranked = sorted(_perf_stats.items(), key=lambda item: item[1]["total"], reverse=True)
+    if limit:
+        ranked = ranked[:limit]
+    labels = [f"<={bound}ms" for bound in _PERF_BUCKETS_MS] + [f">{_PERF_BUCKETS_MS[-1]}ms"]
+    return {
+        name: {
+            "calls": entry["calls"],
+            "total_ms": round(entry["total"] * 1000.0, 3),
+            "mean_ms": round(entry["total"] * 1000.0 / entry["calls"], 3),
+            "max_ms": round(entry["max"] * 1000.0, 3),
+            "histogram": {label: count for label, count in zip(labels, entry["buckets"]) if count},
+        }
+        for name, entry in ranked
+    }
+
+
+def _publish_perf_sensor():
+    """Summarise the top functions into sensor.pys_controller_perf"""
+    report = _perf_report(limit=10)
+    top = next(iter(report), "none")
+    attrs = {"friendly_name": "Home Controller Perf", "enabled": _perf_enabled,
+             "tracked": len(_perf_stats)}
+    attrs.update({name: f"{row['calls']} calls, {row['total_ms']} ms total, "
+                        f"{row['mean_ms']} ms mean, {row['max_ms']} ms max"
+                  for name, row in report.items()})
+    _set_sensor(_PERF_SENSOR, top, attrs)
+
+# ============================================================================
+# EVALUATION SNAPSHOT
+# ============================================================================
+# Evaluation entry points (minutely tick, presence, startup, status) open a
+# read-through snapshot so repeated _get()/_get_boolean_state() lookups within
+# that evaluation are served from memory. Frames are keyed by the running task
+# so concurrent triggers never share a cache; controller writes invalidate the
+# written entity in every open frame.
+_state_snapshots: dict = {}
+_snapshot_stats = {"evaluations": 0, "hits": 0, "misses": 0}
+
+# Write coalescer: last (value, attrs) the controller published per entity
+# (or MQTT topic) so no-op writes never reach the state machine/recorder, and
+# per-evaluation pending writes flushed once when the evaluation closes.
+_last_published: dict = {}
+_write_stats = {"emitted": 0, "suppressed": 0, "coalesced": 0}
+
+
+def _snapshot_key():
+    """Identify the current evaluation by its running task (None outside a loop)"""
+    try:
+        return asyncio.current_task()
+    except RuntimeError:
+        return None
+
+
+def _snapshot_frame():
+    """Return the snapshot frame of the current evaluation, if one is open"""
+    if not _state_snapshots:
+        return None
+    return _state_snapshots.get(_snapshot_key())
+
+
+def _snapshot_lookup(entity_id: str, attrs: bool = False):
+    """Read an entity state (or attribute dict) through the open snapshot, if any"""
+    frame = _snapshot_frame()
+    if frame is None:
+        return state.getattr(entity_id) if attrs else state.get(entity_id)
+    cache = frame["attrs"] if attrs else frame["values"]
+    if entity_id in cache:
+        _snapshot_stats["hits"] += 1
+        return cache[entity_id]
+    _snapshot_stats["misses"] += 1
+    value = state.getattr(entity_id) if attrs else state.get(entity_id)
+    cache[entity_id] = value
+    return value
+
+
+def _snapshot_prefetch(entity_ids):
+    """Load many entities into the open snapshot up front (no-op outside an evaluation)"""
+    if _snapshot_frame() is None:
+        return
+    for entity_id in entity_ids:
+        _get(entity_id)
+
+
+def _snapshot_invalidate(*entity_ids: str):
+    """Drop cached reads for entities the controller just wrote"""
+    for frame in _state_snapshots.values():
+        for entity_id in entity_ids:
+            frame["values"].pop(entity_id, None)
+            frame["attrs"].pop(entity_id, None)
+
+
+def with_hc_snapshot(fn):
+    """Decorator opening a state snapshot for one evaluation (re-entrant)"""
+    def wrap(*args, **kw):
+        key = _snapshot_key()
+        if key in _state_snapshots:
+            return fn(*args, **kw)
+        _state_snapshots[key] = {"values": {}, "attrs": {}, "pending": {}}
+        _snapshot_stats["evaluations"] += 1
+        try:
+            return fn(*args, **kw)
+        finally:
+            frame = _state_snapshots.pop(key, None)
+            if frame:
+                _flush_pending_writes(frame["pending"])
+    return wrap
+
+
+def _drop_pending(key: str):
+    """Forget queued writes for key in every open evaluation (newest write wins)"""
+    for frame in _state_snapshots.values():
+        frame["pending"].pop(key, None)
+
+
+def _defer_write(key: str, emit, *args) -> bool:
+    """Queue a write in the current evaluation; False when no evaluation is open"""
+    frame = _snapshot_frame()
+    if frame is None:
+        return False
+    if key in frame["pending"]:
+        _write_stats["coalesced"] += 1
+    _drop_pending(key)
+    frame["pending"][key] = (emit, args)
+    return True
+
+
+def _flush_pending_writes(pending: dict):
+    """Emit the writes an evaluation queued, one per entity/topic"""
+    for key, (emit, args) in pending.items():
+        try:
+            emit(*args)
+        except Exception as exc:
+            log.warning(f"[HC] Deferred write for {key} failed: {exc}")
+
+
+def _same_state(current, value) -> bool:
+    """Compare an HA state string against the value about to be written"""
+    if current is None:
+        return False
+    if str(current) == str(value):
+        return True
+    try:
+        return float(current) == float(value)
+    except (TypeError, ValueError):
+        return False
+
+
+def _read_live(entity_id: str):
+    """Read the state machine directly, bypassing the snapshot"""
+    try:
+        return state.get(entity_id)
+    except Exception:
+        return None
+
+
+def _publish_state(entity_id: str, value, attrs: dict):
+    """state.set unless (value, attrs) matches what we last published"""
+    _drop_pending(entity_id)
+    if _last_published.get(entity_id) == (value, attrs) and _same_state(_read_live(entity_id), value):
+        _write_stats["suppressed"] += 1
+        return
+    state.set(entity_id, value, attrs)
+    _last_published[entity_id] = (value, attrs)
+    _write_stats["emitted"] += 1
+    _snapshot_invalidate(entity_id)
+    if entity_id in _MQTT_SNAPSHOT_ENTITIES:
+        _mqtt_mark_snapshot_dirty()
+
+
+def _publish_helper(entity_id: str, value, emit, args: tuple):
+    """Call a helper service unless the helper already holds value"""
+    _drop_pending(entity_id)
+    last = _last_published.get(entity_id)
+    if (last is None or last[0] == value) and _same_state(_read_live(entity_id), value):
+        _write_stats["suppressed"] += 1
+        return
+    emit(*args)
+    _journal("service", entity_id, value=value)
+    _last_published[entity_id] = (value, None)
+    _write_stats["emitted"] += 1
+    _snapshot_invalidate(entity_id)
+    if entity_id in _MQTT_SNAPSHOT_ENTITIES:
+        _mqtt_mark_snapshot_dirty()
+
+
+def _write_helper(entity_id: str, value, emit, *args):
+    """Route a service-backed helper write through the coalescer"""
+    if _defer_write(entity_id, _publish_helper, entity_id, value, emit, args):
+        _snapshot_invalidate(entity_id)
+        _snapshot_frame()["values"][entity_id] = value
+        return
+    _publish_helper(entity_id, value, emit, args)
+
+
 # ============================================================================
 # HELPER FUNCTIONS
 # ============================================================================
@@ -189,50 +751,186 @@ def _get(entity_id: str, default=None, attr: str = None):
     """Safe entity state getter"""
     try:
         if attr:
-            attrs = state.getattr(entity_id)
+            attrs = _snapshot_lookup(entity_id, attrs=True)
             return attrs.get(attr, default) if attrs else default
-        v = state.get(entity_id)
+        v = _snapshot_lookup(entity_id)
         return v if v not in (None, "unknown", "unavailable") else default
     except Exception:
         return default
 
-@catch_hc_error("_now")
-def _now() -> datetime:
-    """Get current time, honoring simulator freeze if active"""
+# ============================================================================
+# VIRTUAL CLOCK - cached simulation anchor, optional speed factor
+# ============================================================================
+def _clock_invalidate():
+    """Forget the cached clock; the next _now() re-reads the time-freeze helpers"""
+    _clock_cache.clear()
+
+
+def _parse_sim_override(raw, real: datetime) -> datetime | None:
+    """Parse the simulated time helper (full datetime or HH:MM[:SS]) onto today's date"""
+    if not raw:
+        return None
+    override_str = str(raw)
     try:
-        freeze_active = str(_get("input_boolean.time_freeze_active") or "off").lower()
-        if freeze_active == "on":
-            override = _get("input_datetime.sim_time_override")
-            if override:
-                override_str = str(override)
+        if "T" in override_str or " " in override_str:
+            override_dt = datetime.fromisoformat(override_str)
+        else:
+            fmt = "%H:%M:%S" if override_str.count(":") == 2 else "%H:%M"
+            parsed_time = datetime.strptime(override_str, fmt).time()
+            override_dt = datetime.combine(real.date(), parsed_time)
+        if override_dt.tzinfo is not None:
+            override_dt = override_dt.replace(tzinfo=None)
+        return override_dt.replace(year=real.year, month=real.month, day=real.day)
+    except Exception as exc:
+        log.warning(f"[HC] Invalid simulated time '{override_str}': {exc}")
+        return None
+
+
+def _clock_load() -> dict:
+    """Read the time-freeze helpers once and anchor simulated time to the real clock"""
+    real = datetime.now()
+    clock = {"active": False, "speed": 1.0, "anchor_sim": real, "anchor_real": real}
+    try:
+        if str(_get("input_boolean.time_freeze_active") or "off").lower() == "on":
+            anchor = _parse_sim_override(
+                _get("input_datetime.sim_time_override") or _get("input_datetime.time_freeze_clock"),
+                real
+            )
+            if anchor:
+                # A missing, invalid or non-positive speed runs at real time; only the
+                # explicit frozen flag stops the clock (and with it every controller timer)
                 try:
-                    if "T" in override_str or " " in override_str:
-                        override_dt = datetime.fromisoformat(override_str)
-                    else:
-                        fmt = "%H:%M:%S" if override_str.count(":") == 2 else "%H:%M"
-                        parsed_time = datetime.strptime(override_str, fmt).time()
-                        override_dt = datetime.combine(datetime.now().date(), parsed_time)
-                    today = datetime.now()
-                    return override_dt.replace(year=today.year, month=today.month, day=today.day)
-                except Exception as exc:
-                    log.warning(f"[HC] Invalid simulated time '{override_str}': {exc}")
+                    speed = float(_get(_CLOCK_SPEED_HELPER))
+                except (TypeError, ValueError):
+                    speed = 1.0
+                if not speed > 0:
+                    speed = 1.0
+                if str(_get(_CLOCK_FROZEN_HELPER) or "off").lower() == "on":
+                    speed = 0.0
+                clock.update(active=True, speed=speed, anchor_sim=anchor)
     except Exception:
         pass
-    return datetime.now()
+    _clock_cache.update(clock)
+    return _clock_cache
+
+
+@catch_hc_error("_now")
+def _now() -> datetime:
+    """Get current time, honoring simulator freeze (and its speed factor) if active"""
+    clock = _clock_cache or _clock_load()
+    if not clock["active"]:
+        return datetime.now()
+    return clock["anchor_sim"] + (datetime.now() - clock["anchor_real"]) * clock["speed"]
+
+
+def _clock_real_seconds(seconds: float) -> float:
+    """Real seconds to wait for `seconds` of controller time to pass"""
+    clock = _clock_cache or _clock_load()
+    if not clock["active"]:
+        return seconds
+    # Simulated waits are chunked so speed changes and sim jumps are picked up
+    if clock["speed"] <= 0:
+        return min(seconds, _CLOCK_FROZEN_POLL_SECONDS)
+    return min(seconds / clock["speed"], _CLOCK_MAX_REAL_SLEEP_SECONDS)
+
+
+async def _clock_sleep(seconds: float):
+    """Sleep for seconds of controller time (real, frozen or accelerated)"""
+    deadline = _now() + timedelta(seconds=seconds)
+    while True:
+        remaining = (deadline - _now()).total_seconds()
+        if remaining <= 0:
+            return
+        await asyncio.sleep(_clock_real_seconds(remaining))
+
+
+def _clock_status() -> dict:
+    """Clock mode for status reporting"""
+    clock = _clock_cache or _clock_load()
+    return {
+        "simulated": clock["active"],
+        "speed": clock["speed"] if clock["active"] else 1.0,
+        "now": _now().isoformat(),
+    }
 
 def _today_str() -> str:
     """Get today's date as ISO string"""
-    return date.today().isoformat()
+    return _now().date().isoformat()
 
 @catch_hc_error("_set_sensor")
 def _set_sensor(entity_id: str, value, attrs: dict = None):
-    """Set sensor state"""
-    state.set(entity_id, value, attrs or {})
+    """Set sensor state (coalesced per evaluation, no-op writes dropped)"""
+    attrs = dict(attrs or {})
+    if _defer_write(entity_id, _publish_state, entity_id, value, attrs):
+        _snapshot_invalidate(entity_id)
+        frame = _snapshot_frame()
+        frame["values"][entity_id] = value
+        frame["attrs"][entity_id] = attrs
+        return
+    _publish_state(entity_id, value, attrs)
+
 
+def _mqtt_fingerprint(payload: dict) -> tuple:
+    # updated_at changes on every call; it alone never warrants a republish
+    return tuple(sorted((k, str(v)) for k, v in payload.items() if k != "updated_at"))
 
-def _mqtt_publish(path: str, payload: dict):
-    """Publish retained MQTT payload (best-effort)."""
+
+def _mqtt_publish(path: str, payload):
+    """Queue a retained MQTT payload (dict, or a builder called at flush time);
+    the outbox sends only the newest per topic"""
     topic = f"{_MQTT_PREFIX}/{path}"
+    if topic in _mqtt_outbox:
+        _write_stats["coalesced"] += 1
+    _mqtt_outbox[topic] = payload
+    _mqtt_schedule_flush()
+
+
+def _mqtt_mark_snapshot_dirty():
+    global _mqtt_snapshot_dirty
+    _mqtt_snapshot_dirty = True
+    _mqtt_schedule_flush()
+
+
+def _mqtt_schedule_flush():
+    """Flush the outbox after the debounce window (immediately when no loop is running)"""
+    global _mqtt_outbox_task
+    if _mqtt_outbox_task is not None and not _mqtt_outbox_task.done():
+        return
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        _mqtt_flush_outbox()
+        return
+    _mqtt_outbox_task = task.create(_mqtt_outbox_flusher())
+
+
+async def _mqtt_outbox_flusher():
+    await asyncio.sleep(_MQTT_DEBOUNCE_SECONDS)
+    _mqtt_flush_outbox()
+
+
+def _mqtt_flush_outbox():
+    """Send every queued topic, then the combined snapshot if anything it mirrors changed"""
+    global _mqtt_snapshot_dirty
+    pending = list(_mqtt_outbox.items())
+    _mqtt_outbox.clear()
+    for topic, payload in pending:
+        if callable(payload):
+            payload = payload()
+        _mqtt_emit(topic, payload, _mqtt_fingerprint(payload))
+    if _mqtt_snapshot_dirty or pending:
+        _mqtt_snapshot_dirty = False
+        snapshot = _controller_facts()
+        snapshot["updated_at"] = _now().isoformat()
+        _mqtt_emit(_MQTT_SNAPSHOT_TOPIC, snapshot, _mqtt_fingerprint(snapshot))
+
+
+def _mqtt_emit(topic: str, payload: dict, fingerprint: tuple):
+    """Send one retained MQTT message unless it repeats the last retained payload"""
+    key = f"mqtt:{topic}"
+    if _last_published.get(key) == fingerprint:
+        _write_stats["suppressed"] += 1
+        return
     try:
         service.call(
             "mqtt",
@@ -242,17 +940,92 @@ def _mqtt_publish(path: str, payload: dict):
             qos=1,
             retain=True,
         )
+        _last_published[key] = fingerprint
+        _write_stats["emitted"] += 1
     except Exception as exc:
         log.warning(f"[HC] MQTT publish failed for {topic}: {exc}")
 
 
+def _controller_facts() -> dict:
+    """Everything a restart needs to pick the mode back up, read from the helpers"""
+    return {
+        "version": 1,
+        "date": _today_str(),
+        "home_state": _get_home_state(),
+        "em_route": str(_get("input_text.em_route_key") or ""),
+        "em_start": str(_get("input_datetime.em_start_ts") or ""),
+        "em_until": str(_get("input_text.em_until") or ""),
+        "em_active": _get_boolean_state("em_active"),
+        "sleep_in_ramp_active": _get_boolean_state("sleep_in_ramp_active"),
+        "evening_preramp_active": _get_boolean_state("pys_evening_preramp_active"),
+        "evening_preramp_start": str(_get("sensor.pys_evening_preramp_start_time") or ""),
+        "night_started_on": _night_started_on(),
+    }
+
+
+# fact → boolean flag behind it; _get_boolean_state reads "off" for a missing flag,
+# so these are checked separately before the snapshot may fill them
+_FACT_FLAGS = {
+    "em_active": "em_active",
+    "sleep_in_ramp_active": "sleep_in_ramp_active",
+    "evening_preramp_active": "pys_evening_preramp_active",
+}
+
+
+def _snapshot_fill(facts: dict) -> tuple:
+    """Fill facts whose helpers are missing from today's retained snapshot: (filled, helpers kept) keys"""
+    filled, ignored = [], []
+    for key, value in _retained_snapshot.items():
+        if key not in facts or key in ("version", "date") or value in (None, ""):
+            continue
+        flag = _FACT_FLAGS.get(key)
+        if flag:
+            entry = _resolve_boolean_entity(flag)
+            missing = entry is None or _get(entry[0]) is None
+        else:
+            missing = facts[key] in (None, "")
+        if missing:
+            facts[key] = value
+            filled.append(key)
+        elif facts[key] != value:
+            ignored.append(key)
+    return filled, ignored
+
+
+def _retained_snapshot_is_today() -> bool:
+    return _retained_snapshot.get("version") == 1 and _retained_snapshot.get("date") == _today_str()
+
+
+def _startup_facts() -> dict:
+    """The helpers, with today's retained snapshot filling only the values they are missing.
+
+    Without today's snapshot yet (MQTT usually connects after startup) the
+    snapshot handler re-runs the startup evaluation if it can fill anything.
+    """
+    global _startup_awaiting_snapshot
+    facts = _controller_facts()
+    _startup_awaiting_snapshot = not _retained_snapshot_is_today()
+    if _startup_awaiting_snapshot:
+        return facts
+    filled, ignored = _snapshot_fill(facts)
+    if filled or ignored:
+        log.info(f"[HC] Startup: retained snapshot ({_retained_snapshot.get('updated_at')}) "
+                 f"filled {filled or 'nothing'}; helpers kept over {ignored or 'nothing'}")
+    return facts
+
+
 def _publish_em_contract():
     """Publish Early Morning contract for restart recovery"""
+    _mqtt_publish("em/contract", _em_contract_payload)
+
+
+def _em_contract_payload() -> dict:
+    """Early Morning contract as of now (built when the outbox flushes)"""
     route = str(_get("input_text.em_route_key") or "")
     start = str(_get("input_datetime.em_start_ts") or "")
     until = str(_get("input_text.em_until") or "")
     active = _get_boolean_state("em_active") == "on"
-    payload = {
+    return {
         "route": route,
         "start": start,
         "until": until,
@@ -260,7 +1033,6 @@ def _publish_em_contract():
         "updated_at": _now().isoformat(),
         "version": 1,
     }
-    _mqtt_publish("em/contract", payload)
 
 
 @catch_hc_error("_set_em_status")
@@ -273,51 +1045,97 @@ def _set_em_status(status: str, extra: dict = None):
         details.update({k: str(v) for k, v in extra.items()})
     _set_sensor("sensor.pys_em_status", status, details)
 
+# Logical on/off flags; each lives in whichever of binary_sensor./input_boolean./
+# pyscript. exists in this install, resolved once instead of probed per call
+_BOOLEAN_FLAGS = (
+    "em_active",
+    "sleep_in_ramp_active",
+    "daily_motion_lock",
+    "evening_mode_active",
+    "evening_done_today",
+    "evening_ramp_started_today",
+    "waiting_for_bedroom_tv",
+    "pys_evening_preramp_active",
+)
+
+
+def _write_input_boolean(entity_id: str, value: str):
+    flag = "on" if str(value).lower() == "on" else "off"
+    _write_helper(entity_id, flag, _input_boolean_service, entity_id, flag)
+
+
+def _resolve_boolean_entity(suffix: str, stale: bool = False):
+    """(entity_id, writer) backing a flag, or None while no variant exists.
+
+    Only a helper that reads a real state is cached. The pyscript. fallback is
+    probed again on every call, so a helper that was still unavailable at startup
+    takes over once it loads; `stale=True` drops a cached binding that read None."""
+    if stale:
+        _boolean_registry.pop(suffix, None)
+    entry = _boolean_registry.get(suffix)
+    if entry:
+        return entry
+    for domain, writer in (("binary_sensor", _set_sensor),
+                           ("input_boolean", _write_input_boolean)):
+        entity_id = f"{domain}.{suffix}"
+        if _get(entity_id) is not None:
+            entry = _boolean_registry[suffix] = (entity_id, writer)
+            return entry
+    if _get(f"pyscript.{suffix}") is not None:
+        return (f"pyscript.{suffix}", _set_sensor)
+    return None
+
+
+def _build_boolean_registry():
+    """Resolve every known flag up front (after _ensure_entities created the defaults)"""
+    _boolean_registry.clear()
+    for suffix in _BOOLEAN_FLAGS:
+        _resolve_boolean_entity(suffix)
+
+
 @catch_hc_error("_set_boolean_state")
 def _set_boolean_state(suffix: str, value: str):
     """Set a binary sensor or input boolean state"""
-    entities = [
-        f"binary_sensor.{suffix}",
-        f"input_boolean.{suffix}",
-        f"pyscript.{suffix}"
-    ]
-    for e in entities:
-        if _get(e) is not None:
-            if e.startswith("input_boolean."):
-                try:
-                    service.call("input_boolean",
-                                 "turn_on" if str(value).lower() == "on" else "turn_off",
-                                 entity_id=e)
-                except Exception as exc:
-                    log.warning(f"[HC] Failed to toggle {e}: {exc}")
-                    _set_sensor(e, value)
-            else:
-                _set_sensor(e, value)
-            return
-    _set_sensor(f"pyscript.{suffix}", value)
+    entry = _resolve_boolean_entity(suffix)
+    if entry is not None and _get(entry[0]) is None:
+        entry = _resolve_boolean_entity(suffix, stale=True)
+    # nothing readable yet: write the pyscript variant without binding to it
+    entity_id, writer = entry or (f"pyscript.{suffix}", _set_sensor)
+    writer(entity_id, value)
+
+
+def _input_boolean_service(entity_id: str, value: str):
+    """Toggle an input_boolean, mirroring into state if the service fails"""
+    try:
+        service.call("input_boolean", "turn_on" if value == "on" else "turn_off",
+                     entity_id=entity_id)
+    except Exception as exc:
+        log.warning(f"[HC] Failed to toggle {entity_id}: {exc}")
+        _publish_state(entity_id, value, {})
 
 @catch_hc_error("_get_boolean_state")
 def _get_boolean_state(suffix: str) -> str:
     """Get a binary sensor or input boolean state"""
-    entities = [
-        f"binary_sensor.{suffix}",
-        f"input_boolean.{suffix}",
-        f"pyscript.{suffix}"
-    ]
-    for e in entities:
-        v = _get(e)
-        if v is not None:
-            return v
-    return "off"
+    entry = _resolve_boolean_entity(suffix)
+    v = _get(entry[0]) if entry else None
+    if v is None and entry is not None:
+        entry = _resolve_boolean_entity(suffix, stale=True)
+        v = _get(entry[0]) if entry else None
+    return v if v is not None else "off"
 
 
 @catch_hc_error("_set_input_text")
 def _set_input_text(entity_id: str, value: str):
     """Set an input_text helper"""
+    value = value if value is not None else ""
+    _write_helper(entity_id, value, _input_text_service, entity_id, value)
+
+
+def _input_text_service(entity_id: str, value: str):
     try:
         service.call("input_text", "set_value",
                      entity_id=entity_id,
-                     value=value if value is not None else "")
+                     value=value)
     except Exception as e:
         log.warning(f"[HC] Failed to set {entity_id}: {e}")
 
@@ -335,6 +1153,14 @@ def _set_input_datetime(entity_id: str, dt_value):
             dt_str = _now().replace(hour=0, minute=0, second=0, microsecond=0).strftime("%Y-%m-%d %H:%M:%S")
         else:
             dt_str = str(dt_value)
+    except Exception as e:
+        log.warning(f"[HC] Failed to set {entity_id}: {e}")
+        return
+    _write_helper(entity_id, dt_str, _input_datetime_service, entity_id, dt_str)
+
+
+def _input_datetime_service(entity_id: str, dt_str: str):
+    try:
         service.call("input_datetime", "set_datetime",
                      entity_id=entity_id,
                      datetime=dt_str)
@@ -345,10 +1171,19 @@ def _set_input_datetime(entity_id: str, dt_value):
 @catch_hc_error("_set_input_number")
 def _set_input_number(entity_id: str, value):
     """Set an input_number helper"""
+    try:
+        number = float(value if value is not None else 0)
+    except Exception as e:
+        log.warning(f"[HC] Failed to set {entity_id}: {e}")
+        return
+    _write_helper(entity_id, number, _input_number_service, entity_id, number)
+
+
+def _input_number_service(entity_id: str, value: float):
     try:
         service.call("input_number", "set_value",
                      entity_id=entity_id,
-                     value=float(value if value is not None else 0))
+                     value=value)
     except Exception as e:
         log.warning(f"[HC] Failed to set {entity_id}: {e}")
 
@@ -363,11 +1198,8 @@ def _is_any_phone_away() -> bool:
 
 def _get_on_temp_capable_lights() -> list[str]:
     """Return temperature-capable lights that are currently on"""
-    result = []
-    for entity in TEMP_CAPABLE_LIGHTS:
-        if str(_get(entity) or "off").lower() == "on":
-            result.append(entity)
-    return result
+    _ensure_on_light_index()
+    return [entity for entity in TEMP_CAPABLE_LIGHTS if entity in _on_light_index]
 
 
 def _cancel_task_if_running(existing_task, name: str):
@@ -437,7 +1269,8 @@ def _set_home_state(mode: str):
         except Exception:
             ts = datetime.now()
 
-    state.set("pyscript.home_state", mode, {
+    # Mode changes bypass evaluation coalescing: room modules key off them
+    _publish_state("pyscript.home_state", mode, {
         "friendly_name": "Home State (PyScript)",
         "icon": "mdi:home-clock",
         "options": valid,
@@ -449,12 +1282,14 @@ def _set_home_state(mode: str):
             _suppress_home_state_trigger = True
             service.call("input_select", "select_option", 
                         entity_id="input_select.home_state", option=mode)
+            _snapshot_invalidate("input_select.home_state")
         except Exception as e:
             log.warning(f"[HC] Could not set input_select.home_state: {e}")
         finally:
             _suppress_home_state_trigger = False
     
     log.info(f"[HC] Mode → {mode}")
+    _journal("mode", mode, at=ts)
     return True
 
 @catch_hc_error("_enter_evening")
@@ -497,12 +1332,11 @@ def _end_evening(reason: str, mark_done: bool):
 def _set_last_action(msg: str):
     """Record last action for debugging"""
     ts = _now().strftime("%Y-%m-%d %H:%M:%S")
-    prev_attrs = state.getattr("sensor.pys_last_action") or {}
-    history = prev_attrs.get("history") or []
+    history = _get("sensor.pys_last_action", attr="history") or []
     if not isinstance(history, list):
         history = []
     history = (history + [f"{msg}@{ts}"])[-5:]
-    state.set("sensor.pys_last_action", f"{msg} @ {ts}", {
+    _set_sensor("sensor.pys_last_action", f"{msg} @ {ts}", {
         "friendly_name": "Home Controller Last Action",
         "icon": "mdi:clock-check",
         "timestamp": ts,
@@ -514,8 +1348,8 @@ def _set_last_action(msg: str):
 def _mark_em_end(reason: str):
     """Mark Early Morning end with reason"""
     ts = _now().replace(microsecond=0).isoformat()
-    state.set("sensor.pys_em_end_reason", reason, {"friendly_name":"EM End Reason"})
-    state.set("sensor.pys_em_end_time", ts, {"friendly_name":"EM End Time"})
+    _set_sensor("sensor.pys_em_end_reason", reason, {"friendly_name":"EM End Reason"})
+    _set_sensor("sensor.pys_em_end_time", ts, {"friendly_name":"EM End Time"})
     _set_boolean_state("em_active", "off")
     _set_em_status("em_ended", {"reason": reason})
     _publish_em_contract()
@@ -523,9 +1357,9 @@ def _mark_em_end(reason: str):
 @catch_hc_error("_is_controller_enabled")
 def _is_controller_enabled() -> bool:
     """Check if controller is enabled"""
-    v = state.get("pyscript.controller_enabled")
+    v = _get("pyscript.controller_enabled")
     if v in ("on","off"): return v == "on"
-    v2 = state.get("input_boolean.use_pyscript_home_state")
+    v2 = _get("input_boolean.use_pyscript_home_state")
     if v2 in ("on","off"): return v2 == "on"
     return True
 
@@ -570,45 +1404,20 @@ def _get_day_earliest_time_floor() -> dt_time:
 # ============================================================================
 @catch_hc_error("_calculate_ramp_brightness")
 def _calculate_ramp_brightness(start_time: datetime, end_time: datetime, 
-                               start_val: int, end_val: int) -> int:
+                               start_val: int, end_val: int, now: datetime = None) -> int:
     """Calculate current ramp brightness based on time"""
-    now = _now()
-    if now <= start_time:
-        return start_val
-    if now >= end_time:
-        return end_val
-    total_duration = (end_time - start_time).total_seconds()
-    if total_duration <= 0:
-        return end_val
-    elapsed = (now - start_time).total_seconds()
-    progress = elapsed / total_duration
-    
-    current = start_val + (end_val - start_val) * progress
-    return int(round(current))
+    return _ramp_value(start_time, end_time, start_val, end_val, now or _now())
 
 @catch_hc_error("_calculate_ramp_kelvin")
 def _calculate_ramp_kelvin(start_time: datetime, end_time: datetime,
-                             start_k: int, end_k: int) -> int:
+                             start_k: int, end_k: int, now: datetime = None) -> int:
     """Calculate current ramp color temperature based on time"""
-    now = _now()
-    if now <= start_time:
-        return start_k
-    if now >= end_time:
-        return end_k
+    return _ramp_value(start_time, end_time, start_k, end_k, now or _now(), _RAMP_KELVIN_STEP)
 
-    total_duration = (end_time - start_time).total_seconds()
-    if total_duration <= 0:
-        return end_k
-    elapsed = (now - start_time).total_seconds()
-    progress = elapsed / total_duration
 
-    current = start_k + (end_k - start_k) * progress
-    return int(round(current))
-
-
-def _calculate_ramp_progress(start_time: datetime, end_time: datetime) -> int:
+def _calculate_ramp_progress(start_time: datetime, end_time: datetime, now: datetime = None) -> int:
     """Return ramp progress percentage between start and end"""
-    now = _now()
+    now = now or _now()
     total = (end_time - start_time).total_seconds()
     if total <= 0:
         return 100
@@ -619,6 +1428,64 @@ def _calculate_ramp_progress(start_time: datetime, end_time: datetime) -> int:
     return int(round(((now - start_time).total_seconds() / total) * 100))
 
 
+# Ramp easing curves: name → (eased value for linear progress, inverse)
+_RAMP_CURVES = {
+    "linear": (lambda p: p, lambda p: p),
+    "ease_in": (lambda p: p * p, lambda p: p ** 0.5),
+}
+
+
+def _ramp_value(start_time: datetime, end_time: datetime, start_val: int, end_val: int,
+                now: datetime, resolution: int = 1, curve: str = "linear") -> int:
+    """Ramp output at now, eased along curve and rounded to resolution"""
+    if now <= start_time:
+        return start_val
+    if now >= end_time:
+        return end_val
+    total = (end_time - start_time).total_seconds()
+    if total <= 0:
+        return end_val
+    ease = _RAMP_CURVES.get(curve, _RAMP_CURVES["linear"])[0]
+    current = start_val + (end_val - start_val) * ease((now - start_time).total_seconds() / total)
+    return int(round(current / resolution)) * resolution
+
+
+def _next_ramp_step_time(start_time: datetime, end_time: datetime,
+                         start_val: int, end_val: int, now: datetime,
+                         step: int = 1, curve: str = "linear") -> datetime | None:
+    """Return the first instant after now where the rounded ramp value changes"""
+    total = (end_time - start_time).total_seconds()
+    if total <= 0 or start_val == end_val or now >= end_time:
+        return None
+    ease, inverse = _RAMP_CURVES.get(curve, _RAMP_CURVES["linear"])
+    progress = min(1.0, max(0.0, (now - start_time).total_seconds() / total))
+    current = int(round((start_val + (end_val - start_val) * ease(progress)) / step)) * step
+    # Rounding flips once the eased value passes the next half-step; a
+    # millisecond past the boundary also settles round-half-to-even ties.
+    boundary = current + step / 2 if end_val > start_val else current - step / 2
+    fraction = (boundary - start_val) / (end_val - start_val)
+    if fraction >= 1:
+        return None
+    seconds = inverse(max(0.0, fraction)) * total
+    flips_at = start_time + timedelta(seconds=seconds + 0.001)
+    return flips_at if flips_at > now else None
+
+
+def _seconds_until_next_ramp_step(start_time: datetime, end_time: datetime,
+                                  channels: list, now: datetime,
+                                  hard_stop: datetime = None, curve: str = "linear") -> float:
+    """Sleep length until any channel's visible output changes or the ramp ends"""
+    wake = end_time
+    for start_val, end_val, resolution in channels:
+        step = _next_ramp_step_time(start_time, end_time, start_val, end_val, now, resolution, curve)
+        if step and step < wake:
+            wake = step
+    if hard_stop and hard_stop < wake:
+        wake = hard_stop
+    seconds = (wake - now).total_seconds()
+    return max(_RAMP_MIN_SLEEP_SECONDS, min(_RAMP_MAX_SLEEP_SECONDS, seconds))
+
+
 def _set_ramp_temperature(value: int, attrs: dict | None = None):
     """Set both kelvin and legacy temperature sensors for ramp outputs"""
     _set_sensor("sensor.sleep_in_ramp_kelvin", value, attrs)
@@ -663,6 +1530,9 @@ def _mirror_ramp_helpers(start_time: datetime, end_time: datetime, ramp_type: st
                      value=duration_minutes)
     except Exception:
         pass
+    _snapshot_invalidate("input_datetime.ramp_start_time",
+                         "input_datetime.ramp_calculated_end_time",
+                         "input_number.calculated_ramp_duration")
 
     progress = _calculate_ramp_progress(start_time, end_time)
     _set_sensor("sensor.sleep_in_ramp_progress", progress, {
@@ -673,36 +1543,276 @@ def _mirror_ramp_helpers(start_time: datetime, end_time: datetime, ramp_type: st
         "end_time": end_str
     })
 
+# ============================================================================
+# RAMP ENGINE - declarative ramp specs driven by one supervisor task
+# ============================================================================
+def _coerce_ramp_datetime(value, fallback: datetime) -> datetime:
+    """Parse a ramp timestamp into naive local time with whole seconds"""
+    if not isinstance(value, datetime):
+        try:
+            value = datetime.fromisoformat(str(value))
+        except Exception:
+            value = fallback
+    if value.tzinfo is not None:
+        value = value.replace(tzinfo=None)
+    return value.replace(microsecond=0)
+
+
+def _ramp_values(spec: dict, now: datetime) -> dict:
+    """Current rounded output of every channel in a ramp spec"""
+    values = {}
+    for channel, (start_val, end_val, resolution) in spec["channels"].items():
+        values[channel] = _ramp_value(spec["start"], spec["end"], start_val, end_val,
+                                      now, resolution, spec["curve"])
+    return values
+
+
+def _ramp_schedule(spec: dict, wake: datetime):
+    """Push the spec's next wakeup; older heap entries for it go stale"""
+    global _ramp_seq
+    _ramp_seq += 1
+    spec["seq"] = _ramp_seq
+    spec["next_wake"] = wake
+    heapq.heappush(_ramp_heap, (wake, _ramp_seq, spec["name"]))
+
+
+def _ramp_emit(spec: dict, values: dict, now: datetime):
+    """Hand changed channel values to every sink of the ramp"""
+    spec["values"] = values
+    _journal("ramp_step", spec["name"], at=now, **values)
+    for sink in spec["sinks"]:
+        try:
+            sink(spec, values, now)
+        except Exception as exc:
+            log.warning(f"[HC] {spec['label']}: sink update failed: {exc}")
+
+
+def _ramp_finish(spec: dict, outcome: str):
+    """Drop the ramp and run its completion hook with the outcome"""
+    if _ramp_specs.get(spec["name"]) is spec:
+        _ramp_specs.pop(spec["name"])
+    spec["seq"] = None
+    spec["outcome"] = outcome
+    hook = spec.get("on_complete")
+    if hook:
+        hook(spec, outcome)
+
+
+@catch_hc_error("_ramp_engine_step")
+def _ramp_engine_step(spec: dict, now: datetime):
+    """Advance one ramp to now: finish it, or publish changes and reschedule"""
+    if now >= spec["end"]:
+        _ramp_finish(spec, "complete")
+        return
+    if now >= spec["hard_stop"]:
+        log.error(f"[HC] {spec['label']}: Exceeded max runtime {_MAX_RAMP_RUNTIME}; forcing completion")
+        _ramp_finish(spec, "timeout")
+        return
+    guard = spec.get("guard")
+    if guard and not guard(spec):
+        _ramp_finish(spec, "stopped")
+        return
+
+    values = _ramp_values(spec, now)
+    if values != spec["values"]:
+        _ramp_emit(spec, values, now)
+
+    seconds = _seconds_until_next_ramp_step(
+        spec["start"], spec["end"], list(spec["channels"].values()),
+        now, spec["hard_stop"], spec["curve"]
+    )
+    _ramp_schedule(spec, now + timedelta(seconds=max(seconds, spec["min_interval"])))
+
+
+@catch_hc_error("_ramp_engine_start")
+def _ramp_engine_start(spec: dict):
+    """Register a ramp spec (replacing one with the same name) and publish its first values"""
+    name = spec["name"]
+    if name in _ramp_specs:
+        _ramp_engine_cancel(name, "replaced")
+
+    spec.setdefault("label", name)
+    spec.setdefault("curve", "linear")
+    spec.setdefault("sinks", [])
+    spec.setdefault("min_interval", 0)
+    spec.setdefault("hard_stop", spec["start"] + _MAX_RAMP_RUNTIME)
+    spec["values"] = None
+    spec["next_wake"] = None
+    _ramp_specs[name] = spec
+
+    now = _now()
+    _ramp_emit(spec, _ramp_values(spec, now), now)
+    _ramp_engine_step(spec, now)
+    if _ramp_specs.get(name) is spec:
+        _ensure_ramp_supervisor()
+
+
+def _ramp_engine_cancel(name: str, reason: str = "cancelled") -> bool:
+    """Stop a registered ramp without its final writes; False when none is running"""
+    spec = _ramp_specs.pop(name, None)
+    if spec is None:
+        return False
+    log.info(f"[HC] Cancelled ramp: {name} ({reason})")
+    _ramp_finish(spec, "cancelled")
+    return True
+
+
+@with_hc_snapshot
+def _ramp_engine_run_due(now: datetime):
+    """Step every ramp whose wakeup has arrived"""
+    while _ramp_heap and _ramp_heap[0][0] <= now:
+        _, seq, name = heapq.heappop(_ramp_heap)
+        spec = _ramp_specs.get(name)
+        if spec is None or spec.get("seq") != seq:
+            continue
+        try:
+            _ramp_engine_step(spec, now)
+        except Exception as exc:
+            # One broken ramp must not stall the others sharing the supervisor;
+            # its hook still runs so the ramp's helpers don't stay mid-ramp
+            log.error(f"[HC] {spec['label']}: step failed ({exc}); dropping ramp")
+            try:
+                _ramp_finish(spec, "failed")
+            except Exception as hook_exc:
+                _ramp_specs.pop(name, None)
+                log.error(f"[HC] {spec['label']}: failure hook raised: {hook_exc}")
+
+
+def _ramp_next_delay(now: datetime):
+    """Seconds until the earliest live heap entry, None when no ramp is left"""
+    while _ramp_heap:
+        wake, seq, name = _ramp_heap[0]
+        spec = _ramp_specs.get(name)
+        if spec is None or spec.get("seq") != seq:
+            heapq.heappop(_ramp_heap)
+            continue
+        return max(0.0, (wake - now).total_seconds())
+    return None
+
+
+async def _ramp_supervisor_sleep(seconds: float):
+    """Wait for the next due ramp, or until a new ramp is registered"""
+    try:
+        await asyncio.wait_for(_ramp_wakeup.wait(), timeout=_clock_real_seconds(seconds))
+    except asyncio.TimeoutError:
+        pass
+    _ramp_wakeup.clear()
+
+
+async def _ramp_supervisor():
+    """Single task multiplexing every active ramp on one timer heap"""
+    global _ramp_supervisor_task, _ramp_wakeup
+    _ramp_wakeup = asyncio.Event()
+    try:
+        while _ramp_specs:
+            now = _now()
+            _ramp_engine_run_due(now)
+            delay = _ramp_next_delay(now)
+            if delay is None:
+                break
+            await _ramp_supervisor_sleep(delay)
+    finally:
+        _ramp_supervisor_task = None
+        _ramp_wakeup = None
+
+
+def _ensure_ramp_supervisor():
+    """Start the supervisor, or nudge it to re-read the heap if it is sleeping"""
+    global _ramp_supervisor_task
+    if _ramp_supervisor_task is not None and not _ramp_supervisor_task.done():
+        if _ramp_wakeup is not None:
+            _ramp_wakeup.set()
+        return
+    _ramp_supervisor_task = task.create(_ramp_supervisor())
+
+
+def _ramp_engine_status() -> dict:
+    """Per-ramp progress and next wakeup for status reporting"""
+    now = _now()
+    active = {}
+    for name, spec in _ramp_specs.items():
+        active[name] = {
+            "type": spec.get("ramp_type", name),
+            "start": spec["start"].isoformat(),
+            "end": spec["end"].isoformat(),
+            "progress": _calculate_ramp_progress(spec["start"], spec["end"], now),
+            "values": dict(spec["values"] or {}),
+            "next_wake": spec["next_wake"].isoformat() if spec.get("next_wake") else None,
+        }
+    return {
+        "supervisor_running": _ramp_supervisor_task is not None and not _ramp_supervisor_task.done(),
+        "active": active,
+    }
+
+
+def _morning_ramp_sink(spec: dict, values: dict, now: datetime):
+    """Publish morning ramp outputs to the shared sleep_in_ramp sensors"""
+    attrs = spec["attrs"]
+    _set_sensor("sensor.sleep_in_ramp_brightness", values["brightness"], attrs["brightness"])
+    _set_ramp_temperature(values["kelvin"], attrs["kelvin"])
+    _set_sensor("sensor.sleep_in_ramp_progress",
+                _calculate_ramp_progress(spec["start"], spec["end"], now), attrs["progress"])
+    log.info(f"[HC] {spec['label']}: {values['brightness']}% / {values['kelvin']}K")
+
+
+def _morning_ramp_attrs(ramp_type: str, start_time: datetime, end_time: datetime,
+                        target: int, end_temp: int, source: str = None) -> dict:
+    """Sensor attributes for the morning ramp brightness/kelvin/progress outputs"""
+    brightness = {
+        "friendly_name": "Morning Ramp Brightness",
+        "unit_of_measurement": "%",
+        "ramp_type": ramp_type,
+        "target": target,
+    }
+    if source is not None:
+        brightness["source"] = source
+    brightness["end_time"] = end_time.isoformat()
+    kelvin = {
+        "friendly_name": "Morning Ramp Kelvin",
+        "unit_of_measurement": "K",
+        "ramp_type": ramp_type,
+        "target": end_temp,
+        "end_time": end_time.isoformat(),
+    }
+    if ramp_type == "work":
+        brightness["start_time"] = start_time.isoformat()
+        kelvin["start_time"] = start_time.isoformat()
+    progress = {
+        "friendly_name": "Morning Ramp Progress",
+        "unit_of_measurement": "%",
+        "ramp_type": ramp_type,
+        "target": target,
+        "start_time": start_time.isoformat(),
+        "end_time": end_time.isoformat()
+    }
+    return {"brightness": brightness, "kelvin": kelvin, "progress": progress}
+
+
+def _morning_ramp_final_progress(spec: dict) -> dict:
+    """Progress attributes written when a morning ramp completes"""
+    attrs = {
+        "friendly_name": "Morning Ramp Progress",
+        "unit_of_measurement": "%",
+        "ramp_type": spec["ramp_type"],
+    }
+    if spec["ramp_type"] == "nonwork":
+        attrs["target"] = spec["channels"]["brightness"][1]
+    attrs["start_time"] = spec["start"].isoformat()
+    attrs["end_time"] = spec["end"].isoformat()
+    return attrs
+
+
 @catch_hc_error("_start_work_ramp")
 async def _start_work_ramp(restore_from_time=None):
     """
     SET IN STONE: Work ramp 10%/2000K → 50%/4000K until 05:40
     """
-    global _work_ramp_task
-    
+    _ramp_engine_cancel("morning", "work_ramp_start")
+
     # Determine start time - use restore time if provided (after restart)
     now = _now()
     resume_mode = bool(restore_from_time)
-    if resume_mode:
-        if isinstance(restore_from_time, str):
-            try:
-                start_time = datetime.fromisoformat(str(restore_from_time))
-            except Exception:
-                start_time = now
-        else:
-            start_time = restore_from_time
-    else:
-        start_time = now
-
-    if not isinstance(start_time, datetime):
-        try:
-            start_time = datetime.fromisoformat(str(start_time))
-        except Exception:
-            start_time = now
-
-    if start_time.tzinfo is not None:
-        start_time = start_time.replace(tzinfo=None)
-    start_time = start_time.replace(microsecond=0)
+    start_time = _coerce_ramp_datetime(restore_from_time or now, now)
 
     end_time = start_time.replace(hour=5, minute=40, second=0, microsecond=0)
     if end_time <= start_time:
@@ -738,92 +1848,41 @@ async def _start_work_ramp(restore_from_time=None):
     })
     _publish_em_contract()
 
-    # Calculate initial values based on actual start time
-    initial_brightness = _calculate_ramp_brightness(
-        start_time, end_time,
-        WORK_RAMP_START_BRIGHTNESS, WORK_RAMP_END_BRIGHTNESS
-    )
-    initial_kelvin = _calculate_ramp_kelvin(
-        start_time, end_time,
-        WORK_RAMP_START_TEMP, WORK_RAMP_END_TEMP
-    )
-    _set_sensor("sensor.sleep_in_ramp_brightness", initial_brightness)
-    _set_ramp_temperature(initial_kelvin)
-    log.info(f"[HC] WORK RAMP: Initial values: {initial_brightness}% / {initial_kelvin}K")
-    
-    hard_stop = start_time + _MAX_RAMP_RUNTIME
-    timed_out = False
-
-    # Ramp loop until 05:40 or timeout
-    while True:
-        current_now = _now()
-        if current_now >= end_time:
-            break
-        if current_now >= hard_stop:
-            timed_out = True
-            log.error(f"[HC] WORK RAMP: Exceeded max runtime {_MAX_RAMP_RUNTIME}; forcing completion")
-            break
-        # Calculate current values
-        current_brightness = _calculate_ramp_brightness(
-            start_time, end_time,
-            WORK_RAMP_START_BRIGHTNESS, WORK_RAMP_END_BRIGHTNESS
-        )
-        current_kelvin = _calculate_ramp_kelvin(
-            start_time, end_time,
-            WORK_RAMP_START_TEMP, WORK_RAMP_END_TEMP
-        )
-        
-        # Update sensors for other rooms to use
-        _set_sensor("sensor.sleep_in_ramp_brightness", current_brightness, {
-            "friendly_name": "Morning Ramp Brightness",
-            "unit_of_measurement": "%",
-            "ramp_type": "work",
-            "target": WORK_RAMP_END_BRIGHTNESS,
-            "end_time": end_time.isoformat(),
-            "start_time": start_time.isoformat()
-        })
-        _set_ramp_temperature(current_kelvin, {
-            "friendly_name": "Morning Ramp Kelvin",
-            "unit_of_measurement": "K",
-            "ramp_type": "work",
-            "target": WORK_RAMP_END_TEMP,
-            "end_time": end_time.isoformat(),
-            "start_time": start_time.isoformat()
-        })
-
-        _set_sensor("sensor.sleep_in_ramp_progress", _calculate_ramp_progress(start_time, end_time), {
-            "friendly_name": "Morning Ramp Progress",
-            "unit_of_measurement": "%",
-            "ramp_type": "work",
-            "target": WORK_RAMP_END_BRIGHTNESS,
-            "start_time": start_time.isoformat(),
-            "end_time": end_time.isoformat()
-        })
-
-        log.info(f"[HC] WORK RAMP: {current_brightness}% / {current_kelvin}K")
+    # Ramp until 05:40 (or timeout); the engine wakes only when a rounded output moves
+    _ramp_engine_start({
+        "name": "morning",
+        "label": "WORK RAMP",
+        "ramp_type": "work",
+        "start": start_time,
+        "end": end_time,
+        "channels": {
+            "brightness": (WORK_RAMP_START_BRIGHTNESS, WORK_RAMP_END_BRIGHTNESS, 1),
+            "kelvin": (WORK_RAMP_START_TEMP, WORK_RAMP_END_TEMP, _RAMP_KELVIN_STEP),
+        },
+        "attrs": _morning_ramp_attrs("work", start_time, end_time,
+                                     WORK_RAMP_END_BRIGHTNESS, WORK_RAMP_END_TEMP),
+        "sinks": [_morning_ramp_sink],
+        "on_complete": _finish_work_ramp,
+    })
 
-        # Wait 30 seconds before next update
-        await asyncio.sleep(30)
 
-    if timed_out:
-        log.warning("[HC] WORK RAMP: Timeout reached; finalizing ramp early")
+def _finish_work_ramp(spec: dict, outcome: str):
+    """Work ramp completion: hold at final values in Early Morning"""
+    if outcome == "cancelled":
+        return
+    if outcome in ("timeout", "failed"):
+        log.warning(f"[HC] WORK RAMP: {outcome}; finalizing ramp early")
 
     # Ramp complete - hold at final values
     _set_sensor("sensor.sleep_in_ramp_brightness", WORK_RAMP_END_BRIGHTNESS)
     _set_ramp_temperature(WORK_RAMP_END_TEMP)
-    _set_sensor("sensor.sleep_in_ramp_progress", 100, {
-        "friendly_name": "Morning Ramp Progress",
-        "unit_of_measurement": "%",
-        "ramp_type": "work",
-        "start_time": start_time.isoformat(),
-        "end_time": end_time.isoformat()
-    })
+    _set_sensor("sensor.sleep_in_ramp_progress", 100, _morning_ramp_final_progress(spec))
     _set_em_status("work_ramp_complete", {
-        "end": end_time.strftime('%H:%M:%S')
+        "end": spec["end"].strftime('%H:%M:%S')
     })
     _publish_em_contract()
     log.info(f"[HC] WORK RAMP: Complete, holding at {WORK_RAMP_END_BRIGHTNESS}% / {WORK_RAMP_END_TEMP}K")
-    
+
     # After 05:40, stay in Early Morning at final levels until phones go Away
     # Do NOT change mode or turn off lights
 
@@ -832,8 +1891,8 @@ async def _start_nonwork_ramp(start_time_override=None):
     """
     SET IN STONE: Non-work ramp 10%/2000K → dynamic%/5000K until Day commit
     """
-    global _nonwork_ramp_task
-    
+    _ramp_engine_cancel("morning", "nonwork_ramp_start")
+
     # Get Day commit time (when Day mode should start)
     commit_dt = _compute_day_commit_time()
     if not commit_dt:
@@ -846,40 +1905,14 @@ async def _start_nonwork_ramp(start_time_override=None):
     log.info(f"[HC] NONWORK RAMP: Starting 10%/2000K → {target_brightness}%/5000K until {commit_dt.strftime('%H:%M')}")
     
     now = _now()
-    override_mode = bool(start_time_override)
-    if override_mode:
-        if isinstance(start_time_override, str):
-            try:
-                start_time = datetime.fromisoformat(str(start_time_override))
-            except Exception:
-                start_time = now
-        else:
-            start_time = start_time_override
-    else:
-        start_time = now
-
-    if not isinstance(start_time, datetime):
-        try:
-            start_time = datetime.fromisoformat(str(start_time))
-        except Exception:
-            start_time = now
-
-    if start_time.tzinfo is not None:
-        start_time = start_time.replace(tzinfo=None)
-    start_time = start_time.replace(microsecond=0)
-    end_time = commit_dt
-    if not end_time:
-        log.error("[HC] NONWORK RAMP: Missing Day commit time; aborting ramp")
-        return
-    if not isinstance(end_time, datetime):
+    start_time = _coerce_ramp_datetime(start_time_override or now, now)
+    if not isinstance(commit_dt, datetime):
         try:
-            end_time = datetime.fromisoformat(str(end_time))
+            commit_dt = datetime.fromisoformat(str(commit_dt))
         except Exception as exc:
             log.error(f"[HC] NONWORK RAMP: Invalid commit time '{commit_dt}': {exc}")
             return
-    if end_time.tzinfo is not None:
-        end_time = end_time.replace(tzinfo=None)
-    end_time = end_time.replace(microsecond=0)
+    end_time = _coerce_ramp_datetime(commit_dt, commit_dt)
     if end_time <= start_time:
         log.warning(
             f"[HC] NONWORK RAMP: Commit {end_time.strftime('%H:%M')} is not after start"
@@ -905,111 +1938,48 @@ async def _start_nonwork_ramp(start_time_override=None):
         "friendly_name": "Early Morning Start Time"
     })
 
-    # Calculate and publish the initial ramp values (supports resume scenarios)
-    initial_brightness = _calculate_ramp_brightness(
-        start_time, end_time,
-        NONWORK_RAMP_START_BRIGHTNESS, target_brightness
-    )
-    initial_kelvin = _calculate_ramp_kelvin(
-        start_time, end_time,
-        NONWORK_RAMP_START_TEMP, NONWORK_RAMP_END_TEMP
-    )
-
-    brightness_attrs = {
-        "friendly_name": "Morning Ramp Brightness",
-        "unit_of_measurement": "%",
+    # Ramp until Day commit time (or timeout); initial values honour resume scenarios
+    _ramp_engine_start({
+        "name": "morning",
+        "label": "NONWORK RAMP",
         "ramp_type": "nonwork",
-        "target": target_brightness,
-        "source": source,
-        "end_time": end_time.isoformat()
-    }
-    _set_sensor("sensor.sleep_in_ramp_brightness", initial_brightness, brightness_attrs)
-
-    kelvin_attrs = {
-        "friendly_name": "Morning Ramp Kelvin",
-        "unit_of_measurement": "K",
-        "ramp_type": "nonwork",
-        "target": NONWORK_RAMP_END_TEMP,
-        "end_time": end_time.isoformat()
-    }
-    _set_ramp_temperature(initial_kelvin, kelvin_attrs)
-    log.info(f"[HC] NONWORK RAMP: Initial values: {initial_brightness}% / {initial_kelvin}K")
-
-    hard_stop = start_time + _MAX_RAMP_RUNTIME
-    timed_out = False
-
-    # Ramp loop until Day commit time or timeout
-    while True:
-        current_now = _now()
-        if current_now >= end_time:
-            break
-        if current_now >= hard_stop:
-            timed_out = True
-            log.error(f"[HC] NONWORK RAMP: Exceeded max runtime {_MAX_RAMP_RUNTIME}; forcing completion")
-            break
-        # Calculate current values
-        current_brightness = _calculate_ramp_brightness(
-            start_time, end_time,
-            NONWORK_RAMP_START_BRIGHTNESS, target_brightness
-        )
-        current_kelvin = _calculate_ramp_kelvin(
-            start_time, end_time,
-            NONWORK_RAMP_START_TEMP, NONWORK_RAMP_END_TEMP
-        )
-        
-        # Update sensors
-        _set_sensor("sensor.sleep_in_ramp_brightness", current_brightness, {
-            "friendly_name": "Morning Ramp Brightness",
-            "unit_of_measurement": "%",
-            "ramp_type": "nonwork",
-            "target": target_brightness,
-            "source": source,
-            "end_time": end_time.isoformat()
-        })
-        _set_ramp_temperature(current_kelvin, {
-            "friendly_name": "Morning Ramp Kelvin",
-            "unit_of_measurement": "K",
-            "ramp_type": "nonwork",
-            "target": NONWORK_RAMP_END_TEMP,
-            "end_time": end_time.isoformat()
-        })
-
-        _set_sensor("sensor.sleep_in_ramp_progress", _calculate_ramp_progress(start_time, end_time), {
-            "friendly_name": "Morning Ramp Progress",
-            "unit_of_measurement": "%",
-            "ramp_type": "nonwork",
-            "target": target_brightness,
-            "start_time": start_time.isoformat(),
-            "end_time": end_time.isoformat()
-        })
-
-        log.info(f"[HC] NONWORK RAMP: {current_brightness}% / {current_kelvin}K")
+        "start": start_time,
+        "end": end_time,
+        "channels": {
+            "brightness": (NONWORK_RAMP_START_BRIGHTNESS, target_brightness, 1),
+            "kelvin": (NONWORK_RAMP_START_TEMP, NONWORK_RAMP_END_TEMP, _RAMP_KELVIN_STEP),
+        },
+        "attrs": _morning_ramp_attrs("nonwork", start_time, end_time,
+                                     target_brightness, NONWORK_RAMP_END_TEMP, source),
+        "sinks": [_morning_ramp_sink],
+        "on_complete": _finish_nonwork_ramp,
+    })
 
-        # Wait 30 seconds before next update
-        await asyncio.sleep(30)
 
-    if timed_out:
-        log.warning("[HC] NONWORK RAMP: Timeout reached; finalizing ramp early")
+def _finish_nonwork_ramp(spec: dict, outcome: str):
+    """Non-work ramp completion: seamless handoff to Day mode"""
+    if outcome == "cancelled":
+        return
+    if outcome in ("timeout", "failed"):
+        log.warning(f"[HC] NONWORK RAMP: {outcome}; finalizing ramp early")
 
     # Ramp complete - transition to Day mode
+    target_brightness = spec["channels"]["brightness"][1]
     _set_sensor("sensor.sleep_in_ramp_brightness", target_brightness)
     _set_ramp_temperature(NONWORK_RAMP_END_TEMP)
     _set_boolean_state("sleep_in_ramp_active", "off")
-    _set_sensor("sensor.sleep_in_ramp_progress", 100, {
-        "friendly_name": "Morning Ramp Progress",
-        "unit_of_measurement": "%",
-        "ramp_type": "nonwork",
-        "target": target_brightness,
-        "start_time": start_time.isoformat(),
-        "end_time": end_time.isoformat()
-    })
+    _set_sensor("sensor.sleep_in_ramp_progress", 100, _morning_ramp_final_progress(spec))
+    if outcome == "failed":
+        # settle the ramp outputs only; Day still commits on its own boundary
+        _set_em_status("day_off_ramp_failed", {"at": _now().strftime('%H:%M:%S')})
+        return
 
     # Seamless handoff to Day mode
     _set_home_state("Day")
     _mark_em_end("nonwork_ramp_complete")
     _set_last_action("nonwork_ramp_to_day")
     _set_em_status("day_off_ramp_complete", {
-        "end": end_time.strftime('%H:%M:%S')
+        "end": spec["end"].strftime('%H:%M:%S')
     })
     _publish_em_contract()
     log.info(f"[HC] NONWORK RAMP: Complete, transitioned to Day at {target_brightness}% / {NONWORK_RAMP_END_TEMP}K")
@@ -1058,184 +2028,420 @@ def _enforce_workday_ramp_end():
 # ============================================================================
 # ENTITY INITIALIZATION
 # ============================================================================
+# Controller-owned entities and the default each gets when missing after a restart
+_ENTITY_DEFAULTS = (
+    ("sensor.night_started_on", ""),
+    ("binary_sensor.pys_night_cutover_pending", "off"),
+    ("sensor.day_earliest_time", "07:30:00"),
+    ("sensor.day_min_start", ""),
+    ("sensor.day_elev_target", 0),
+    ("binary_sensor.day_ready_now", "off"),
+    ("sensor.day_ready_reason", ""),
+    ("sensor.evening_start_local", ""),
+    ("binary_sensor.in_evening_window", "off"),
+    ("sensor.day_commit_time", ""),
+    ("sensor.day_target_brightness", 70),
+    ("sensor.pys_morning_ramp_profile", "unknown"),
+    ("sensor.pys_morning_ramp_reason", ""),
+    ("sensor.pys_em_start_time", ""),
+    ("sensor.pys_em_classification_time", ""),
+    ("sensor.pys_em_end_reason", ""),
+    ("sensor.pys_em_end_time", ""),
+    ("pyscript.motion_work_day_detected", "off"),
+    ("pyscript.evening_ramp_started_today", "off"),
+    ("pyscript.evening_done_today", "off"),
+    ("pyscript.evening_mode_active", "off"),
+    ("binary_sensor.pys_evening_preramp_active", "off"),
+    ("sensor.pys_evening_preramp_start_time", ""),
+    ("sensor.evening_last_reason", ""),
+    ("sensor.sleep_in_ramp_brightness", 10),
+    ("sensor.sleep_in_ramp_kelvin", 2000),
+    ("sensor.sleep_in_ramp_temperature", 2000),
+    ("input_boolean.sleep_in_ramp_active", "off"),
+    ("pyscript.sleep_in_ramp_active", "off"),
+    ("sensor.night_last_reason", ""),
+)
+
+# Everything else startup reads; prefetched together with the defaults above
+_STARTUP_READS = (
+    PHONE_1, PHONE_2, LIVINGROOM_TV, BEDROOM_TV,
+    "pyscript.home_state", "input_select.home_state", "pyscript.controller_enabled",
+    "pyscript.sunrise_today", "pyscript.sunset_today", "sun.sun",
+    "input_datetime.evening_time_cutoff", "input_datetime.day_earliest_time",
+    "input_text.em_route_key", "input_datetime.em_start_ts", "input_text.em_until",
+    "input_boolean.time_freeze_active", "input_datetime.sim_time_override", _PERF_HELPER,
+)
+
+
 @catch_hc_error("_ensure_entities")
 def _ensure_entities():
     """Ensure all required entities exist"""
     if _get("pyscript.home_state") is None:
         _set_home_state("Day")
     
-    entities_to_init = [
-        ("sensor.night_started_on", ""),
-        ("binary_sensor.pys_night_cutover_pending", "off"),
-        ("sensor.day_earliest_time", "07:30:00"),
-        ("sensor.day_min_start", ""),
-        ("sensor.day_elev_target", 0),
-        ("binary_sensor.day_ready_now", "off"),
-        ("sensor.day_ready_reason", ""),
-        ("sensor.evening_start_local", ""),
-        ("binary_sensor.in_evening_window", "off"),
-        ("sensor.day_commit_time", ""),
-        ("sensor.day_target_brightness", 70),
-        ("sensor.pys_morning_ramp_profile", "unknown"),
-        ("sensor.pys_morning_ramp_reason", ""),
-        ("sensor.pys_em_start_time", ""),
-        ("sensor.pys_em_classification_time", ""),
-        ("sensor.pys_em_end_reason", ""),
-        ("sensor.pys_em_end_time", ""),
-        ("pyscript.motion_work_day_detected", "off"),
-        ("pyscript.evening_ramp_started_today", "off"),
-        ("pyscript.evening_done_today", "off"),
-        ("pyscript.evening_mode_active", "off"),
-        ("binary_sensor.pys_evening_preramp_active", "off"),
-        ("sensor.pys_evening_preramp_start_time", ""),
-        ("sensor.evening_last_reason", ""),
-        ("sensor.sleep_in_ramp_brightness", 10),
-        ("sensor.sleep_in_ramp_kelvin", 2000),
-        ("sensor.sleep_in_ramp_temperature", 2000),
-        ("input_boolean.sleep_in_ramp_active", "off"),
-        ("pyscript.sleep_in_ramp_active", "off"),
-        ("sensor.night_last_reason", ""),
-    ]
-    
-    for eid, val in entities_to_init:
-        if _get(eid) is None:
-            _set_sensor(eid, val)
+    missing = [(eid, val) for eid, val in _ENTITY_DEFAULTS if _get(eid) is None]
+    for eid, val in missing:
+        _set_sensor(eid, val)
+    if missing:
+        log.info(f"[HC] Created {len(missing)} missing controller entities")
     
     if _get("pyscript.controller_enabled") is None:
         _set_sensor("pyscript.controller_enabled","on", {"friendly_name":"Home Controller Enabled"})
 
+    _build_boolean_registry()
+
 # ============================================================================
 # EARLY MORNING MODE - SET IN STONE
 # ============================================================================
 @catch_hc_error("_classify_kitchen_motion")
-def _classify_kitchen_motion(entity_id: str):
+async def _classify_kitchen_motion(entity_id: str):
+    """Single-flight front end: kitchen sensors firing together share one classification.
+
+    The first caller classifies; callers within _CLASSIFICATION_MERGE_SECONDS
+    join that flight, wait for its result (classification can yield) and are
+    recorded as sources once it is known, without re-reading any state.
+    """
+    global _classification_flight
+    if not entity_id:
+        return None
+    now = _now()
+    flight = _classification_flight
+    if flight and 0 <= (now - flight["opened"]).total_seconds() < _CLASSIFICATION_MERGE_SECONDS:
+        profile = await asyncio.shield(flight["result"])
+        if entity_id not in flight["entities"]:
+            flight["entities"].append(entity_id)
+            _journal("classification_merge", profile or "ignored", at=now, entity=entity_id)
+            if profile:
+                _set_sensor("sensor.pys_morning_ramp_profile", profile,
+                            {**flight["attrs"], "sources": list(flight["entities"])})
+        return profile
+    flight = _classification_flight = {"opened": now, "entities": [entity_id], "profile": None, "attrs": {},
+                                       "result": asyncio.get_running_loop().create_future()}
+    try:
+        flight["profile"] = await _run_kitchen_classification(entity_id, now)
+    finally:
+        # joiners see None if the classification itself failed
+        if not flight["result"].done():
+            flight["result"].set_result(flight["profile"])
+    return flight["profile"]
+
+
+async def _run_kitchen_classification(entity_id: str, now: datetime) -> Optional[str]:
     """
     SET IN STONE: Kitchen motion classification
     - Kitchen motion 04:50-05:00 = WORKDAY
     - Kitchen motion >=05:00 = DAY OFF
     - Only kitchen motion starts Early Morning mode
     """
-    global _morning_motion_classified_date, _morning_motion_profile, _work_ramp_task, _nonwork_ramp_task
+    global _morning_motion_classified_date, _morning_motion_profile
+    current_time = now.time()
     
-    with _classification_lock:
-        if not entity_id: 
-            return
-        
-        now = _now()
-        current_time = now.time()
-        
-        # Skip if Away mode or daily lock active
-        if _get_home_state() == "Away": 
-            log.info(f"[HC] Kitchen motion ignored - Away mode")
-            return
-        if _get_boolean_state("daily_motion_lock") == "on":
-            log.info("[HC] Kitchen motion ignored - daily motion lock active")
-            return
-        
-        # Skip if already classified today (persisted or in-memory)
-        if _morning_motion_classified_date == now.date(): 
-            log.info(f"[HC] Kitchen motion ignored - already classified today as {_morning_motion_profile}")
-            return
+    # Skip if Away mode or daily lock active
+    if _get_home_state() == "Away": 
+        log.info(f"[HC] Kitchen motion ignored - Away mode")
+        return None
+    if _get_boolean_state("daily_motion_lock") == "on":
+        log.info("[HC] Kitchen motion ignored - daily motion lock active")
+        return None
+    
+    # Skip if already classified today (persisted or in-memory)
+    if _morning_motion_classified_date == now.date(): 
+        log.info(f"[HC] Kitchen motion ignored - already classified today as {_morning_motion_profile}")
+        return None
 
-        existing_classification = _get("sensor.pys_em_classification_time")
-        if existing_classification:
-            try:
-                existing_dt = datetime.fromisoformat(str(existing_classification))
-                if existing_dt.date() == now.date():
-                    existing_profile = _get("sensor.pys_morning_ramp_profile")
-                    if existing_profile in ("work", "day_off"):
-                        _morning_motion_profile = existing_profile
-                    _morning_motion_classified_date = existing_dt.date()
-                    log.info(f"[HC] Kitchen motion ignored - persistent classification already set to {_morning_motion_profile}")
-                    return
-            except Exception as err:
-                log.warning(f"[HC] Could not parse existing classification '{existing_classification}': {err}")
-        
-        # Only process motion between 04:45 and 10:00
-        if current_time < PREWORK_MOTION_START or current_time >= MORNING_MOTION_WINDOW_END: 
-            log.info(f"[HC] Kitchen motion at {current_time.strftime('%H:%M')} - outside window")
-            return
+    existing_classification = _get("sensor.pys_em_classification_time")
+    if existing_classification:
+        try:
+            existing_dt = datetime.fromisoformat(str(existing_classification))
+            if existing_dt.date() == now.date():
+                existing_profile = _get("sensor.pys_morning_ramp_profile")
+                if existing_profile in ("work", "day_off"):
+                    _morning_motion_profile = existing_profile
+                _morning_motion_classified_date = existing_dt.date()
+                log.info(f"[HC] Kitchen motion ignored - persistent classification already set to {_morning_motion_profile}")
+                return None
+        except Exception as err:
+            log.warning(f"[HC] Could not parse existing classification '{existing_classification}': {err}")
+    
+    # Only process motion between 04:45 and 10:00
+    if current_time < PREWORK_MOTION_START or current_time >= MORNING_MOTION_WINDOW_END: 
+        log.info(f"[HC] Kitchen motion at {current_time.strftime('%H:%M')} - outside window")
+        return None
+
+    # SET IN STONE: Classification logic
+    prework = PREWORK_MOTION_START <= current_time < WORKDAY_MOTION_START
+    work_window = WORKDAY_MOTION_START <= current_time < WORKDAY_MOTION_END
+    workday = prework or work_window
+    profile = "work" if workday else "day_off"
+
+    override = str(_get("input_select.morning_day_type_override") or "auto").lower()
+    if override in ("work", "day_off"):
+        profile = override
+        workday = override == "work"
+        prework = prework if workday else False
+    
+    # Mark as classified for today
+    _morning_motion_classified_date = now.date()
+    _morning_motion_profile = profile
+    
+    log.info(f"[HC] *** KITCHEN MOTION DETECTED at {current_time.strftime('%H:%M:%S')} ***")
+    log.info(f"[HC] *** CLASSIFICATION: {profile.upper()} ***")
+    _journal("classification", profile, at=now, entity=entity_id, prework=prework, override=override)
+
+    _set_em_status("classified", {
+        "route": profile,
+        "prework": prework,
+        "entity": entity_id,
+        "time": current_time.strftime('%H:%M:%S')
+    })
+    _publish_em_contract()
 
-        # SET IN STONE: Classification logic
-        prework = PREWORK_MOTION_START <= current_time < WORKDAY_MOTION_START
-        work_window = WORKDAY_MOTION_START <= current_time < WORKDAY_MOTION_END
-        workday = prework or work_window
-        profile = "work" if workday else "day_off"
-
-        override = str(_get("input_select.morning_day_type_override") or "auto").lower()
-        if override in ("work", "day_off"):
-            profile = override
-            workday = override == "work"
-            prework = prework if workday else False
-        
-        # Mark as classified for today
-        _morning_motion_classified_date = now.date()
-        _morning_motion_profile = profile
-        
-        log.info(f"[HC] *** KITCHEN MOTION DETECTED at {current_time.strftime('%H:%M:%S')} ***")
-        log.info(f"[HC] *** CLASSIFICATION: {profile.upper()} ***")
-
-        _set_em_status("classified", {
-            "route": profile,
-            "prework": prework,
-            "entity": entity_id,
-            "time": current_time.strftime('%H:%M:%S')
-        })
-        _publish_em_contract()
+    # Set all the sensors
+    profile_attrs = {
+        "source": entity_id,
+        "reason": f"motion@{now.strftime('%H:%M')}",
+        "classified_at": now.isoformat()
+    }
+    if _classification_flight and _classification_flight["opened"] == now:
+        _classification_flight["attrs"] = profile_attrs
+    _set_sensor("sensor.pys_morning_ramp_profile", profile, {**profile_attrs, "sources": [entity_id]})
+    _set_sensor("sensor.pys_em_classification_time", now.isoformat(), {
+        "friendly_name": "Early Morning Classification Time"
+    })
+    _set_sensor("pyscript.motion_work_day_detected", "on" if workday else "off")
+    reason_suffix = f"motion@{now.strftime('%H:%M')}"
+    if prework:
+        reason_suffix = "prework_hold"
+    if override in ("work", "day_off"):
+        reason_suffix = f"override_{override}"
+    _set_sensor("sensor.pys_morning_ramp_reason", f"{entity_id} @ {reason_suffix}")
 
-        # Set all the sensors
-        _set_sensor("sensor.pys_morning_ramp_profile", profile, {
-            "source": entity_id, 
-            "reason": f"motion@{now.strftime('%H:%M')}",
-            "classified_at": now.isoformat()
-        })
-        _set_sensor("sensor.pys_em_classification_time", now.isoformat(), {
-            "friendly_name": "Early Morning Classification Time"
-        })
-        _set_sensor("pyscript.motion_work_day_detected", "on" if workday else "off")
-        reason_suffix = f"motion@{now.strftime('%H:%M')}"
-        if prework:
-            reason_suffix = "prework_hold"
-        if override in ("work", "day_off"):
-            reason_suffix = f"override_{override}"
-        _set_sensor("sensor.pys_morning_ramp_reason", f"{entity_id} @ {reason_suffix}")
+    _set_input_text("input_text.em_route_key", profile)
+    _set_input_datetime("input_datetime.em_start_ts", now)
+    _set_input_text("input_text.em_until", "")
+    _set_boolean_state("em_active", "on")
+
+    try:
+        service.call("input_datetime", "set_datetime",
+                     entity_id="input_datetime.first_kitchen_motion_today",
+                     datetime=now.strftime("%Y-%m-%d %H:%M:%S"))
+    except Exception:
+        pass
+
+    _set_boolean_state("daily_motion_lock", "on")
+    
+    # SET IN STONE: Set Early Morning mode IMMEDIATELY
+    log.info(f"[HC] Setting EARLY MORNING mode")
+    _set_home_state("Early Morning")
+    _set_last_action(f"kitchen_motion_{profile}→Early_Morning")
 
-        _set_input_text("input_text.em_route_key", profile)
-        _set_input_datetime("input_datetime.em_start_ts", now)
-        _set_input_text("input_text.em_until", "")
-        _set_boolean_state("em_active", "on")
+    # Start the appropriate ramp
+    classification_time = now
+    if prework:
+        classification_time = now.replace(hour=WORKDAY_MOTION_START.hour,
+                                          minute=WORKDAY_MOTION_START.minute,
+                                          second=0,
+                                          microsecond=0)
+    if workday:
+        # Start work ramp (10% → 50% until 05:40)
+        task.create(_start_work_ramp(restore_from_time=classification_time))
+    else:
+        # Start non-work ramp (10% → dynamic% until Day commit)
+        task.create(_start_nonwork_ramp(start_time_override=classification_time))
+    return profile
 
+# ============================================================================
+# YEAR SCHEDULE - sun-derived boundaries for a year ahead, memory-mapped
+# ============================================================================
+def _home_location() -> Optional[tuple]:
+    """(lat, lon) published by day_schedule, else zone.home"""
+    for entity_id in ("sensor.solar_ephemeris", "zone.home"):
         try:
-            service.call("input_datetime", "set_datetime",
-                         entity_id="input_datetime.first_kitchen_motion_today",
-                         datetime=now.strftime("%Y-%m-%d %H:%M:%S"))
-        except Exception:
-            pass
+            lat = _get(entity_id, attr="latitude")
+            lon = _get(entity_id, attr="longitude")
+            if lat is not None and lon is not None:
+                return float(lat), float(lon)
+        except (TypeError, ValueError):
+            continue
+    return None
+
+
+@pyscript_compile
+def _native_ephemeris(path: str):
+    """solar_ephemeris compiled as a plain Python module (loaded once per path, executor-safe)"""
+    module = sys.modules.get(_EPHEMERIS_NATIVE)
+    if module is None or module.__file__ != path:
+        spec = importlib.util.spec_from_file_location(_EPHEMERIS_NATIVE, path)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        sys.modules[_EPHEMERIS_NATIVE] = module
+    return module
+
+
+@pyscript_compile
+def _schedule_compute(first: int, days: int, lat: float, lon: float, floor_min: int,
+                      evening_offset_min: int, monthly_targets: dict, ephemeris_path: str) -> array:
+    """All rows in one pass (runs in executor); each day uses that day's UTC offset"""
+    solar_ephemeris = _native_ephemeris(ephemeris_path)
+    rows = array("i")
+    for ordinal in range(first, first + days):
+        day = date.fromordinal(ordinal)
+        midnight = datetime.combine(day, dt_time(0))
+        tz = datetime.combine(day, dt_time(12)).astimezone().tzinfo
+        events = solar_ephemeris.sun_events(day, lat, lon, tz)
+        crossing = solar_ephemeris.elevation_crossing(day, lat, lon, tz, monthly_targets.get(day.month, 10))
+
+        def seconds(moment):
+            return -1 if moment is None else int((moment.replace(tzinfo=None) - midnight).total_seconds())
+
+        sunrise, sunset, ready = seconds(events["sunrise"]), seconds(events["sunset"]), seconds(crossing)
+        evening = sunset - evening_offset_min * 60 if sunset >= 0 else -1
+        min_start = sunrise + int(_DAY_MIN_START_OFFSET.total_seconds()) if sunrise >= 0 else -1
+        commit = max(floor_min * 60, min_start, ready) if ready >= 0 else -1
+        rows.extend((sunrise, sunset, evening, min_start, ready, commit))
+    return rows
+
+
+@pyscript_compile
+def _schedule_write(path: str, header: bytes, rows: array):
+    """Write the table atomically (runs in executor)"""
+    tmp = f"{path}.tmp"
+    with open(tmp, "wb") as handle:
+        handle.write(header)
+        rows.tofile(handle)
+    os.replace(tmp, path)
+
+
+@pyscript_compile
+def _schedule_map(path: str):
+    """(header fields, mmap, int32 row view) of a table file, or None if unusable"""
+    try:
+        with open(path, "rb") as handle:
+            mapped = mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError):
+        return None
+    fields = _SCHEDULE_HEADER.unpack_from(mapped, 0) if len(mapped) >= _SCHEDULE_HEADER.size else None
+    if not fields or fields[0] != _SCHEDULE_MAGIC:
+        mapped.close()
+        return None
+    rows = memoryview(mapped)[_SCHEDULE_HEADER.size:].cast("i")
+    if len(rows) != fields[2] * len(_SCHEDULE_COLUMNS):
+        rows.release()
+        mapped.close()
+        return None
+    return fields, mapped, rows
+
+
+def _schedule_params() -> Optional[tuple]:
+    """What a table covering today should have been built with (None without a location)"""
+    location = _home_location()
+    if location is None:
+        return None
+    floor = _get_day_earliest_time_floor()
+    return location, floor.hour * 60 + floor.minute, EVENING_START_OFFSET_MINUTES
+
+
+def _schedule_matches(params: tuple, today: date) -> bool:
+    if not _schedule:
+        return False
+    (lat, lon), floor_min, offset = params
+    remaining = _schedule["first"] + _schedule["days"] - today.toordinal()
+    return (abs(_schedule["lat"] - lat) < 1e-4 and abs(_schedule["lon"] - lon) < 1e-4
+            and _schedule["floor"] == floor_min and _schedule["offset"] == offset
+            and _schedule["first"] <= today.toordinal() and remaining > _SCHEDULE_REBUILD_MARGIN)
+
+
+def _schedule_attach(mapped) -> bool:
+    """Swap in a mapped table (None clears it)"""
+    old_rows, old_map = _schedule.get("rows"), _schedule.get("map")
+    _schedule.clear()
+    if mapped:
+        (_magic, first, days, lat, lon, floor_min, offset), handle, rows = mapped
+        _schedule.update({"first": first, "days": days, "lat": lat, "lon": lon,
+                          "floor": floor_min, "offset": offset, "rows": rows, "map": handle})
+    if old_rows is not None:
+        old_rows.release()
+        old_map.close()
+    return bool(mapped)
+
+
+def _schedule_ensure():
+    """Map the table (startup, midnight) and rebuild when missing or stale, all in one background task"""
+    global _schedule_build_task
+    today = _now().date()
+    params = _schedule_params()
+    if params is None or (_schedule and _schedule_matches(params, today)):
+        return
+    if _schedule_build_task is None or _schedule_build_task.done():
+        _schedule_build_task = task.create(_schedule_load(today, params))
 
-        _set_boolean_state("daily_motion_lock", "on")
-        
-        # SET IN STONE: Set Early Morning mode IMMEDIATELY
-        log.info(f"[HC] Setting EARLY MORNING mode")
-        _set_home_state("Early Morning")
-        _set_last_action(f"kitchen_motion_{profile}→Early_Morning")
 
-        # Start the appropriate ramp
-        classification_time = now
-        if prework:
-            classification_time = now.replace(hour=WORKDAY_MOTION_START.hour,
-                                              minute=WORKDAY_MOTION_START.minute,
-                                              second=0,
-                                              microsecond=0)
-        if workday:
-            # Start work ramp (10% → 50% until 05:40)
-            _cancel_task_if_running(_work_ramp_task, "work_ramp")
-            _cancel_task_if_running(_nonwork_ramp_task, "nonwork_ramp")
-            _work_ramp_task = task.create(_start_work_ramp(restore_from_time=classification_time))
-        else:
-            # Start non-work ramp (10% → dynamic% until Day commit)
-            _cancel_task_if_running(_nonwork_ramp_task, "nonwork_ramp")
-            _cancel_task_if_running(_work_ramp_task, "work_ramp")
-            _nonwork_ramp_task = task.create(_start_nonwork_ramp(start_time_override=classification_time))
+async def _schedule_load(today: date, params: tuple):
+    """open()/mmap in the executor, attach on the loop; rebuild if the mapped table does not fit"""
+    if not _schedule:
+        if _schedule_attach(await task.executor(_schedule_map, _SCHEDULE_PATH)):
+            _refresh_daily_constants()
+            _arm_transition_timer()
+    if not _schedule_matches(params, today):
+        await _schedule_rebuild(today, params)
+
+
+async def _schedule_rebuild(today: date, params: tuple):
+    (lat, lon), floor_min, offset = params
+    started = perf_counter()
+    try:
+        rows = await task.executor(_schedule_compute, today.toordinal(), _SCHEDULE_DAYS, lat, lon,
+                                   floor_min, offset, dict(MONTHLY_ELEV_TARGET), _EPHEMERIS_PATH)
+        header = _SCHEDULE_HEADER.pack(_SCHEDULE_MAGIC, today.toordinal(), _SCHEDULE_DAYS,
+                                       lat, lon, floor_min, offset)
+        await task.executor(_schedule_write, _SCHEDULE_PATH, header, rows)
+        mapped = await task.executor(_schedule_map, _SCHEDULE_PATH)
+    except Exception as exc:
+        log.warning(f"[HC] Year schedule build failed: {exc}")
+        return
+    _schedule_attach(mapped)
+    log.info(f"[HC] Year schedule rebuilt: {_SCHEDULE_DAYS} days in {perf_counter() - started:.2f}s")
+    _refresh_daily_constants()
+    _arm_transition_timer()
+
+
+def _schedule_row(day: date) -> Optional[dict]:
+    """One day of the table as naive local datetimes (O(1); None outside the table)"""
+    if not _schedule:
+        return None
+    index = day.toordinal() - _schedule["first"]
+    if not 0 <= index < _schedule["days"]:
+        return None
+    width = len(_SCHEDULE_COLUMNS)
+    midnight = datetime.combine(day, dt_time(0))
+    values = _schedule["rows"][index * width:(index + 1) * width]
+    return {column: (midnight + timedelta(seconds=value) if value >= 0 else None)
+            for column, value in zip(_SCHEDULE_COLUMNS, values)}
+
+
+@service("pyscript.home_controller_schedule")
+@catch_hc_error("home_controller_schedule")
+def home_controller_schedule(start: str = None, days: int = 7, rebuild: bool = False):
+    """Rows of the year schedule for dashboards (start = ISO date, default today)"""
+    global _schedule_build_task
+    today = _now().date()
+    if rebuild:
+        params = _schedule_params()
+        if params is None:
+            return {"error": "no location (sensor.solar_ephemeris / zone.home)"}
+        _schedule_build_task = task.create(_schedule_rebuild(today, params))
+        return {"rebuilding": True}
+    first = date.fromisoformat(start) if start else today
+    rows = []
+    for offset in range(max(0, min(int(days), _SCHEDULE_DAYS))):
+        day = first + timedelta(days=offset)
+        row = _schedule_row(day)
+        if row is None:
+            break
+        rows.append({"date": day.isoformat(),
+                     **{key: value.isoformat() if value else None for key, value in row.items()}})
+    return {"first": date.fromordinal(_schedule["first"]).isoformat() if _schedule else None,
+            "days": _schedule.get("days", 0), "rows": rows}
 
 # ============================================================================
 # DAILY CONSTANTS CACHING
@@ -1251,48 +2457,60 @@ def _refresh_daily_constants():
     
     now = _now()
 
-    # Calculate evening_start_local = sunset_today - 15m
-    sunset = _get("pyscript.sunset_today")
-    if sunset:
-        try:
-            sunset_dt = datetime.fromisoformat(str(sunset))
-            start_dt = sunset_dt - timedelta(minutes=EVENING_START_OFFSET_MINUTES)
-            if start_dt.tzinfo is not None:
-                start_dt = start_dt.replace(tzinfo=None)
-            _cached_evening_start = start_dt
-            _set_sensor("sensor.evening_start_local", start_dt.isoformat())
-        except Exception as e:
-            log.warning(f"[HC] sunset parse error: {e}")
+    row = _schedule_row(now.date())
+    if row and row["evening_start"] and row["day_min_start"]:
+        # O(1) lookup in the precomputed year table
+        _cached_evening_start = row["evening_start"]
+        _cached_day_min_start = row["day_min_start"]
+        _set_sensor("sensor.evening_start_local", row["evening_start"].isoformat(), {"source": "year_schedule"})
+        _set_sensor("sensor.day_min_start", row["day_min_start"].isoformat(), {
+            "source": "year_schedule",
+            "day_ready": row["day_ready"].isoformat() if row["day_ready"] else None,
+            "projected_commit": row["projected_commit"].isoformat() if row["projected_commit"] else None,
+        })
+    else:
+        # Calculate evening_start_local = sunset_today - 15m
+        sunset = _get("pyscript.sunset_today")
+        if sunset:
+            try:
+                sunset_dt = datetime.fromisoformat(str(sunset))
+                start_dt = sunset_dt - timedelta(minutes=EVENING_START_OFFSET_MINUTES)
+                if start_dt.tzinfo is not None:
+                    start_dt = start_dt.replace(tzinfo=None)
+                _cached_evening_start = start_dt
+                _set_sensor("sensor.evening_start_local", start_dt.isoformat())
+            except Exception as e:
+                log.warning(f"[HC] sunset parse error: {e}")
+                _cached_evening_start = None
+                _set_sensor("sensor.evening_start_local", "", {"error": "parse_failed"})
+                _notify_missing_helper("pyscript.sunset_today", "Evening window disabled until helper restores")
+        else:
             _cached_evening_start = None
-            _set_sensor("sensor.evening_start_local", "", {"error": "parse_failed"})
+            _set_sensor("sensor.evening_start_local", "", {"error": "missing"})
             _notify_missing_helper("pyscript.sunset_today", "Evening window disabled until helper restores")
-    else:
-        _cached_evening_start = None
-        _set_sensor("sensor.evening_start_local", "", {"error": "missing"})
-        _notify_missing_helper("pyscript.sunset_today", "Evening window disabled until helper restores")
-        _set_sensor("binary_sensor.in_evening_window", "off", {"reason": "sunset_missing"})
+            _set_sensor("binary_sensor.in_evening_window", "off", {"reason": "sunset_missing"})
     
-    # Calculate day_min_start = sunrise_today + 30m
-    sunrise = _get("pyscript.sunrise_today")
-    if sunrise:
-        try:
-            sunrise_dt = datetime.fromisoformat(str(sunrise))
-            dms = sunrise_dt + timedelta(minutes=30)
-            if dms.tzinfo is not None:
-                dms = dms.replace(tzinfo=None)
-            _cached_day_min_start = dms
-            _set_sensor("sensor.day_min_start", dms.isoformat())
-        except Exception as e:
-            log.warning(f"[HC] sunrise parse error: {e}")
+        # Calculate day_min_start = sunrise_today + 30m
+        sunrise = _get("pyscript.sunrise_today")
+        if sunrise:
+            try:
+                sunrise_dt = datetime.fromisoformat(str(sunrise))
+                dms = sunrise_dt + timedelta(minutes=30)
+                if dms.tzinfo is not None:
+                    dms = dms.replace(tzinfo=None)
+                _cached_day_min_start = dms
+                _set_sensor("sensor.day_min_start", dms.isoformat())
+            except Exception as e:
+                log.warning(f"[HC] sunrise parse error: {e}")
+                fallback_dt = now.replace(hour=7, minute=30, second=0, microsecond=0)
+                _cached_day_min_start = fallback_dt
+                _set_sensor("sensor.day_min_start", fallback_dt.isoformat(), {"fallback": "07:30"})
+                _notify_missing_helper("pyscript.sunrise_today", "Day readiness locked to 07:30 floor")
+        else:
             fallback_dt = now.replace(hour=7, minute=30, second=0, microsecond=0)
             _cached_day_min_start = fallback_dt
             _set_sensor("sensor.day_min_start", fallback_dt.isoformat(), {"fallback": "07:30"})
             _notify_missing_helper("pyscript.sunrise_today", "Day readiness locked to 07:30 floor")
-    else:
-        fallback_dt = now.replace(hour=7, minute=30, second=0, microsecond=0)
-        _cached_day_min_start = fallback_dt
-        _set_sensor("sensor.day_min_start", fallback_dt.isoformat(), {"fallback": "07:30"})
-        _notify_missing_helper("pyscript.sunrise_today", "Day readiness locked to 07:30 floor")
     
     # Get monthly elevation target
     mon = _now().month
@@ -1313,7 +2531,7 @@ def _refresh_daily_constants():
 
 @catch_hc_error("_update_in_evening_window_flag")
 def _update_in_evening_window_flag():
-    """Update evening window flag (called minutely)"""
+    """Update evening window flag (called on each transition evaluation)"""
     start_dt = _cached_evening_start
     cutoff_hm = _cached_cutoff_hm or (_get_evening_cutoff_time().hour, _get_evening_cutoff_time().minute)
     
@@ -1330,108 +2548,354 @@ def _update_in_evening_window_flag():
         "cutoff": f"{cutoff_hm[0]:02d}:{cutoff_hm[1]:02d}:00"
     })
 
+def _day_ready_plan_for(day: date, target: float) -> Optional[dict]:
+    """Today's elevation crossings for target (on) and target-3° (off), computed once per day/target/location"""
+    global _day_ready_plan
+    location = _home_location()
+    plan = _day_ready_plan
+    if plan and plan["date"] == day and plan["target"] == target and plan["location"] == location:
+        return plan
+    if location is None:
+        return None
+    lat, lon = location
+    tz = datetime.combine(day, dt_time(12)).astimezone().tzinfo
+    row = _schedule_row(day)
+    if row and row["day_ready"] and target == MONTHLY_ELEV_TARGET.get(day.month, 10):
+        rise, source = row["day_ready"], "year_schedule"
+    else:
+        crossing = solar_ephemeris.elevation_crossing(day, lat, lon, tz, target)
+        rise, source = (crossing.astimezone(tz).replace(tzinfo=None) if crossing else None), "ephemeris"
+    # Same 3° hysteresis as before: readiness lapses once the sun drops below target-3° in the afternoon
+    fall = solar_ephemeris.elevation_crossing(day, lat, lon, tz, target - 3.0, rising=False)
+    _day_ready_plan = {
+        "date": day, "target": target, "location": location, "rise": rise, "source": source,
+        "fall": fall.astimezone(tz).replace(tzinfo=None) if fall else None,
+        "verified": None,
+    }
+    return _day_ready_plan
+
+
+def _day_ready_window(now: datetime) -> Optional[tuple]:
+    """(on_at, off_at) for today: max(day_min_start, floor, elevation crossing) until the afternoon crossing"""
+    dms = _cached_day_min_start
+    if not isinstance(dms, datetime):
+        return None
+    target = float(_cached_day_elev_target if _cached_day_elev_target is not None else 10)
+    plan = _day_ready_plan_for(now.date(), target)
+    if plan is None:
+        return None
+    if plan["rise"] is None:
+        return None, None
+    floor_time = _get_day_earliest_time_floor()
+    floor_dt = now.replace(hour=floor_time.hour, minute=floor_time.minute, second=0, microsecond=0)
+    return max(dms.replace(tzinfo=None), floor_dt, plan["rise"]), plan["fall"]
+
+
+def _day_ready_scheduled(now: datetime, on_at: Optional[datetime], off_at: Optional[datetime]) -> bool:
+    return on_at is not None and on_at <= now and (off_at is None or now < off_at)
+
+
+def _day_ready_verify(now: datetime, elev: float, target: float, on_at: Optional[datetime],
+                      scheduled: bool) -> str:
+    """"elevation_low" (warned once a day) while the schedule says ready but sun.sun is below target-3°"""
+    if not scheduled or elev >= target - 3.0:
+        return "ok"
+    # ephemeris and sun.sun disagree by more than the hysteresis band: keep the schedule, say so
+    if _day_ready_plan.get("verified") != now.date():
+        _day_ready_plan["verified"] = now.date()
+        log.warning(f"[HC] Day ready at {on_at.strftime('%H:%M:%S')} but sun.sun reports {elev:.1f}° "
+                    f"(target {target:.1f}°); check latitude/longitude")
+    return "elevation_low"
+
+
 @catch_hc_error("_update_day_ready_flag")
 def _update_day_ready_flag():
-    """Update day ready flag with hysteresis"""
-    global _day_ready_hysteresis_active, _day_ready_last_state, _day_ready_candidate_state, _day_ready_candidate_since
+    """Set day ready from the predicted crossing; live elevation only verifies it (or decides, without a location)"""
+    global _day_ready_last_state
 
     dms = _cached_day_min_start
     target = _cached_day_elev_target if _cached_day_elev_target is not None else 10
+    if isinstance(dms, str):
+        try:
+            dms = datetime.fromisoformat(dms)
+        except ValueError:
+            dms = None
     
     if not dms:
         _set_sensor("binary_sensor.day_ready_now", "off")
         _set_sensor("sensor.day_ready_reason", "waiting_for_day_constants")
-        _day_ready_candidate_state = None
-        _day_ready_candidate_since = None
         return
     
     now = _now()
-    floor_time = _get_day_earliest_time_floor()
-    floor_dt = now.replace(hour=floor_time.hour, minute=floor_time.minute, second=0, microsecond=0)
-    dms_dt = dms
-    if isinstance(dms_dt, str):
-        try:
-            dms_dt = datetime.fromisoformat(dms_dt)
-        except Exception:
-            dms_dt = now.replace(hour=floor_time.hour, minute=floor_time.minute, second=0, microsecond=0)
-    if isinstance(dms_dt, datetime) and dms_dt.tzinfo is not None:
-        dms_dt = dms_dt.replace(tzinfo=None)
-    time_ok = now >= max(dms_dt, floor_dt)
-    
     elev = _get("sun.sun", attr="elevation")
     try:
         elev = float(elev) if elev is not None else -90.0
     except Exception:
         elev = -90.0
-    
-    # Hysteresis: different thresholds for on/off
-    threshold = float(target) - 3.0 if _day_ready_last_state else float(target)
-    elev_ok = elev >= threshold
-    
     not_in_evening = (_get("binary_sensor.in_evening_window") != "on")
-    conditions_met = time_ok and elev_ok and not_in_evening
-
-    if conditions_met != _day_ready_last_state:
-        if _day_ready_candidate_state != conditions_met:
-            _day_ready_candidate_state = conditions_met
-            _day_ready_candidate_since = now
-        elif _day_ready_candidate_since and (now - _day_ready_candidate_since).total_seconds() >= _DAY_READY_DEBOUNCE_SECONDS:
-            _day_ready_last_state = conditions_met
-            _day_ready_candidate_state = None
-            _day_ready_candidate_since = None
+
+    window = _day_ready_window(now)
+    if window is not None:
+        on_at, off_at = window
+        scheduled = _day_ready_scheduled(now, on_at, off_at)
+        verify = _day_ready_verify(now, elev, float(target), on_at, scheduled)
+        ready = scheduled and not_in_evening
+        reason = (
+            f"ready_at={on_at.strftime('%H:%M:%S') if on_at else 'never'}, "
+            f"until={off_at.strftime('%H:%M:%S') if off_at else 'none'}, "
+            f"elev={elev:.1f}° (target={float(target):.1f}°, {_day_ready_plan['source']}), "
+            f"not_in_evening={str(not_in_evening).lower()}, verify={verify}"
+        )
     else:
-        _day_ready_candidate_state = None
-        _day_ready_candidate_since = None
+        # No location: fall back to the live elevation with the ±3° hysteresis
+        floor_time = _get_day_earliest_time_floor()
+        floor_dt = now.replace(hour=floor_time.hour, minute=floor_time.minute, second=0, microsecond=0)
+        time_ok = now >= max(dms.replace(tzinfo=None), floor_dt)
+        threshold = float(target) - 3.0 if _day_ready_last_state else float(target)
+        ready = time_ok and elev >= threshold and not_in_evening
+        comparator = "≥" if elev >= threshold else "<"
+        reason = (
+            f"time_ok={str(time_ok).lower()}, elev={elev:.1f}° {comparator} {threshold:.1f}° (target={float(target):.1f}°), "
+            f"not_in_evening={str(not_in_evening).lower()}, source=live_elevation"
+        )
 
-    ready = _day_ready_last_state
+    _day_ready_last_state = ready
     _set_sensor("binary_sensor.day_ready_now", "on" if ready else "off")
-
-    debounce_note = "idle"
-    if _day_ready_candidate_state is not None and _day_ready_candidate_since:
-        elapsed = (now - _day_ready_candidate_since).total_seconds()
-        remaining = max(0, int(_DAY_READY_DEBOUNCE_SECONDS - elapsed))
-        state_label = "awaiting_on" if _day_ready_candidate_state else "awaiting_off"
-        debounce_note = f"{state_label}:{remaining}s"
-
-    comparator = "≥" if elev >= threshold else "<"
-    reason = (
-        f"time_ok={str(time_ok).lower()}, elev={elev:.1f}° {comparator} {threshold:.1f}° (target={float(target):.1f}°), "
-        f"not_in_evening={str(not_in_evening).lower()}, debounce={debounce_note}"
-    )
     _set_sensor("sensor.day_ready_reason", reason)
 
 
 @catch_hc_error("_maybe_transition_to_day")
 def _maybe_transition_to_day(reason: str) -> bool:
     """Transition to Day mode when conditions allow"""
-    if _get("binary_sensor.day_ready_now") != "on":
-        return False
-    if _get("binary_sensor.in_evening_window") == "on":
-        return False
+    return _dispatch_transition("day_ready", reason) == "Day"
+
+# ============================================================================
+# MODE TRANSITION TABLE - (mode, event) → first rule whose guards all hold
+# ============================================================================
+def _guard_night_hours(ctx: dict) -> bool:
+    now_t = ctx["now"].time()
+    return now_t >= _get_evening_cutoff_time() or now_t < dt_time(4, 45)
+
+
+# Each guard is evaluated at most once per event (see _dispatch_transition)
+_TRANSITION_GUARDS = {
+    "day_ready": lambda ctx: _get("binary_sensor.day_ready_now") == "on",
+    "in_evening_window": lambda ctx: _get("binary_sensor.in_evening_window") == "on",
+    "ramp_active": lambda ctx: _get_boolean_state("sleep_in_ramp_active") == "on",
+    "night_started_today": lambda ctx: _night_started_on() == _today_str(),
+    "evening_done": lambda ctx: _get_boolean_state("evening_done_today") == "on",
+    "night_hours": _guard_night_hours,
+}
+
+
+def _end_evening_if_active(reason: str):
+    if _get_home_state() == "Evening" or _get_boolean_state("evening_mode_active") == "on":
+        _end_evening(reason, mark_done=False)
+
+
+def _act_night_to_day(ctx: dict):
+    _clear_cutover_pending()
+    _set_home_state("Day")
+    _set_last_action(f"day_ready→Day:{ctx['reason']}")
+
+
+def _act_em_to_day(ctx: dict):
+    _mark_em_end("day_ready_transition")
+    _set_home_state("Day")
+    _set_last_action(f"day_ready→Day:{ctx['reason']}")
+
+
+def _act_auto_evening(ctx: dict):
+    _enter_evening("auto_day_to_evening", force=True)
+
+
+def _act_return_night(ctx: dict):
+    log.info("[HC][PRESENCE] Branch: Returning during Night hours.")
+    lr_on = not _offish(str(_get(LIVINGROOM_TV) or "").lower())
+    _enter_night(run_cutover=not lr_on, reason="presence_return_after_away")
+
+
+def _act_return_evening(ctx: dict):
+    log.info("[HC][PRESENCE] Branch: Returning during Evening window.")
+    if _night_started_on() == _today_str():
+        log.info("[HC][PRESENCE] Evening return detected before cutoff with stale night flag. Clearing night_started_on to allow re-entry.")
+        _set_sensor("sensor.night_started_on", "", {
+            "friendly_name": "Night Started On",
+            "cleared_due_to": "evening_return_before_cutoff"
+        })
+    # Returning from Away re-enters Evening even if it already ran today
+    if _enter_evening("presence_return_after_away", force=True):
+        log.info("[HC][PRESENCE] Successfully entered Evening mode.")
+        _start_evening_ramp_if_needed()
+
+
+def _act_return_day(ctx: dict):
+    log.info("[HC][PRESENCE] Branch: Defaulting to Day mode.")
+    _set_home_state("Day")
+    _set_last_action(f"returned_home:{ctx['entity']}→Day")
+
 
-    current = _get_home_state()
-    if current == "Night":
+def _act_go_away(ctx: dict):
+    # SET IN STONE: On workday after 05:40, presence→Away ends Early Morning
+    if (ctx["from"] == "Early Morning" and
+        str(_get("pyscript.motion_work_day_detected") or "off").lower() == "on" and
+        ctx["now"].time() >= WORK_RAMP_END_TIME):
+        log.info("[HC][PRESENCE] Ending Early Morning due to Away transition.")
+        _mark_em_end("workday_presence_away")
+        _set_boolean_state("sleep_in_ramp_active", "off")
+    _end_evening_if_active("presence_away")
+    _set_home_state("Away")
+    if _get("binary_sensor.pys_night_cutover_pending") == "on":
         _clear_cutover_pending()
-        _set_home_state("Day")
-        _set_last_action(f"day_ready→Day:{reason}")
-        return True
+    if _is_waiting_for_bedroom_tv():
+        _clear_waiting_for_bedroom_tv("presence_away")
+    try:
+        on_lights = _lights_on()
+        if on_lights:
+            log.info(f"[HC][PRESENCE] Turning off lights for Away: {on_lights}")
+            _dispatch_lights("turn_off", on_lights, "presence_away")
+    except Exception as exc:
+        log.warning(f"[HC][PRESENCE] Error turning off lights during Away: {exc}")
+    _set_last_action(f"went_away:{ctx['entity']}")
+
+
+def _act_manual_night(ctx: dict):
+    _enter_night(run_cutover=True, reason="manual_input_select")
+
+
+def _act_manual_evening(ctx: dict):
+    _enter_evening("manual_input_select", force=True)
+
+
+def _act_manual_mode(ctx: dict):
+    target = ctx["to"]
+    if target in ("Away", "Day"):
+        _end_evening_if_active(f"manual_{target.lower()}")
+    _set_home_state(target)
+
+
+_HOME_MODES = ("Early Morning", "Day", "Evening", "Night", "Away")
+
+
+def _modes_except(*excluded: str) -> tuple:
+    return tuple(mode for mode in _HOME_MODES if mode not in excluded)
+
+
+# (from modes, event, guards ("!" negates), target mode, action); order matters per key
+_TRANSITION_RULES = (
+    (("Night",), "tick", ("day_ready", "!in_evening_window"), "Day", _act_night_to_day),
+    (("Early Morning",), "tick", ("day_ready", "!in_evening_window", "!ramp_active"), "Day", _act_em_to_day),
+    (("Day",), "tick", ("in_evening_window", "!night_started_today", "!evening_done"), "Evening", _act_auto_evening),
+    (("Night",), "day_ready", ("day_ready", "!in_evening_window"), "Day", _act_night_to_day),
+    (("Early Morning",), "day_ready", ("day_ready", "!in_evening_window", "!ramp_active"), "Day", _act_em_to_day),
+    (("Away",), "presence_home", ("night_hours",), "Night", _act_return_night),
+    (("Away",), "presence_home", ("in_evening_window",), "Evening", _act_return_evening),
+    (("Away",), "presence_home", (), "Day", _act_return_day),
+    (_modes_except("Away"), "presence_away", (), "Away", _act_go_away),
+    (_HOME_MODES, "manual:Night", (), "Night", _act_manual_night),
+    (_HOME_MODES, "manual:Evening", (), "Evening", _act_manual_evening),
+    (_modes_except("Away"), "manual:Away", (), "Away", _act_manual_mode),
+    (_modes_except("Day"), "manual:Day", (), "Day", _act_manual_mode),
+    (_modes_except("Early Morning"), "manual:Early Morning", (), "Early Morning", _act_manual_mode),
+)
+
+
+def _compile_transitions(rules) -> dict:
+    """Expand rules into {(mode, event): [(index, guards, target, action), ...]}"""
+    table = {}
+    for index, (modes, event, guards, target, action) in enumerate(rules):
+        compiled_guards = []
+        for guard in guards:
+            name = guard.lstrip("!")
+            if name not in _TRANSITION_GUARDS:
+                raise ValueError(f"transition rule {index}: unknown guard {name}")
+            compiled_guards.append((name, not guard.startswith("!")))
+        for mode in modes:
+            table.setdefault((mode, event), []).append((index, tuple(compiled_guards), target, action))
+    return table
+
+
+_TRANSITION_TABLE = _compile_transitions(_TRANSITION_RULES)
+_TRANSITION_TRACE_SIZE = 100
+_transition_trace = deque(maxlen=_TRANSITION_TRACE_SIZE)  # newest decision last
+
+
+def _select_transition(mode: str, event: str, guard_value):
+    """First matching rule for (mode, event); guard_value(name) → bool"""
+    for rule in _TRANSITION_TABLE.get((mode, event), ()):
+        if all(guard_value(name) == expected for name, expected in rule[1]):
+            return rule
+    return None
+
+
+@catch_hc_error("_dispatch_transition")
+@with_hc_snapshot
+def _dispatch_transition(event: str, reason: str = "", mode: str = None, **ctx):
+    """Run the transition table for one event; returns the target mode or None"""
+    mode = mode or _get_home_state()
+    ctx.update(event=event, reason=reason or event, now=_now(), **{"from": mode})
+    guards = {}
+
+    def guard_value(name: str) -> bool:
+        if name not in guards:
+            guards[name] = bool(_TRANSITION_GUARDS[name](ctx))
+        return guards[name]
+
+    rule = _select_transition(mode, event, guard_value)
+    _transition_trace.append({
+        "at": ctx["now"].isoformat(timespec="seconds"),
+        "event": event,
+        "from": mode,
+        "to": rule[2] if rule else None,
+        "rule": rule[0] if rule else None,
+        "guards": guards,
+        "reason": ctx["reason"],
+    })
+    if rule is None:
+        return None
+    ctx["to"] = rule[2]
+    rule[3](ctx)
+    return rule[2]
 
-    if current == "Early Morning" and _get_boolean_state("sleep_in_ramp_active") != "on":
-        _mark_em_end("day_ready_transition")
-        _set_home_state("Day")
-        _set_last_action(f"day_ready→Day:{reason}")
-        return True
 
-    return False
+def _replay_transition(record: dict):
+    """Re-decide a traced event from its recorded guard values (no state access)"""
+    rule = _select_transition(record["from"], record["event"], record["guards"].__getitem__)
+    return rule[2] if rule else None
 
 # ============================================================================
 # DAY COMMIT TIME AND BRIGHTNESS TARGET
 # ============================================================================
+def _memoized(name: str, key: tuple, compute):
+    """compute() cached under key; a few recent keys kept per name"""
+    entries = _memo_cache.setdefault(name, {})
+    stats = _memo_stats.setdefault(name, {"hits": 0, "misses": 0})
+    if key in entries:
+        stats["hits"] += 1
+        return entries[key]
+    stats["misses"] += 1
+    value = compute()
+    if len(entries) >= _MEMO_MAX_ENTRIES:
+        entries.pop(next(iter(entries)))
+    entries[key] = value
+    return value
+
+
 @catch_hc_error("_compute_day_commit_time")
 def _compute_day_commit_time() -> datetime | None:
     """Compute day_commit_time = max(day_min_start, floor, learned_day_start)"""
     now = _now()
+    raw = {name: _get(name) for name in _DAY_FLOOR_HELPERS + _DAY_MIN_START_HELPERS + _DAY_LEARNED_HELPERS}
+    commit = _memoized("day_commit_time", (now.date(), tuple(raw.values())),
+                       lambda: _day_commit_candidates(now, raw))
+    if commit < now:
+        log.warning(f"[HC] DAY COMMIT: Computed commit time {commit.strftime('%H:%M')} is in the past; clamping to now")
+        commit = now.replace(second=0, microsecond=0)
+    return commit
+
 
+def _day_commit_candidates(now: datetime, helper_values: dict) -> datetime:
+    """Latest of floor / day_min_start / learned start from the raw helper values"""
     def _coerce_to_datetime(raw_value, source_name: str) -> datetime | None:
         if raw_value in (None, "", "None"):
             return None
@@ -1452,8 +2916,8 @@ def _compute_day_commit_time() -> datetime | None:
             log.warning(f"[HC] DAY COMMIT: Failed to parse {source_name}='{raw_value}': {exc}")
             return None
 
-    def _resolve_helper_datetime(source_names: list[str], fallback_desc: str) -> tuple[datetime | None, str | None]:
-        sources = [(name, _get(name)) for name in source_names]
+    def _resolve_helper_datetime(source_names, fallback_desc: str) -> tuple[datetime | None, str | None]:
+        sources = [(name, helper_values.get(name)) for name in source_names]
         missing_names: list[str] = []
         for name, raw in sources:
             candidate = _coerce_to_datetime(raw, name)
@@ -1477,10 +2941,7 @@ def _compute_day_commit_time() -> datetime | None:
         microsecond=0
     )
 
-    floor_dt, floor_source = _resolve_helper_datetime([
-        "input_datetime.day_earliest_time",
-        "pyscript.day_earliest_time",
-    ], f"Using default earliest floor {_DEFAULT_DAY_FLOOR.strftime('%H:%M')}")
+    floor_dt, floor_source = _resolve_helper_datetime(_DAY_FLOOR_HELPERS, f"Using default earliest floor {_DEFAULT_DAY_FLOOR.strftime('%H:%M')}")
 
     if floor_dt:
         floor_candidate = floor_dt.replace(second=0, microsecond=0)
@@ -1499,21 +2960,13 @@ def _compute_day_commit_time() -> datetime | None:
     candidates = [floor_candidate]
     fallback_desc = f"Using earliest floor {floor_candidate.strftime('%H:%M')}"
 
-    dms, dms_source = _resolve_helper_datetime([
-        "sensor.day_min_start",
-        "pyscript.day_min_start"
-    ], fallback_desc)
+    dms, dms_source = _resolve_helper_datetime(_DAY_MIN_START_HELPERS, fallback_desc)
     if dms:
         candidates.append(dms)
     else:
         dms_source = None
 
-    learned, learned_source = _resolve_helper_datetime([
-        "sensor.learned_day_start",
-        "sensor.day_learned_start",
-        "input_datetime.learned_day_start",
-        "pyscript.learned_day_start",
-    ], fallback_desc)
+    learned, learned_source = _resolve_helper_datetime(_DAY_LEARNED_HELPERS, fallback_desc)
     if learned:
         candidates.append(learned)
     else:
@@ -1525,9 +2978,6 @@ def _compute_day_commit_time() -> datetime | None:
         return fallback_dt
 
     commit = max(candidates)
-    if commit < now:
-        log.warning(f"[HC] DAY COMMIT: Computed commit time {commit.strftime('%H:%M')} is in the past; clamping to now")
-        commit = now.replace(second=0, microsecond=0)
 
     def _describe(source_name: str | None, candidate: datetime | None) -> str:
         if not candidate:
@@ -1548,14 +2998,12 @@ def _compute_day_commit_time() -> datetime | None:
 @catch_hc_error("_resolve_day_target_brightness")
 def _resolve_day_target_brightness() -> tuple[int, str]:
     """Get Day target brightness following priority: teaching → adaptive → intelligent → fallback"""
-    sources = [
-        ("sensor.day_target_brightness_teaching", _get("sensor.day_target_brightness_teaching")),
-        ("sensor.day_target_brightness_adaptive", _get("sensor.day_target_brightness_adaptive")),
-        ("sensor.day_target_brightness_intelligent", _get("sensor.day_target_brightness_intelligent")),
-        ("input_number.day_target_brightness_fallback", _get("input_number.day_target_brightness_fallback")),
-        ("pyscript.day_target_brightness_fallback", _get("pyscript.day_target_brightness_fallback")),
-    ]
-    
+    sources = tuple((name, _get(name)) for name in _DAY_TARGET_BRIGHTNESS_HELPERS)
+    return _memoized("day_target_brightness", (_now().date(), sources),
+                     lambda: _pick_day_target_brightness(sources))
+
+
+def _pick_day_target_brightness(sources) -> tuple[int, str]:
     for name, val in sources:
         try:
             if val not in (None, "unknown", "unavailable"):
@@ -1572,7 +3020,7 @@ def _publish_day_commit_and_target():
     """Publish day commit time and brightness target sensors"""
     commit = _compute_day_commit_time()
     if commit:
-        state.set("sensor.day_commit_time", commit.isoformat(sep=" "), {
+        _set_sensor("sensor.day_commit_time", commit.isoformat(sep=" "), {
             "friendly_name": "Day Commit Time",
         })
         if _get("input_datetime.ramp_calculated_end_time") not in (None, "unavailable"):
@@ -1580,22 +3028,104 @@ def _publish_day_commit_and_target():
                 service.call("input_datetime","set_datetime",
                             entity_id="input_datetime.ramp_calculated_end_time",
                             datetime=commit.strftime("%Y-%m-%d %H:%M:%S"))
+                _snapshot_invalidate("input_datetime.ramp_calculated_end_time")
             except Exception as e:
                 log.warning(f"[HC] Could not mirror commit time: {e}")
     else:
-        state.set("sensor.day_commit_time", "", {
+        _set_sensor("sensor.day_commit_time", "", {
             "friendly_name": "Day Commit Time", 
             "reason":"insufficient_inputs"
         })
     
     bri, src = _resolve_day_target_brightness()
-    state.set("sensor.day_target_brightness", bri, {
+    _set_sensor("sensor.day_target_brightness", bri, {
         "friendly_name": "Day Target Brightness",
         "unit_of_measurement": "%",
         "source": src,
         "updated_at": _now().isoformat()
     })
 
+# ============================================================================
+# BULK LIGHT DISPATCH - one multi-entity call per whole-house command
+# ============================================================================
+_WLED_PATTERN = re.compile(r"wled", re.IGNORECASE)
+
+
+def _light_tags(entity_id: str) -> frozenset:
+    """Exclusion/selection tags for a light, derived from its entity id"""
+    tags = set()
+    if _WLED_PATTERN.search(entity_id):
+        tags.add("wled")
+    if entity_id in TEMP_CAPABLE_LIGHTS:
+        tags.add("temp_capable")
+    return frozenset(tags)
+
+
+def _index_light_state(entity_id: str, value):
+    """Add or drop one light in the on-light index"""
+    if str(value).lower() == "on":
+        if entity_id not in _on_light_index:
+            _on_light_index[entity_id] = _light_tags(entity_id)
+    else:
+        _on_light_index.pop(entity_id, None)
+
+
+def _rebuild_on_light_index():
+    """Full scan of light.*; afterwards the state_changed trigger keeps it current"""
+    global _on_light_index_ready
+    _on_light_index.clear()
+    for entity in state.names(domain="light"):
+        _index_light_state(entity, _get(entity))
+    _on_light_index_ready = True
+
+
+def _ensure_on_light_index():
+    if not _on_light_index_ready:
+        _rebuild_on_light_index()
+
+
+def _lights_on(exclude=()) -> list:
+    """Lights currently on, minus any carrying one of the excluded tags"""
+    _ensure_on_light_index()
+    excluded = frozenset(exclude)
+    return [entity for entity, tags in _on_light_index.items() if not tags & excluded]
+
+
+@event_trigger("state_changed", "entity_id.startswith('light.')")
+@catch_hc_trigger_error("light_index_changed")
+def _light_index_changed(entity_id=None, new_state=None, **kwargs):
+    if not _on_light_index_ready or not str(entity_id or "").startswith("light."):
+        return
+    _index_light_state(entity_id, getattr(new_state, "state", None))
+
+
+def _dispatch_lights(action: str, targets: list, reason: str, **data) -> dict:
+    """Send one light.<action> for all targets; retry singly only if the batch fails"""
+    result = {"action": action, "reason": reason, "sent": list(targets), "failed": {},
+              "calls": 0, "time": _now()}
+    _journal("service", f"light.{action}", at=result["time"], reason=reason, targets=list(targets))
+    result["time"] = result["time"].isoformat()
+    if targets:
+        try:
+            result["calls"] += 1
+            service.call("light", action, entity_id=list(targets), **data)
+        except Exception as exc:
+            log.warning(f"[HC] Bulk light.{action} ({reason}) failed, retrying per entity: {exc}")
+            result["sent"] = []
+            for entity in targets:
+                result["calls"] += 1
+                try:
+                    service.call("light", action, entity_id=entity, **data)
+                    result["sent"].append(entity)
+                except Exception as entity_exc:
+                    result["failed"][entity] = str(entity_exc)
+            if result["failed"]:
+                log.warning(f"[HC] light.{action} ({reason}) failed for: {sorted(result['failed'])}")
+    _light_dispatch_last.clear()
+    _light_dispatch_last.update(result)
+    return result
+
+
 # ============================================================================
 # NIGHT MODE - SET IN STONE
 # ============================================================================
@@ -1631,17 +3161,11 @@ def _set_cutover_pending():
 def _run_night_cutover():
     """SET IN STONE: Turn off every light that is ON except WLEDs"""
     try:
-        lights = state.names(domain="light")
-        on_lights = [
-            entity
-            for entity in lights
-            if str(_get(entity)).lower() == "on" and "wled" not in entity.lower()
-        ]
+        on_lights = _lights_on(exclude=("wled",))
 
         if on_lights:
             log.info(f"[HC] Night cutover turning off: {on_lights}")
-            for entity in on_lights:
-                service.call("light", "turn_off", entity_id=entity)
+            _dispatch_lights("turn_off", on_lights, "night_cutover")
         else:
             log.info("[HC] Night cutover: no eligible lights were on")
 
@@ -1709,7 +3233,7 @@ def _cancel_waiting_timeout(reason: str = "cancel_waiting_timeout"):
 async def _waiting_timeout_runner():
     """If BR TV never turns on after LR TV went off, force Night after 30 minutes."""
     try:
-        await asyncio.sleep(WAIT_FOR_BR_TV_TIMEOUT_MIN * 60)
+        await _clock_sleep(WAIT_FOR_BR_TV_TIMEOUT_MIN * 60)
         if _is_waiting_for_bedroom_tv() and _get_home_state() not in ("Night", "Away"):
             log.info("[HC] Waiting timeout expired; BR TV did not turn on. Forcing Night.")
             _clear_waiting_for_bedroom_tv("waiting_timeout_expired")
@@ -1747,8 +3271,7 @@ def _enter_night(run_cutover: bool, reason: str):
     now = _now()
     evening_started_today = False
     try:
-        attrs = state.getattr("sensor.evening_last_reason") or {}
-        ts = attrs.get("timestamp")
+        ts = _get("sensor.evening_last_reason", attr="timestamp")
         if ts:
             ts_dt = datetime.fromisoformat(str(ts))
             evening_started_today = ts_dt.date() == now.date()
@@ -1788,7 +3311,7 @@ def _bedroom_tv_trigger_to_night():
 async def _bedroom_tv_debounced():
     """Debounced Bedroom TV to Night transition"""
     try:
-        await asyncio.sleep(BEDROOM_TV_DEBOUNCE_SECONDS)
+        await _clock_sleep(BEDROOM_TV_DEBOUNCE_SECONDS)
         br_state = str(_get(BEDROOM_TV) or "").lower()
         if not _offish(br_state):  # BR TV ON-ish
             if _get("binary_sensor.pys_night_cutover_pending") == "on":
@@ -1833,8 +3356,8 @@ async def _start_evening_brightness_ramp(restore_from_time=None):
     Smoothly transition brightness of evening lights to the target 50%
     over 10 minutes before the color temp ramp begins.
     """
-    global _evening_brightness_ramp_task
-    
+    _ramp_engine_cancel("evening_preramp", "restart")
+
     try:
         _set_boolean_state("pys_evening_preramp_active", "on")
         
@@ -1842,10 +3365,7 @@ async def _start_evening_brightness_ramp(restore_from_time=None):
         end_time = now.replace(hour=20, minute=0, second=0, microsecond=0)
 
         if restore_from_time:
-            if isinstance(restore_from_time, str):
-                start_time = datetime.fromisoformat(str(restore_from_time))
-            else:
-                start_time = restore_from_time
+            start_time = _coerce_ramp_datetime(restore_from_time, now)
             log.info(f"[HC] Resuming 10-minute evening brightness pre-ramp.")
         else:
             start_time = now
@@ -1855,6 +3375,7 @@ async def _start_evening_brightness_ramp(restore_from_time=None):
         active_lights = _get_on_temp_capable_lights()
         if not active_lights:
             log.info("[HC] Evening pre-ramp skipped; no temperature-capable lights are currently on.")
+            _set_boolean_state("pys_evening_preramp_active", "off")
             return
 
         start_brightness_pct = None
@@ -1882,39 +3403,63 @@ async def _start_evening_brightness_ramp(restore_from_time=None):
                 log.info("[HC] Evening pre-ramp: unable to read brightness attribute; starting from 0%.")
             _set_input_number("input_number.evening_preramp_start_brightness", start_brightness_pct)
 
-        # Pre-ramp loop until 20:00
-        while _now() < end_time:
-            current_lights = [l for l in active_lights if str(_get(l) or "off").lower() == "on"]
-            if not current_lights:
-                log.info("[HC] Evening pre-ramp ending early; all target lights are off.")
-                break
+        # Pre-ramp until 20:00, at most one light update every 15 seconds
+        _ramp_engine_start({
+            "name": "evening_preramp",
+            "label": "Evening Pre-Ramp",
+            "ramp_type": "evening_preramp",
+            "start": start_time,
+            "end": end_time,
+            "channels": {"brightness": (start_brightness_pct, EV_RAMP_BRI, 1)},
+            "sinks": [_evening_preramp_sink],
+            "guard": _evening_preramp_guard,
+            "on_complete": _finish_evening_preramp,
+            "min_interval": 15,
+            "lights": active_lights,
+        })
+    except Exception:
+        _set_boolean_state("pys_evening_preramp_active", "off")
+        raise
 
-            if start_brightness_pct is not None:
-                current_brightness = _calculate_ramp_brightness(
-                    start_time, end_time,
-                    start_brightness_pct, EV_RAMP_BRI
-                )
-                try:
-                    service.call("light", "turn_on", 
-                                 entity_id=current_lights, 
-                                 brightness_pct=current_brightness)
-                    log.info(f"[HC] Evening Pre-Ramp: {current_brightness}%")
-                except Exception as e:
-                    log.warning(f"[HC] Evening pre-ramp brightness update failed: {e}")
-            else:
-                log.info("[HC] Evening pre-ramp resume without stored start brightness; jumping to target at completion.")
-                break
 
-            # Sleep for 15 seconds
-            await asyncio.sleep(15)
-            
+def _evening_preramp_lights(spec: dict) -> list[str]:
+    """Pre-ramp target lights that are still on"""
+    return [l for l in spec["lights"] if str(_get(l) or "off").lower() == "on"]
+
+
+def _evening_preramp_guard(spec: dict) -> bool:
+    """Keep the pre-ramp running only while a target light is on"""
+    if _evening_preramp_lights(spec):
+        return True
+    log.info("[HC] Evening pre-ramp ending early; all target lights are off.")
+    return False
+
+
+def _evening_preramp_sink(spec: dict, values: dict, now: datetime):
+    """Push the pre-ramp brightness to the target lights that are on"""
+    current_lights = _evening_preramp_lights(spec)
+    if not current_lights:
+        return
+    try:
+        service.call("light", "turn_on",
+                     entity_id=current_lights,
+                     brightness_pct=values["brightness"])
+        log.info(f"[HC] Evening Pre-Ramp: {values['brightness']}%")
+    except Exception as e:
+        log.warning(f"[HC] Evening pre-ramp brightness update failed: {e}")
+
+
+def _finish_evening_preramp(spec: dict, outcome: str):
+    """Pre-ramp completion: settle lights at the target and clear the active flag"""
+    try:
+        if outcome in ("cancelled", "failed"):
+            return
         # Ensure final brightness is set
-        final_lights = [l for l in active_lights if str(_get(l) or "off").lower() == "on"]
+        final_lights = _evening_preramp_lights(spec)
         if final_lights:
             service.call("light", "turn_on", entity_id=final_lights, brightness_pct=EV_RAMP_BRI)
             log.info(f"[HC] Evening brightness pre-ramp complete at {EV_RAMP_BRI}%.")
         _set_input_number("input_number.evening_preramp_start_brightness", EV_RAMP_BRI)
-
     finally:
         _set_boolean_state("pys_evening_preramp_active", "off")
 
@@ -1976,7 +3521,7 @@ def _start_evening_ramp_if_needed():
             return
     
     _set_boolean_state("evening_ramp_started_today", "on")
-    state.set("sensor.evening_ramp_started_at", now.isoformat(), {
+    _set_sensor("sensor.evening_ramp_started_at", now.isoformat(), {
         "friendly_name": "Evening Ramp Started At",
         "target_end": end_dt.isoformat(),
         "start_kelvin": EV_RAMP_START_K,
@@ -1986,11 +3531,12 @@ def _start_evening_ramp_if_needed():
     _set_last_action("evening_ramp_started")
 
 # ============================================================================
-# MINUTELY EVALUATION
+# TRANSITION EVALUATION
 # ============================================================================
 @catch_hc_error("_minutely_tick")
+@with_hc_snapshot
 def _minutely_tick():
-    """Minutely update of flags and state transitions"""
+    """Update flags and state transitions (transition timer, triggers, safety net)"""
     if _get_home_state() == "Away": 
         return
 
@@ -1998,41 +3544,147 @@ def _minutely_tick():
 
     _update_in_evening_window_flag()
     _update_day_ready_flag()
-    _maybe_transition_to_day("minutely")
 
     # Note: Non-work Early Morning → Day is handled by the ramp completion
     # The nonwork ramp automatically transitions to Day when complete
+    # Night/Early Morning → Day and Day → Evening come from the transition table
+    _dispatch_transition("tick", "minutely")
 
     # Clear pending cutover when leaving Night
     if _get_home_state() != "Night" and _get("binary_sensor.pys_night_cutover_pending") == "on":
         _clear_cutover_pending()
-    
-    # Check for Evening window entry
-    if (_get_home_state() == "Day" and 
-        _get("binary_sensor.in_evening_window") == "on" and
-        _night_started_on() != _today_str() and
-        _get_boolean_state("evening_done_today") != "on"):
-        _enter_evening("auto_day_to_evening")
+
+# ============================================================================
+# TRANSITION SCHEDULER - one timer armed for the next known boundary
+# ============================================================================
+def _record_elevation_sample():
+    """Keep the last two sun.sun elevation readings for crossing prediction"""
+    elev = _get("sun.sun", attr="elevation")
+    try:
+        elev = float(elev)
+    except Exception:
+        return
+    now = _now()
+    if _elevation_samples and _elevation_samples[-1][0] >= now:
+        return
+    _elevation_samples.append((now, elev))
+    del _elevation_samples[:-2]
+
+
+def _predict_elevation_crossing(threshold: float) -> datetime | None:
+    """Extrapolate when elevation reaches threshold from the last two samples"""
+    if len(_elevation_samples) < 2:
+        return None
+    (t0, e0), (t1, e1) = _elevation_samples
+    span = (t1 - t0).total_seconds()
+    if span <= 0 or e1 == e0:
+        return None
+    seconds = (threshold - e1) / ((e1 - e0) / span)
+    if seconds <= 0 or seconds > _ELEVATION_PREDICT_HORIZON.total_seconds():
+        return None
+    return t1 + timedelta(seconds=seconds)
+
+
+@catch_hc_error("_next_transition")
+def _next_transition(now: datetime) -> tuple[datetime, str] | None:
+    """Earliest upcoming instant where an evaluation can change a flag or mode"""
+    candidates = []
+
+    if _cached_evening_start:
+        # in_evening_window also requires 15:00 or later
+        candidates.append((max(_cached_evening_start, now.replace(hour=15, minute=0, second=0, microsecond=0)),
+                           "evening_window_open"))
+    cutoff_hm = _cached_cutoff_hm or (EVENING_DEFAULT_CUTOFF.hour, EVENING_DEFAULT_CUTOFF.minute)
+    candidates.append((now.replace(hour=cutoff_hm[0], minute=cutoff_hm[1], second=0, microsecond=0),
+                       "evening_cutoff"))
+    candidates.append((now.replace(hour=WORK_RAMP_END_TIME.hour, minute=WORK_RAMP_END_TIME.minute,
+                                   second=0, microsecond=0), "work_ramp_end"))
+
+    if isinstance(_cached_day_min_start, datetime):
+        floor_time = _get_day_earliest_time_floor()
+        floor_dt = now.replace(hour=floor_time.hour, minute=floor_time.minute, second=0, microsecond=0)
+        candidates.append((max(_cached_day_min_start.replace(tzinfo=None), floor_dt), "day_time_gate"))
+
+    window = _day_ready_window(now)
+    if window is not None:
+        on_at, off_at = window
+        if on_at:
+            candidates.append((on_at, "day_ready_on"))
+        if off_at:
+            candidates.append((off_at, "day_ready_off"))
+    else:
+        target = _cached_day_elev_target if _cached_day_elev_target is not None else 10
+        threshold = float(target) - 3.0 if _day_ready_last_state else float(target)
+        crossing = _predict_elevation_crossing(threshold)
+        if crossing:
+            candidates.append((crossing, "elevation_crossing"))
+
+    upcoming = [c for c in candidates if c[0] > now]
+    return min(upcoming) if upcoming else None
+
+
+async def _transition_timer_runner(wake_at: datetime, reason: str):
+    """Sleep until the armed boundary, then evaluate and re-arm"""
+    global _transition_timer_task
+    await _clock_sleep(max(0.0, (wake_at - _now()).total_seconds()))
+    _transition_timer_task = None
+    log.info(f"[HC] Transition timer fired: {reason}")
+    try:
+        _run_transition_evaluation(f"timer:{reason}")
+    except Exception as exc:
+        # already alerted by catch_hc_error; the evaluation re-armed the timer on its way out
+        log.error(f"[HC] Transition evaluation failed ({reason}): {exc}")
+
+
+@catch_hc_error("_arm_transition_timer")
+def _arm_transition_timer():
+    """Arm a single timer for the next transition boundary (no-op if unchanged)"""
+    global _transition_timer_task, _transition_timer_at
+    upcoming = _next_transition(_now())
+    timer_alive = _transition_timer_task is not None and not _transition_timer_task.done()
+    if upcoming == _transition_timer_at and timer_alive:
+        return
+    _cancel_task_if_running(_transition_timer_task, "transition_timer")
+    _transition_timer_task = None
+    _transition_timer_at = upcoming
+    if upcoming is None:
+        _set_sensor("sensor.pys_next_transition", "", {"reason": "none"})
+        return
+    wake_at, reason = upcoming
+    _set_sensor("sensor.pys_next_transition", wake_at.isoformat(), {"reason": reason})
+    _transition_timer_task = task.create(_transition_timer_runner(wake_at, reason))
+
+
+@catch_hc_error("_run_transition_evaluation")
+def _run_transition_evaluation(reason: str):
+    """Evaluate flags/mode transitions now, then arm the timer for the next boundary (even if the tick failed)"""
+    try:
+        if _is_controller_enabled():
+            _minutely_tick()
+    finally:
+        _arm_transition_timer()
 
 # ============================================================================
 # STARTUP AND EVALUATION
 # ============================================================================
 @catch_hc_error("_evaluate_startup_state")
-def _evaluate_startup_state():
+def _evaluate_startup_state(refresh_constants: bool = True):
     """Evaluate state on startup"""
-    global _work_ramp_task, _nonwork_ramp_task, _morning_motion_classified_date, _morning_motion_profile
+    global _morning_motion_classified_date, _morning_motion_profile
     if _is_any_phone_away():
         _set_home_state("Away")
         _set_last_action("startup:phones_away→Away")
         return
     
-    _refresh_daily_constants()
+    if refresh_constants:
+        _refresh_daily_constants()
+    facts = _startup_facts()
     
     now = _now()
     cutoff = _get_evening_cutoff_time()
     
     if now.time() >= cutoff:
-        if _night_started_on() != _today_str():
+        if facts["night_started_on"] != _today_str():
             lr_st = str(_get(LIVINGROOM_TV) or "").lower()
             if not _offish(lr_st):
                 _postpone_night_until_bedroom_tv("startup_post_23_lr_on")
@@ -2047,9 +3699,9 @@ def _evaluate_startup_state():
     _update_day_ready_flag()
     
     # Check if Early Morning helpers indicate an active route
-    em_route = str(_get("input_text.em_route_key") or "").lower()
-    em_active_flag = _get_boolean_state("em_active") == "on"
-    em_start_raw = _get("input_datetime.em_start_ts")
+    em_route = str(facts["em_route"] or "").lower()
+    em_active_flag = facts["em_active"] == "on"
+    em_start_raw = facts["em_start"]
     em_start_dt = None
     if em_start_raw:
         try:
@@ -2083,7 +3735,7 @@ def _evaluate_startup_state():
         })
         _publish_em_contract()
 
-        ramp_active = _get_boolean_state("sleep_in_ramp_active") == "on"
+        ramp_active = facts["sleep_in_ramp_active"] == "on"
         commit_dt = _compute_day_commit_time() if em_route == "day_off" else None
         should_resume = (
             ramp_active or
@@ -2093,26 +3745,20 @@ def _evaluate_startup_state():
 
         if should_resume:
             if em_route == "work":
-                _cancel_task_if_running(_work_ramp_task, "work_ramp")
-                _cancel_task_if_running(_nonwork_ramp_task, "nonwork_ramp")
-                _work_ramp_task = task.create(_start_work_ramp(restore_from_time=em_start_dt))
+                task.create(_start_work_ramp(restore_from_time=em_start_dt))
             else:
-                _cancel_task_if_running(_nonwork_ramp_task, "nonwork_ramp")
-                _cancel_task_if_running(_work_ramp_task, "work_ramp")
-                _nonwork_ramp_task = task.create(_start_nonwork_ramp(start_time_override=em_start_dt))
+                task.create(_start_nonwork_ramp(start_time_override=em_start_dt))
     
     # Check if in Evening pre-ramp window and it was active
-    elif _get_boolean_state("pys_evening_preramp_active") == "on" and now.time() < dt_time(20, 0):
+    elif facts["evening_preramp_active"] == "on" and now.time() < dt_time(20, 0):
         log.info("[HC] Startup: Evening pre-ramp was active, resuming.")
-        start_time_str = _get("sensor.pys_evening_preramp_start_time")
+        start_time_str = facts["evening_preramp_start"]
         if start_time_str:
-            global _evening_brightness_ramp_task
-            _cancel_task_if_running(_evening_brightness_ramp_task, "evening_brightness_ramp")
-            _evening_brightness_ramp_task = task.create(_start_evening_brightness_ramp(restore_from_time=start_time_str))
+            task.create(_start_evening_brightness_ramp(restore_from_time=start_time_str))
         else:
             log.warning("[HC] Could not resume evening pre-ramp: start time sensor is missing.")
             
-    elif _get("binary_sensor.in_evening_window") == "on" and _night_started_on() != _today_str():
+    elif _get("binary_sensor.in_evening_window") == "on" and facts["night_started_on"] != _today_str():
         if _enter_evening("startup_evening_window", force=_get_home_state() == "Away"):
             _start_evening_ramp_if_needed()
     elif _get("binary_sensor.day_ready_now") == "on":
@@ -2133,31 +3779,65 @@ def _evaluate_startup_state():
 # Kitchen motion sensor triggers - PROPERLY DEFINED
 @state_trigger("binary_sensor.aqara_motion_sensor_p1_occupancy == 'on'")
 @catch_hc_trigger_error("handle_kitchen_motion_1")
-def _handle_kitchen_motion_1(value=None, old_value=None, **kwargs):
+async def _handle_kitchen_motion_1(value=None, old_value=None, **kwargs):
     """Handle kitchen motion sensor 1"""
     entity = "binary_sensor.aqara_motion_sensor_p1_occupancy"
     new_state = value if value is not None else _get(entity)
     if str(new_state).lower() == "on":
         log.info(f"[HC] Kitchen motion sensor 1 triggered")
-        _classify_kitchen_motion(entity)
+        await _classify_kitchen_motion(entity)
 
 @state_trigger("binary_sensor.kitchen_iris_frig_occupancy == 'on'")
 @catch_hc_trigger_error("handle_kitchen_motion_2")
-def _handle_kitchen_motion_2(value=None, old_value=None, **kwargs):
+async def _handle_kitchen_motion_2(value=None, old_value=None, **kwargs):
     """Handle kitchen motion sensor 2"""
     entity = "binary_sensor.kitchen_iris_frig_occupancy"
     new_state = value if value is not None else _get(entity)
     if str(new_state).lower() == "on":
         log.info(f"[HC] Kitchen motion sensor 2 triggered")
-        _classify_kitchen_motion(entity)
+        await _classify_kitchen_motion(entity)
 
-# Minutely evaluation
-@time_trigger("cron(* * * * *)")
+# Safety-net evaluation; the transition timer handles boundaries on time.
+# Set input_boolean.hc_transition_safety_net off to rely on the timer alone.
+@time_trigger("cron(*/15 * * * *)")
 @catch_hc_trigger_error("minutely_evaluation")
 def _minutely_evaluation():
-    if not _is_controller_enabled():
+    if _get("input_boolean.hc_transition_safety_net") == "off":
         return
-    _minutely_tick()
+    _run_transition_evaluation("safety_net")
+
+
+@state_trigger("sun.sun.elevation")
+@catch_hc_trigger_error("sun_elevation_changed")
+def _sun_elevation_changed(value=None, old_value=None, **kwargs):
+    _record_elevation_sample()
+    now = _now()
+    if _day_ready_plan and _day_ready_plan["date"] == now.date():
+        # the predicted crossing is already armed on the transition timer: only check sun.sun agrees
+        window = _day_ready_window(now)
+        if window is not None:
+            try:
+                elev = float(_get("sun.sun", attr="elevation"))
+            except (TypeError, ValueError):
+                return
+            target = float(_cached_day_elev_target if _cached_day_elev_target is not None else 10)
+            _day_ready_verify(now, elev, target, window[0], _day_ready_scheduled(now, *window))
+            return
+    _run_transition_evaluation("sun_elevation")
+
+
+@state_trigger("input_boolean.time_freeze_active")
+@state_trigger("input_datetime.sim_time_override")
+@state_trigger("input_datetime.time_freeze_clock")
+@state_trigger(_CLOCK_SPEED_HELPER)
+@state_trigger(_CLOCK_FROZEN_HELPER)
+@catch_hc_trigger_error("clock_helpers_changed")
+def _clock_helpers_changed(value=None, old_value=None, **kwargs):
+    _clock_invalidate()
+    log.info(f"[HC] Clock helpers changed; now {_now().isoformat()} ({_clock_status()['speed']}x)")
+    if _ramp_specs:
+        _ensure_ramp_supervisor()
+    _run_transition_evaluation("clock_changed")
 
 
 @state_trigger("binary_sensor.day_ready_now")
@@ -2194,7 +3874,7 @@ def _livingroom_tv_changed(value=None, old_value=None, **kwargs):
 
     async def _maybe_start():
         try:
-            await asyncio.sleep(2)  # small debounce
+            await _clock_sleep(2)  # small debounce
             curr = str(_get(LIVINGROOM_TV) or "").lower()
             if _is_waiting_for_bedroom_tv() and _get_home_state() not in ("Night", "Away") and _offish(curr):
                 log.info("[HC] LR TV is OFF after 23:00 while waiting → starting 30-min BR-TV timer.")
@@ -2218,13 +3898,11 @@ def _at_23_failsafe():
 @time_trigger("cron(50 19 * * *)")
 @catch_hc_trigger_error("evening_brightness_ramp_trigger")
 def _evening_brightness_ramp_trigger():
-    global _evening_brightness_ramp_task
     if _get_home_state() in ("Away", "Night"):
         return
     
     log.info("[HC] Triggering evening brightness pre-ramp.")
-    _cancel_task_if_running(_evening_brightness_ramp_task, "evening_brightness_ramp")
-    _evening_brightness_ramp_task = task.create(_start_evening_brightness_ramp())
+    task.create(_start_evening_brightness_ramp())
 
 # 04:30 daily reset (buffer before 04:50 work detection)
 @time_trigger("cron(30 4 * * *)")
@@ -2266,6 +3944,7 @@ def _midnight_reset():
 # Presence changes
 @state_trigger(PHONE_1, PHONE_2)
 @catch_hc_trigger_error("handle_presence_change")
+@with_hc_snapshot
 def _handle_presence_change(value=None, old_value=None, **kwargs):
     entity_name = kwargs.get("var_name", "unknown_tracker")
     
@@ -2276,92 +3955,18 @@ def _handle_presence_change(value=None, old_value=None, **kwargs):
 
     if _are_both_phones_home():
         log.info("[HC][PRESENCE] All tracked phones are now home.")
-        if _get_home_state() == "Away":
-            log.info("[HC][PRESENCE] System is currently in Away mode. Evaluating return conditions.")
-            now = _now()
-            cutoff = _get_evening_cutoff_time()
-            
-            log.info(f"[HC][PRESENCE] Current time: {now.time().strftime('%H:%M')}, Cutoff: {cutoff.strftime('%H:%M')}")
-            log.info(f"[HC][PRESENCE] In Evening Window: {_get('binary_sensor.in_evening_window')}")
-            log.info(f"[HC][PRESENCE] Night Started Today: {_night_started_on() == _today_str()}")
-            log.info(f"[HC][PRESENCE] Evening Done Today: {_get_boolean_state('evening_done_today')}")
-
-            if now.time() >= cutoff or now.time() < dt_time(4,45):
-                log.info("[HC][PRESENCE] Branch: Returning during Night hours.")
-                lr_state = str(_get(LIVINGROOM_TV) or "").lower()
-                lr_on = not _offish(lr_state)
-                _enter_night(run_cutover=not lr_on, reason="presence_return_after_away")
-            elif _get("binary_sensor.in_evening_window") == "on" and now.time() < cutoff:
-                night_started = _night_started_on()
-                if night_started == _today_str():
-                    log.info("[HC][PRESENCE] Evening return detected before cutoff with stale night flag. Clearing night_started_on to allow re-entry.")
-                    _set_sensor("sensor.night_started_on", "", {
-                        "friendly_name": "Night Started On",
-                        "cleared_due_to": "evening_return_before_cutoff"
-                    })
-                log.info("[HC][PRESENCE] Branch: Returning during Evening window.")
-                force_evening = (_get_home_state() == "Away")
-                if _get_boolean_state("evening_done_today") != "on":
-                    if _enter_evening("presence_return_after_away", force=force_evening):
-                        log.info("[HC][PRESENCE] Successfully entered Evening mode.")
-                        _start_evening_ramp_if_needed()
-                    else:
-                        log.warning("[HC][PRESENCE] Failed to enter Evening mode (return from Away).")
-                else:
-                    log.info("[HC][PRESENCE] Evening already done today, forcing entry due to return from Away.")
-                    if _enter_evening("presence_return_after_away", force=True):
-                        log.info("[HC][PRESENCE] Successfully entered Evening mode (forced).")
-                        _start_evening_ramp_if_needed()
-                    else:
-                        log.warning("[HC][PRESENCE] Failed to enter Evening mode (forced return from Away).")
-            else:
-                log.info("[HC][PRESENCE] Branch: Defaulting to Day mode.")
-                if _get_home_state() != "Day":
-                    _set_home_state("Day")
-                    _set_last_action(f"returned_home:{entity_name}→Day")
-                else:
-                    log.info("[HC][PRESENCE] Already in Day mode, no change needed.")
-        else:
+        target = _dispatch_transition("presence_home", f"presence:{entity_name}", entity=entity_name)
+        if target is None:
             log.info("[HC][PRESENCE] System not in Away mode, no return action needed.")
     else:
         log.info("[HC][PRESENCE] At least one phone has left. Evaluating Away transition.")
-        if _get_home_state() != "Away":
-            log.info("[HC][PRESENCE] System not in Away mode. Evaluating transition to Away.")
-            # SET IN STONE: On workday after 05:40, presence→Away ends Early Morning
-            if (_get_home_state() == "Early Morning" and 
-                str(_get("pyscript.motion_work_day_detected") or "off").lower() == "on" and
-                _now().time() >= WORK_RAMP_END_TIME):
-                log.info("[HC][PRESENCE] Ending Early Morning due to Away transition.")
-                _mark_em_end("workday_presence_away")
-                _set_boolean_state("sleep_in_ramp_active", "off")
-            
-            if _get_home_state() == "Evening" or _get_boolean_state("evening_mode_active") == "on":
-                log.info("[HC][PRESENCE] Ending Evening mode due to Away transition.")
-                _end_evening("presence_away", mark_done=False)
-            _set_home_state("Away")
-            if _get("binary_sensor.pys_night_cutover_pending") == "on":
-                _clear_cutover_pending()
-            if _is_waiting_for_bedroom_tv():
-                _clear_waiting_for_bedroom_tv("presence_away")
-
-            try:
-                lights = state.names(domain="light")
-                on_lights = [
-                    entity
-                    for entity in lights
-                    if str(_get(entity)).lower() == "on"
-                ]
-                if on_lights:
-                    log.info(f"[HC][PRESENCE] Turning off lights for Away: {on_lights}")
-                    for entity in on_lights:
-                        service.call("light", "turn_off", entity_id=entity)
-            except Exception as exc:
-                log.warning(f"[HC][PRESENCE] Error turning off lights during Away: {exc}")
-            
-            _set_last_action(f"went_away:{entity_name}")
-        else:
+        target = _dispatch_transition("presence_away", f"presence:{entity_name}", entity=entity_name)
+        if target is None:
             log.info("[HC][PRESENCE] Already in Away mode, no change needed.")
 
+    # Flags are not refreshed while Away; catch up now instead of at the next boundary
+    _run_transition_evaluation("presence")
+
 @state_trigger("input_select.home_state")
 @catch_hc_trigger_error("handle_manual_home_state")
 def _handle_manual_home_state(value=None, old_value=None, **kwargs):
@@ -2369,40 +3974,101 @@ def _handle_manual_home_state(value=None, old_value=None, **kwargs):
         return
     if value is None or value == old_value:
         return
-    if value == "Night":
-        _enter_night(run_cutover=True, reason="manual_input_select")
-    elif value == "Evening":
-        _enter_evening("manual_input_select", force=True)
-    elif value == "Away":
-        if _get_home_state() != "Away":
-            if _get_home_state() == "Evening" or _get_boolean_state("evening_mode_active") == "on":
-                _end_evening("manual_away", mark_done=False)
-            _set_home_state("Away")
-    elif value == "Day":
-        if _get_home_state() != "Day":
-            if _get_home_state() == "Evening" or _get_boolean_state("evening_mode_active") == "on":
-                _end_evening("manual_day", mark_done=False)
-            _set_home_state("Day")
-    elif value == "Early Morning":
-        if _get_home_state() != "Early Morning":
-            _set_home_state("Early Morning")
+    if value != _get("input_select.home_state"):
+        # Superseded before this event ran (two mode writes back to back);
+        # acting on it would bounce the mode between the two values
+        return
+    # input_select already shows the new value; the mode being left is old_value
+    from_mode = old_value if old_value in _HOME_MODES else _get("pyscript.home_state", "Day")
+    _dispatch_transition(f"manual:{value}", "manual_input_select", mode=from_mode)
 
 # Startup initialization
 @time_trigger("startup")
 @catch_hc_trigger_error("startup_initialization")
 def _startup_initialization():
     log.info("[HC] ========== HOME CONTROLLER STARTING (REWORK COMPLIANT) ==========")
-    _ensure_entities()
-    _refresh_daily_constants()
-    _evaluate_startup_state()
+    started = perf_counter()
+    timings = _startup_pipeline()
+    total_ms = round((perf_counter() - started) * 1000.0, 2)
+    # Whatever the phases did not account for is the batched write flush at the end
+    timings["flush_writes"] = round(total_ms - sum(timings.values()), 2)
+    _set_sensor("sensor.pys_startup_timing", total_ms, {
+        "friendly_name": "Home Controller Startup",
+        "unit_of_measurement": "ms",
+        "completed_at": _now().isoformat(),
+        **{f"{phase}_ms": ms for phase, ms in timings.items()},
+    })
+    log.info(f"[HC] ========== HOME CONTROLLER READY ({total_ms} ms) ==========")
+
+
+@with_hc_snapshot
+def _startup_pipeline() -> dict:
+    """Startup phases in one evaluation: reads cached once, writes flushed as one batch"""
+    phases = (
+        ("prefetch", lambda: _snapshot_prefetch([eid for eid, _ in _ENTITY_DEFAULTS] + list(_STARTUP_READS))),
+        ("ensure_entities", _ensure_entities),
+        ("perf_setting", lambda: _perf_set_enabled(str(_get(_PERF_HELPER) or "off").lower() == "on")),
+        ("light_index", _rebuild_on_light_index),
+        ("year_schedule", _schedule_ensure),
+        ("constants", _refresh_daily_constants),
+        ("evaluate", lambda: _evaluate_startup_state(refresh_constants=False)),
+        ("arm_timer", _arm_transition_timer),
+    )
+    timings = {}
+    for phase, step in phases:
+        started = perf_counter()
+        step()
+        timings[phase] = round((perf_counter() - started) * 1000.0, 2)
     _set_last_action("startup_complete")
-    log.info("[HC] ========== HOME CONTROLLER READY ==========")
+    return timings
+
+# Retained controller snapshot (delivered on subscribe, so it is there for restarts)
+@mqtt_trigger("home/rework/controller/snapshot")
+@catch_hc_trigger_error("retained_snapshot_received")
+def _retained_snapshot_received(payload=None, **kwargs):
+    try:
+        snapshot = json.loads(payload or "{}")
+    except (TypeError, ValueError) as exc:
+        log.warning(f"[HC] Ignoring unreadable controller snapshot: {exc}")
+        return
+    global _startup_awaiting_snapshot
+    _retained_snapshot.clear()
+    _retained_snapshot.update(snapshot)
+    if not _startup_awaiting_snapshot or not _retained_snapshot_is_today():
+        return
+    _startup_awaiting_snapshot = False
+    filled, _ignored = _snapshot_fill(_controller_facts())
+    if filled:
+        log.info(f"[HC] Retained snapshot arrived after startup with {filled}; re-running startup evaluation")
+        _evaluate_startup_state(refresh_constants=False)
+        _arm_transition_timer()
+
+# Per-function timing on/off (input_boolean.hc_perf_enabled or the perf service)
+@state_trigger("input_boolean.hc_perf_enabled")
+@catch_hc_trigger_error("perf_helper_changed")
+def _perf_helper_changed(value=None, old_value=None, **kwargs):
+    _perf_set_enabled(str(value).lower() == "on")
+
+
+@time_trigger("cron(*/5 * * * *)")
+@catch_hc_trigger_error("publish_perf_sensor")
+def _publish_perf_sensor_periodic():
+    if _perf_enabled:
+        _publish_perf_sensor()
+
+# Re-resolve boolean flags when helpers are added, renamed or removed
+@event_trigger("entity_registry_updated")
+@catch_hc_trigger_error("entity_registry_updated")
+def _entity_registry_updated(**kwargs):
+    _build_boolean_registry()
 
 # Daily constants refresh at 00:02
 @time_trigger("cron(2 0 * * *)")
 @catch_hc_trigger_error("refresh_constants_midnight")
 def _refresh_constants_midnight():
+    _schedule_ensure()
     _refresh_daily_constants()
+    _arm_transition_timer()
 
 # Refresh when inputs change
 @state_trigger("pyscript.sunset_today")
@@ -2413,6 +4079,7 @@ def _refresh_constants_midnight():
 @catch_hc_trigger_error("refresh_constants_inputs_changed")
 def _refresh_constants_inputs_changed(value=None, old_value=None, **kwargs):
     _refresh_daily_constants()
+    _arm_transition_timer()
 
 # Evening ramp trigger at 20:00
 @time_trigger("cron(0 20 * * *)")
@@ -2446,6 +4113,7 @@ def _publish_day_updates_on_change(value=None, old_value=None):
 # ============================================================================
 @service("pyscript.home_controller_status")
 @catch_hc_error("get_home_controller_status")
+@with_hc_snapshot
 def get_home_controller_status():
     """Get comprehensive status of home controller"""
     now = _now()
@@ -2509,6 +4177,24 @@ def get_home_controller_status():
             "waiting_timeout_active": bool(_waiting_timeout_task and not getattr(_waiting_timeout_task, "done", lambda: True)()),
         },
         "last_action": _get("sensor.pys_last_action"),
+        "state_snapshot": dict(_snapshot_stats),
+        "writes": dict(_write_stats),
+        "mqtt_outbox": sorted(_mqtt_outbox),
+        "ramps": _ramp_engine_status(),
+        "clock": _clock_status(),
+        "lights_on": len(_on_light_index),
+        "last_light_dispatch": dict(_light_dispatch_last),
+        "errors": _error_status(),
+        "journal": {"seq": _journal_seq, "pending": len(_journal_pending), "path": _JOURNAL_PATH},
+        "transitions": list(_transition_trace)[-10:],
+        "memo": {name: dict(stats) for name, stats in _memo_stats.items()},
+        "year_schedule": ({"first": date.fromordinal(_schedule["first"]).isoformat(), "days": _schedule["days"]}
+                          if _schedule else None),
+        "classification": ({"opened": _classification_flight["opened"].isoformat(),
+                            "profile": _classification_flight["profile"],
+                            "sources": list(_classification_flight["entities"])}
+                           if _classification_flight else None),
+        "boolean_flags": {suffix: entry[0] for suffix, entry in _boolean_registry.items()},
     }
     
     log.info(f"[HC] ===== STATUS REPORT =====")
@@ -2517,13 +4203,48 @@ def get_home_controller_status():
     log.info(f"[HC] =======================")
     return status
 
+@service("pyscript.home_controller_perf")
+@catch_hc_error("home_controller_perf")
+def home_controller_perf(action: str = "report", limit: int = 0):
+    """Per-function latency report; action = report | enable | disable | reset"""
+    action = str(action or "report").lower()
+    if action == "enable":
+        _perf_set_enabled(True)
+    elif action == "disable":
+        _perf_set_enabled(False)
+    elif action == "reset":
+        _perf_stats.clear()
+    report = _perf_report(limit=int(limit or 0))
+    _publish_perf_sensor()
+    log.info(f"[HC] ===== PERF REPORT ({'on' if _perf_enabled else 'off'}, {len(report)} functions) =====")
+    for name, row in list(report.items())[:10]:
+        log.info(f"[HC] {name}: {row['calls']} calls, {row['total_ms']} ms total, "
+                 f"{row['mean_ms']} ms mean, {row['max_ms']} ms max")
+    return {"enabled": _perf_enabled, "functions": report}
+
+@service("pyscript.home_controller_journal")
+@catch_hc_error("home_controller_journal")
+async def home_controller_journal(last: int = 50, since: str = None, until: str = None, kind: str = None):
+    """Controller events: the last N (from memory) or a time range (from the SQLite journal)"""
+    last = max(1, int(last or 50))
+    if not since and not until:
+        rows = [row for row in _journal_ring if not kind or row[3] == kind][-last:]
+        source = "memory"
+    else:
+        await _journal_flush()
+        rows = await task.executor(_journal_read, _JOURNAL_PATH, since, until, kind, last)
+        source = "sqlite"
+    events = [_journal_row_dict(row) for row in rows]
+    log.info(f"[HC] Journal query ({source}): {len(events)} events")
+    return {"source": source, "events": events}
+
 @service("pyscript.morning_ramp_first_motion")
 @catch_hc_error("morning_ramp_first_motion")
-def morning_ramp_first_motion(entity: str = "automation.morning_ramp_trigger"):
+async def morning_ramp_first_motion(entity: str = "automation.morning_ramp_trigger"):
     """Automation hook to route first kitchen motion into the classifier."""
     if not entity:
         entity = "automation.morning_ramp_trigger"
-    _classify_kitchen_motion(entity)
+    await _classify_kitchen_motion(entity)
 
 @service("pyscript.force_early_morning_classification")
 @catch_hc_error("force_early_morning")
@@ -2572,15 +4293,10 @@ def force_early_morning_classification(profile: str = "work"):
     _set_last_action(f"forced_early_morning:{profile}")
     
     # Start the appropriate ramp
-    global _work_ramp_task, _nonwork_ramp_task
     if profile == "work":
-        _cancel_task_if_running(_work_ramp_task, "work_ramp")
-        _cancel_task_if_running(_nonwork_ramp_task, "nonwork_ramp")
-        _work_ramp_task = task.create(_start_work_ramp(restore_from_time=now))
+        task.create(_start_work_ramp(restore_from_time=now))
     else:
-        _cancel_task_if_running(_nonwork_ramp_task, "nonwork_ramp")
-        _cancel_task_if_running(_work_ramp_task, "work_ramp")
-        _nonwork_ramp_task = task.create(_start_nonwork_ramp(start_time_override=now))
+        task.create(_start_nonwork_ramp(start_time_override=now))
     
     log.info(f"[HC] Early Morning mode set with {profile} profile and ramp started")
     _publish_em_contract()
@@ -2590,6 +4306,7 @@ def force_early_morning_classification(profile: str = "work"):
 @catch_hc_error("morning_ramp_force_end")
 def _service_morning_ramp_force_end(reason: str = "manual_force_end"):
     """Manual escape hatch to end the current ramp"""
+    _ramp_engine_cancel("morning", reason)
     if _get_boolean_state("sleep_in_ramp_active") == "on":
         _set_boolean_state("sleep_in_ramp_active", "off")
         _mark_em_end(reason)
@@ -2631,14 +4348,10 @@ def _service_morning_ramp_test_trigger(profile: str = "work", hour: int = None,
                                             second=0,
                                             microsecond=0))
         if override_time:
-            global _work_ramp_task
-            _cancel_task_if_running(_work_ramp_task, "work_ramp_test")
-            _work_ramp_task = task.create(_start_work_ramp(restore_from_time=override_time))
+            task.create(_start_work_ramp(restore_from_time=override_time))
     else:
         if override_time:
-            global _nonwork_ramp_task
-            _cancel_task_if_running(_nonwork_ramp_task, "nonwork_ramp_test")
-            _nonwork_ramp_task = task.create(_start_nonwork_ramp(start_time_override=override_time))
+            task.create(_start_nonwork_ramp(start_time_override=override_time))
 
     _set_last_action(f"morning_ramp_test_trigger:{profile}")
 
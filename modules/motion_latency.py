@@ -0,0 +1,127 @@
+# /config/pyscript/modules/motion_latency.py
+"""
+motion_latency — occupancy-on to light.turn_on latency per motion room.
+
+Each sample splits the path into three stages:
+  lag     sensor last_changed -> listener receipt (HA + pyscript dispatch)
+  decide  receipt -> light.turn_on about to be issued (gating, brightness)
+  call    service call issued -> returned
+Receipt is wall clock (to compare with last_changed); decide/call come from
+perf_counter. Samples live in a rolling window per room; rooms publish
+`sensor.motion_latency_<room>` from `sensor(room)` and the raw window is
+available through `samples()`.
+"""
+
+from collections import deque
+from datetime import datetime
+import time
+from typing import Optional
+
+WINDOW = 500
+PERCENTILES = (50, 95, 99)
+STAGES = ("lag", "decide", "call", "total")
+
+_samples = {}
+_pending = {}
+
+
+def _timestamp(when) -> Optional[float]:
+    if isinstance(when, datetime):
+        return when.timestamp()
+    if isinstance(when, str) and when:
+        try:
+            return datetime.fromisoformat(when).timestamp()
+        except ValueError:
+            return None
+    return None
+
+
+def received(room: str, entity_id: str, last_changed, now: datetime):
+    """Listener got an occupancy-on trigger; a newer one for the room replaces it"""
+    _pending[room] = {
+        "entity_id": entity_id,
+        "last_changed": _timestamp(last_changed),
+        "received": now.timestamp(),
+        "mark": time.perf_counter(),
+    }
+
+
+def decided(room: str) -> bool:
+    """About to issue light.turn_on; False when no motion sample is open"""
+    pending = _pending.get(room)
+    if pending is None:
+        return False
+    pending["decided"] = time.perf_counter()
+    return True
+
+
+def completed(room: str) -> Optional[dict]:
+    """light.turn_on returned: close the open sample and add it to the window"""
+    pending = _pending.pop(room, None)
+    if pending is None or "decided" not in pending:
+        return None
+    done = time.perf_counter()
+    lag = None
+    if pending["last_changed"] is not None:
+        lag = max(0.0, (pending["received"] - pending["last_changed"]) * 1000.0)
+    decide = (pending["decided"] - pending["mark"]) * 1000.0
+    call = (done - pending["decided"]) * 1000.0
+    sample = {
+        "at": datetime.fromtimestamp(pending["received"]).isoformat(timespec="milliseconds"),
+        "entity_id": pending["entity_id"],
+        "lag": None if lag is None else round(lag, 2),
+        "decide": round(decide, 2),
+        "call": round(call, 2),
+        "total": round((lag or 0.0) + decide + call, 2),
+    }
+    _samples.setdefault(room, deque(maxlen=WINDOW)).append(sample)
+    return sample
+
+
+def drop(room: str):
+    """Listener finished without turning a light on (gated, already on, ...)"""
+    _pending.pop(room, None)
+
+
+def percentile(values: list, pct: float) -> Optional[float]:
+    """Nearest-rank percentile of an unsorted list"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(1, -(-len(ordered) * pct // 100))
+    return ordered[int(rank) - 1]
+
+
+def summary(room: str) -> dict:
+    window = _samples.get(room, ())
+    out = {"count": len(window)}
+    for stage in STAGES:
+        values = [s[stage] for s in window if s[stage] is not None]
+        for pct in PERCENTILES:
+            out[f"{stage}_p{pct}_ms"] = percentile(values, pct)
+    return out
+
+
+def sensor(room: str) -> tuple:
+    """(entity_id, state, attrs) for the room's latency sensor; state is total p95"""
+    attrs = summary(room)
+    attrs.update({
+        "friendly_name": f"Motion Latency {room.title()}",
+        "icon": "mdi:timer-outline",
+        "unit_of_measurement": "ms",
+        "window": WINDOW,
+        "last_ms": _samples[room][-1]["total"] if _samples.get(room) else None,
+    })
+    return f"sensor.motion_latency_{room}", attrs["total_p95_ms"], attrs
+
+
+def samples(room: Optional[str] = None) -> dict:
+    """Raw samples per room (oldest first)"""
+    rooms = [room] if room else sorted(_samples)
+    return {name: list(_samples.get(name, ())) for name in rooms}
+
+
+def reset(room: Optional[str] = None):
+    for name in [room] if room else list(_samples):
+        _samples.pop(name, None)
+        _pending.pop(name, None)
@@ -0,0 +1,290 @@
+# /config/pyscript/modules/motion_room.py
+"""
+motion_room — the shared engine behind every motion-lit room.
+
+Pure Python, no state access: callers pass `get(entity_id)` (None for
+unknown/unavailable) and `get_attrs(entity_id)`, so motion_rooms.py and the
+tests run the same decisions. A room is a small config in ROOMS (sensors,
+light, timeouts and optional door hold, presets, night hold, colour
+temperature and status sensors) on top of DEFAULTS; its brightness stack and
+fallback table live under the same name in room_brightness.ROOMS. Runtime
+state per room is one RoomState.
+"""
+
+from datetime import datetime, time as dt_time
+from typing import Callable, Optional
+
+import room_brightness
+
+ALLOWED_MODES = frozenset({"Day", "Evening", "Night", "Early Morning"})  # nothing runs in Away
+
+RAMP_ACTIVE = "input_boolean.sleep_in_ramp_active"
+RAMP_SYSTEM_ENABLE = "input_boolean.sleep_in_ramp_system_enable"
+RAMP_WINDOW = (dt_time(4, 0), dt_time(10, 0))  # morning_ramp_first_motion only fires in here
+
+DEFAULTS = {
+    "allowed": ALLOWED_MODES,
+    "clear_after": 30,        # seconds all sensors must stay clear before lights go off
+    "tolerance": 3,           # skip turn_on when the light is already within this many % (None: always send)
+    "cache": True,            # hold the target taken at motion start until the clear (False: re-resolve per trigger)
+    "away_off": True,         # turn the main light off when Away starts
+    "off_transition": None,
+    "verbose": True,          # info logging on by default; pyscript.motion_room_debug toggles it
+    "morning_ramp": False,    # call pyscript.morning_ramp_first_motion on Night motion 04:00-10:00
+    "door": None,
+    "presets": None,
+    "night_hold": None,
+    "color_temp": None,
+    "override_brightness": None,
+    "refresh_on": (),         # modes whose arrival re-applies the target to a lit room
+    "publish": None,
+}
+
+ROOMS = {
+    "kitchen": {
+        "tag": "KitchenALS",
+        "sensors": ("binary_sensor.aqara_motion_sensor_p1_occupancy", "binary_sensor.kitchen_iris_frig_occupancy"),
+        "light": "light.kitchen_main_lights",
+        "clear_after": 5,
+        "tolerance": None,
+        "cache": False,
+        "away_off": False,    # Away only shuts the WLED strips; the mains follow motion
+        # mains stay dark in Night until 04:45 (and never from noon on)
+        "night_hold": {"resume": dt_time(4, 45), "until": dt_time(12, 0)},
+        # WLED strips: presets while active, sink off / fridge dimmed on clear, off outside `modes`
+        "presets": {
+            "modes": ("Evening", "Night", "Early Morning"),
+            "active": {"select.sink_wled_preset": "night-100", "select.frig_strip_preset": "night-100"},
+            "clear": {"select.frig_strip_preset": "night"},
+            "clear_off": ("light.sink_wled",),
+            "lights": ("light.sink_wled", "light.frig_strip"),
+        },
+    },
+    "bathroom": {
+        "tag": "BathroomALS",
+        "sensors": ("binary_sensor.bathroom_iris_occupancy",),
+        "light": "light.bathroom_2_main_lights",
+        "verbose": False,
+        "cache": False,
+        # closed door = someone inside: full brightness, held until the door opens or the hold expires
+        "door": {"sensor": "binary_sensor.bathroom_contact_contact", "closed": "off", "brightness": 100,
+                 "hold_minutes": 30, "grace_seconds": 5},
+    },
+    "closet": {
+        "tag": "ClosetALS",
+        "sensors": ("binary_sensor.bedroom_x_occupancy",),
+        "light": "light.closet",
+        "off_transition": 2,
+        "morning_ramp": True,
+        "refresh_on": ("Night",),
+        "color_temp": {
+            "ramp": (2000, 4000), "ramp_progress": "sensor.sleep_in_ramp_progress",
+            "evening_flag": "input_boolean.evening_mode_active",
+            "pyscript": "pyscript.test_bedroom_brightness",
+            "modes": {"Evening": 2000, "Night": 2000, "Early Morning": 2500, "Day": 4000}, "default": 3000,
+        },
+        "publish": {"target": "sensor.bedroom_target_brightness", "status": "sensor.bedroom_als_status",
+                    "name": "Bedroom", "ready": ("🛏️", "mdi:bed"), "error": "input_text.als_error_bedroom"},
+    },
+    "laundry": {
+        "tag": "LaundryALS",
+        "sensors": ("binary_sensor.laundry_iris_occupancy",),
+        "light": "light.laundry_room",
+        "morning_ramp": True,
+        "publish": {"target": "sensor.laundry_room_target_brightness", "status": "sensor.laundry_room_als_status",
+                    "name": "Laundry Room", "ready": ("🧺", "mdi:washing-machine"), "error": None},
+    },
+    "hallway": {
+        "tag": "HallwayALS",
+        "sensors": ("binary_sensor.hallway_iris_occupancy",),
+        "light": "light.hallway",
+        "morning_ramp": True,
+        "override_brightness": 100,
+        "publish": {"target": "sensor.hallway_target_brightness", "status": "sensor.hallway_als_status",
+                    "name": "Hallway", "ready": ("🚪", "mdi:door"), "error": "input_text.als_error_hallway"},
+    },
+}
+
+_settings = {}
+
+
+def settings(room: str) -> dict:
+    """A room's config over DEFAULTS (built once per room)"""
+    cfg = _settings.get(room)
+    if cfg is None:
+        cfg = _settings[room] = {**DEFAULTS, **ROOMS[room]}
+    return cfg
+
+
+class RoomState:
+    """Runtime state of one room; the dispatcher keeps one per room for the life of the script"""
+
+    __slots__ = ("name", "cached", "temperature", "motion_since", "seq", "hold", "hold_task",
+                 "grace_until", "override", "verbose", "published")
+
+    def __init__(self, name: str):
+        self.name = name
+        self.cached = None          # (pct, source) taken when motion starts (rooms with "cache"), kept until a debounced clear
+        self.temperature = None
+        self.motion_since = None
+        self.seq = 0                # bumped on every trigger; a clear debounce only acts if still current
+        self.hold = False
+        self.hold_task = None
+        self.grace_until = 0.0
+        self.override = False
+        self.verbose = settings(name)["verbose"]
+        self.published = None
+
+    def forget(self):
+        self.cached = None
+        self.temperature = None
+        self.motion_since = None
+
+    def as_dict(self) -> dict:
+        out = {slot: getattr(self, slot) for slot in self.__slots__ if slot != "hold_task"}
+        out["motion_since"] = self.motion_since.isoformat() if self.motion_since else None
+        out["holding"] = self.hold_task is not None
+        return out
+
+
+_by_sensor = {}
+_by_door = {}
+
+
+def _index():
+    if not _by_sensor:
+        for room in ROOMS:
+            cfg = settings(room)
+            for sensor in cfg["sensors"]:
+                _by_sensor[sensor] = room
+            if cfg["door"]:
+                _by_door[cfg["door"]["sensor"]] = room
+
+
+def sensors() -> list:
+    """Every occupancy sensor across the rooms, for one @state_trigger"""
+    _index()
+    return sorted(_by_sensor)
+
+
+def doors() -> list:
+    _index()
+    return sorted(_by_door)
+
+
+def mode_entities() -> list:
+    return sorted({eid for room in ROOMS for eid in room_brightness.ROOMS[room]["mode"]})
+
+
+def room_for(entity_id: str) -> Optional[str]:
+    _index()
+    return _by_sensor.get(entity_id)
+
+
+def room_for_door(entity_id: str) -> Optional[str]:
+    _index()
+    return _by_door.get(entity_id)
+
+
+def mode_of(room: str, get: Callable) -> str:
+    return room_brightness.mode_of(room, get)
+
+
+def any_active(room: str, get: Callable) -> bool:
+    return any(get(sensor) == "on" for sensor in settings(room)["sensors"])
+
+
+def skip_reason(room: str, mode: str) -> Optional[str]:
+    """Why a room ignores motion in `mode`, None when it acts"""
+    if mode == "Away":
+        return "Away mode"
+    if mode not in settings(room)["allowed"]:
+        return f"invalid mode: {mode}"
+    return None
+
+
+def night_hold(room: str, mode: str, now: datetime) -> bool:
+    """True while the room's mains must stay as they are in Night"""
+    hold = settings(room)["night_hold"]
+    if not hold or mode != "Night":
+        return False
+    return not hold["resume"] <= now.time() < hold["until"]
+
+
+def target(room: str, rs: RoomState, targets: Optional[dict], get: Callable, get_attrs: Callable) -> tuple:
+    """(pct, source): the resolver's published value, the live stack until it has run, then the override"""
+    found = room_brightness.lookup(room, targets)
+    if found is None:
+        found = room_brightness.resolve(room, get, get_attrs)
+    if rs.override and found[1] != "Morning Ramp":
+        found = (settings(room)["override_brightness"], "Manual Override")
+    return found
+
+
+def color_temperature(room: str, mode: str, get: Callable, get_attrs: Callable) -> Optional[int]:
+    spec = settings(room)["color_temp"]
+    if not spec:
+        return None
+    if get(RAMP_ACTIVE) == "on":
+        try:
+            progress = max(0.0, min(100.0, float(get(spec["ramp_progress"]))))
+        except (TypeError, ValueError):
+            progress = 0.0
+        start, end = spec["ramp"]
+        return int(start + (end - start) * progress / 100.0)
+    if get(spec["evening_flag"]) == "on" or mode == "Evening":
+        return spec["modes"]["Evening"]
+    if get(room_brightness.ALL_ROOMS_USE_PYSCRIPT) == "on":
+        try:
+            temp = int(float((get_attrs(spec["pyscript"]) or {}).get("temperature")))
+        except (TypeError, ValueError):
+            temp = None
+        if temp:
+            return temp
+    return spec["modes"].get(mode, spec["default"])
+
+
+def already_at(room: str, light_state, light_attrs: Optional[dict], pct: int, temp: Optional[int]) -> bool:
+    """True when the light is on within tolerance of the target, so turn_on can be skipped"""
+    tolerance = settings(room)["tolerance"]
+    if tolerance is None or light_state != "on":
+        return False
+    attrs = light_attrs or {}
+    raw = attrs.get("brightness") or 0
+    try:
+        current = int(raw / 255 * 100)
+    except TypeError:
+        return False
+    if abs(current - pct) >= tolerance:
+        return False
+    if temp is not None and abs((attrs.get("color_temp_kelvin") or 0) - temp) >= 100:
+        return False
+    return True
+
+
+def turn_on_data(room: str, pct: int, temp: Optional[int] = None) -> dict:
+    data = {"entity_id": settings(room)["light"], "brightness_pct": int(max(1, min(100, pct)))}
+    if temp:
+        data["color_temp_kelvin"] = temp
+    return data
+
+
+def wants_morning_ramp(room: str, mode: str, get: Callable, now: datetime) -> bool:
+    if not settings(room)["morning_ramp"] or mode != "Night":
+        return False
+    if get(RAMP_SYSTEM_ENABLE) not in (None, "", "on"):
+        return False
+    return RAMP_WINDOW[0] <= now.time() <= RAMP_WINDOW[1]
+
+
+def status(room: str, mode: str, motion: bool, pct: int, temp: Optional[int], source: str,
+           error) -> tuple:
+    """(status text, icon) for the room's ALS status sensor"""
+    ready_mark, ready_icon = settings(room)["publish"]["ready"]
+    if error not in (None, ""):
+        return "🚫 Error Present", "mdi:alert-circle"
+    if mode == "Away":
+        return "🚪 Away Mode", "mdi:home-export-outline"
+    if motion:
+        return f"💡 Motion Active ({pct}%" + (f" @ {temp}K)" if temp else ")"), "mdi:lightbulb-on"
+    return f"{ready_mark} Ready ({source})", ready_icon
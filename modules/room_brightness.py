@@ -0,0 +1,172 @@
+# /config/pyscript/modules/room_brightness.py
+"""
+room_brightness — the shared brightness priority stack for every motion room.
+
+Pure Python, no state access: callers pass `get(entity_id)` (None for
+unknown/unavailable) and `get_attrs(entity_id)` so the same code runs in the
+resolver (room_brightness_resolver.py), as the rooms' live fallback, and in
+tests. Each room is a small config: the order of its stack steps, the
+entities behind them and its per-mode fallback table.
+"""
+
+from typing import Callable, Optional
+
+RAMP_ACTIVE = "input_boolean.sleep_in_ramp_active"
+RAMP_BRIGHTNESS = "sensor.sleep_in_ramp_brightness"
+ADAPTIVE_LEARNING_ENABLED = "input_boolean.adaptive_learning_enabled"
+ALL_ROOMS_USE_PYSCRIPT = "input_boolean.all_rooms_use_pyscript"
+INTELLIGENT_LIGHTING_ENABLED = "input_boolean.intelligent_lighting_enable"
+
+# Published by the resolver: attrs hold "<room>" (pct) and "<room>_source"
+TARGETS_ENTITY = "pyscript.room_brightness"
+
+SOURCE_LABELS = {
+    "ramp": "Morning Ramp",
+    "override": "Manual Override",
+    "night": "Night Mode Lock",
+    "adaptive": "Adaptive Learning",
+    "pyscript": "PyScript Engine",
+    "intelligent": "Intelligent System",
+}
+
+ROOMS = {
+    "kitchen": {
+        "mode": ("pyscript.home_state", "input_select.home_state"),
+        "stack": ("ramp", "adaptive", "pyscript", "intelligent"),
+        "learned": "sensor.learned_brightness_kitchen",
+        "pyscript": "pyscript.test_kitchen_brightness",
+        "intelligent": "sensor.intelligent_brightness_kitchen",
+        # Night is only used after the 04:45 mains resume guard while still Night
+        "fallback": {"Day": 70, "Evening": 60, "Night": 10, "Early Morning": 35},
+        "default": 60,
+    },
+    "bathroom": {
+        "mode": ("input_select.home_state",),
+        "stack": ("ramp", "night", "adaptive", "pyscript", "intelligent"),
+        "learned": "sensor.learned_brightness_bathroom",
+        "pyscript": "pyscript.test_bathroom_brightness",
+        "intelligent": "sensor.intelligent_brightness_bathroom",
+        "night": 1,
+        "fallback": {"Day": 70, "Evening": 50, "Early Morning": 50},
+        "default": 50,
+    },
+    "closet": {
+        "mode": ("input_select.home_state",),
+        "stack": ("ramp", "override", "night", "pyscript", "adaptive", "intelligent"),
+        "learned": "sensor.learned_brightness_bedroom",
+        "pyscript": "pyscript.test_bedroom_brightness",
+        "intelligent": "sensor.intelligent_brightness_bedroom",
+        "override": ("input_boolean.bedroom_adaptive_override", "input_number.bedroom_override_brightness"),
+        "night": 1,
+        "fallback": {"Day": 60, "Evening": 40, "Early Morning": 40},
+        "default": 40,
+    },
+    "laundry": {
+        "mode": ("input_select.home_state",),
+        "stack": ("ramp", "night", "adaptive", "pyscript", "intelligent"),
+        "learned": "sensor.learned_brightness_laundry",
+        "pyscript": "pyscript.test_laundry_brightness",
+        "intelligent": "sensor.intelligent_brightness_laundry",
+        "night": 1,
+        "fallback": {"Day": 80, "Evening": 60, "Early Morning": 60},
+        "default": 60,
+    },
+    "hallway": {
+        # the hallway's manual override is a RoomState flag, applied by motion_room.target()
+        "mode": ("input_select.home_state",),
+        "stack": ("ramp", "night", "adaptive", "pyscript", "intelligent"),
+        "learned": "sensor.learned_brightness_hallway",
+        "pyscript": "pyscript.test_hallway_brightness",
+        "intelligent": "sensor.intelligent_brightness_hallway",
+        "night": 1,
+        "fallback": {"Day": 20, "Evening": 15, "Early Morning": 15},
+        "default": 15,
+    },
+}
+
+
+def _pct(value, default: Optional[int] = None) -> Optional[int]:
+    try:
+        pct = int(float(value))
+    except (TypeError, ValueError):
+        return default
+    return max(1, min(100, pct))
+
+
+def inputs(room: str) -> set:
+    """Entity ids (and `entity.attr` names) whose changes can move a room's target"""
+    cfg = ROOMS[room]
+    names = {RAMP_ACTIVE, RAMP_BRIGHTNESS, *cfg["mode"]}
+    for step in cfg["stack"]:
+        if step == "adaptive":
+            names |= {ADAPTIVE_LEARNING_ENABLED, cfg["learned"], cfg["learned"] + ".using_learned"}
+        elif step == "pyscript":
+            names |= {ALL_ROOMS_USE_PYSCRIPT, cfg["pyscript"]}
+        elif step == "intelligent":
+            names |= {INTELLIGENT_LIGHTING_ENABLED, cfg["intelligent"]}
+        elif step == "override":
+            names |= set(cfg["override"])
+    return names
+
+
+def watched() -> list:
+    """Every input across all rooms, sorted, for one @state_trigger"""
+    return sorted(set().union(*(inputs(room) for room in ROOMS)))
+
+
+def rooms_for(name: str) -> list:
+    """Rooms whose stack reads `name` (an entity id or `entity.attr`)"""
+    return [room for room in ROOMS if name in inputs(room)]
+
+
+def mode_of(room: str, get: Callable) -> str:
+    for entity_id in ROOMS[room]["mode"]:
+        mode = get(entity_id)
+        if mode not in (None, ""):
+            return mode
+    return "unknown"
+
+
+def fallback(room: str, mode: str) -> tuple:
+    cfg = ROOMS[room]
+    if mode in cfg["fallback"]:
+        return cfg["fallback"][mode], f"Fallback {mode}"
+    return cfg["default"], "Fallback Default"
+
+
+def resolve(room: str, get: Callable, get_attrs: Callable) -> tuple:
+    """(pct, source label) for a room; sources with unusable values fall through to the next step"""
+    cfg = ROOMS[room]
+    mode = mode_of(room, get)
+    for step in cfg["stack"]:
+        pct = None
+        if step == "ramp":
+            if get(RAMP_ACTIVE) == "on":
+                pct = _pct(get(RAMP_BRIGHTNESS))
+        elif step == "override":
+            enabled, value = cfg["override"]
+            if get(enabled) == "on" and get(value) is not None:
+                pct = _pct(get(value), 100)
+        elif step == "night":
+            if mode == "Night":
+                pct = cfg["night"]
+        elif step == "adaptive":
+            if get(ADAPTIVE_LEARNING_ENABLED) == "on" and (get_attrs(cfg["learned"]) or {}).get("using_learned"):
+                pct = _pct(get(cfg["learned"]))
+        elif step == "pyscript":
+            if get(ALL_ROOMS_USE_PYSCRIPT) == "on":
+                pct = _pct(get(cfg["pyscript"]))
+        elif step == "intelligent":
+            if get(INTELLIGENT_LIGHTING_ENABLED) == "on":
+                pct = _pct(get(cfg["intelligent"]))
+        if pct is not None:
+            return pct, SOURCE_LABELS[step]
+    return fallback(room, mode)
+
+
+def lookup(room: str, targets: Optional[dict]) -> Optional[tuple]:
+    """(pct, source) from the resolver's published attrs, None until it has run"""
+    pct = (targets or {}).get(room)
+    if pct is None:
+        return None
+    return int(pct), targets.get(f"{room}_source", "Resolver")
@@ -0,0 +1,144 @@
+# /config/pyscript/modules/solar_ephemeris.py
+"""
+solar_ephemeris — local sun position for a fixed lat/lon (NOAA solar calculator).
+
+Pure Python, no state access: importable from any pyscript file
+(`import solar_ephemeris`) and from tests. Angles are degrees, longitude is
+east-positive, and every datetime is timezone-aware. Sunrise/sunset use the
+standard 90.833° zenith (refraction + solar disc), matching HA's sun.sun to
+well under a minute.
+
+home_controller's year-schedule build also loads this file as native Python
+inside task.executor (pyscript-interpreted functions cannot run on a worker
+thread), so keep it plain stdlib Python with no pyscript builtins.
+"""
+
+from datetime import date, datetime, time as dt_time, timedelta, timezone, tzinfo
+from math import acos, asin, ceil, cos, degrees, radians, sin, tan
+from typing import Optional
+
+SUNRISE_ZENITH = 90.833
+
+
+def _julian_century(when: datetime) -> float:
+    julian_day = when.timestamp() / 86400.0 + 2440587.5
+    return (julian_day - 2451545.0) / 36525.0
+
+
+def _declination_and_eqtime(when: datetime) -> tuple:
+    """Solar declination (deg) and equation of time (minutes) at an instant"""
+    t = _julian_century(when)
+    mean_long = (280.46646 + t * (36000.76983 + t * 0.0003032)) % 360.0
+    mean_anom = radians(357.52911 + t * (35999.05029 - 0.0001537 * t))
+    ecc = 0.016708634 - t * (0.000042037 + 0.0000001267 * t)
+    center = (sin(mean_anom) * (1.914602 - t * (0.004817 + 0.000014 * t))
+              + sin(2 * mean_anom) * (0.019993 - 0.000101 * t)
+              + sin(3 * mean_anom) * 0.000289)
+    omega = radians(125.04 - 1934.136 * t)
+    apparent_long = radians(mean_long + center - 0.00569 - 0.00478 * sin(omega))
+    mean_obliq = 23.0 + (26.0 + (21.448 - t * (46.815 + t * (0.00059 - t * 0.001813))) / 60.0) / 60.0
+    obliq = radians(mean_obliq + 0.00256 * cos(omega))
+    declination = degrees(asin(sin(obliq) * sin(apparent_long)))
+    y = tan(obliq / 2) ** 2
+    l0 = radians(mean_long)
+    eqtime = 4.0 * degrees(
+        y * sin(2 * l0) - 2 * ecc * sin(mean_anom) + 4 * ecc * y * sin(mean_anom) * cos(2 * l0)
+        - 0.5 * y * y * sin(4 * l0) - 1.25 * ecc * ecc * sin(2 * mean_anom))
+    return declination, eqtime
+
+
+def _refraction(elevation: float) -> float:
+    """Atmospheric refraction correction (deg) for a geometric elevation"""
+    if elevation > 85.0:
+        return 0.0
+    te = tan(radians(elevation))
+    if elevation > 5.0:
+        arcsec = 58.1 / te - 0.07 / te ** 3 + 0.000086 / te ** 5
+    elif elevation > -0.575:
+        arcsec = 1735.0 + elevation * (-518.2 + elevation * (103.4 + elevation * (-12.79 + elevation * 0.711)))
+    else:
+        arcsec = -20.772 / te
+    return arcsec / 3600.0
+
+
+def solar_elevation(when: datetime, latitude: float, longitude: float, refraction: bool = True) -> float:
+    """Sun elevation above the horizon (deg) at an aware instant"""
+    utc = when.astimezone(timezone.utc)
+    declination, eqtime = _declination_and_eqtime(utc)
+    minutes = utc.hour * 60 + utc.minute + utc.second / 60.0 + utc.microsecond / 6e7
+    true_solar = (minutes + eqtime + 4.0 * longitude) % 1440.0
+    hour_angle = radians(true_solar / 4.0 - 180.0)
+    lat, dec = radians(latitude), radians(declination)
+    cos_zenith = sin(lat) * sin(dec) + cos(lat) * cos(dec) * cos(hour_angle)
+    elevation = 90.0 - degrees(acos(max(-1.0, min(1.0, cos_zenith))))
+    return elevation + _refraction(elevation) if refraction else elevation
+
+
+def _utc_midnight(day: date, tz: tzinfo) -> datetime:
+    """Local midnight starting `day` in tz, as a UTC instant"""
+    return datetime.combine(day, dt_time(0), tz).astimezone(timezone.utc)
+
+
+def _utc_day(when: datetime) -> datetime:
+    """UTC midnight on or before `when`: the NOAA minute formulas count from here"""
+    return when.astimezone(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def _event_minutes(day_start_utc: datetime, latitude: float, longitude: float,
+                   guess: float, sign: int, zenith: float) -> Optional[float]:
+    """UTC minutes after day_start_utc of sunrise (sign -1) or sunset (sign +1)"""
+    minutes = guess
+    for _ in range(3):
+        declination, eqtime = _declination_and_eqtime(day_start_utc + timedelta(minutes=minutes))
+        lat, dec = radians(latitude), radians(declination)
+        cos_ha = cos(radians(zenith)) / (cos(lat) * cos(dec)) - tan(lat) * tan(dec)
+        if not -1.0 <= cos_ha <= 1.0:
+            return None  # polar day or night
+        minutes = 720.0 - 4.0 * longitude - eqtime + sign * 4.0 * degrees(acos(cos_ha))
+    return minutes
+
+
+def solar_noon(day: date, longitude: float, tz: tzinfo) -> datetime:
+    """Local solar noon (sun due south/north) on a civil date in tz"""
+    start = _utc_midnight(day, tz)
+    base = _utc_day(start)
+    # whole days that put the noon estimate inside the local day (the UTC date can
+    # differ from the local one by a day either way, e.g. UTC+13/+14 or UTC-12)
+    shift = 1440.0 * ceil(((start - base).total_seconds() / 60.0 - (720.0 - 4.0 * longitude)) / 1440.0)
+    minutes = shift + 720.0 - 4.0 * longitude
+    for _ in range(2):
+        minutes = shift + 720.0 - 4.0 * longitude - _declination_and_eqtime(base + timedelta(minutes=minutes))[1]
+    return (base + timedelta(minutes=minutes)).astimezone(tz)
+
+
+def sun_events(day: date, latitude: float, longitude: float, tz: tzinfo,
+               zenith: float = SUNRISE_ZENITH) -> dict:
+    """Sunrise, solar noon, sunset (aware, in tz; None when the sun does not cross) and peak elevation"""
+    noon = solar_noon(day, longitude, tz)
+    start = _utc_day(noon)
+    noon_minutes = (noon - start).total_seconds() / 60.0
+    events = {"solar_noon": noon, "max_elevation": solar_elevation(noon, latitude, longitude)}
+    for key, sign in (("sunrise", -1), ("sunset", 1)):
+        minutes = _event_minutes(start, latitude, longitude, noon_minutes + sign * 360.0, sign, zenith)
+        events[key] = None if minutes is None else (start + timedelta(minutes=minutes)).astimezone(tz)
+    return events
+
+
+def elevation_crossing(day: date, latitude: float, longitude: float, tz: tzinfo, target: float,
+                       rising: bool = True, tolerance: timedelta = timedelta(seconds=1)) -> Optional[datetime]:
+    """Instant on `day` when the sun's elevation crosses target (morning if rising, else afternoon)"""
+    noon = solar_noon(day, longitude, tz)
+    if solar_elevation(noon, latitude, longitude) < target:
+        return None
+    low, high = (noon - timedelta(hours=12), noon) if rising else (noon, noon + timedelta(hours=12))
+    if solar_elevation(low if rising else high, latitude, longitude) >= target:
+        return None
+    # elevation is monotonic between midnight and noon (and noon and midnight): bisect
+    while high - low > tolerance:
+        mid = low + (high - low) / 2
+        above = solar_elevation(mid, latitude, longitude) >= target
+        if above == rising:
+            high = mid
+        else:
+            low = mid
+    return high if rising else low
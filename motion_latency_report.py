@@ -0,0 +1,41 @@
+"""
+PyScript: Motion Latency Report
+
+The motion rooms record occupancy-on -> light.turn_on samples in
+modules/motion_latency.py and publish `sensor.motion_latency_<room>` as they
+land. This script seeds those sensors at startup and exposes the raw rolling
+window for offline analysis.
+"""
+
+import motion_latency
+import motion_room
+
+ROOMS = tuple(motion_room.ROOMS)
+
+
+def _publish(room: str):
+    entity_id, value, attrs = motion_latency.sensor(room)
+    state.set(entity_id, value, attrs)
+
+
+@time_trigger("startup")
+def _motion_latency_startup():
+    for room in ROOMS:
+        _publish(room)
+
+
+@service("pyscript.motion_latency_samples", supports_response="optional")
+def motion_latency_samples(room: str = None, reset: bool = False):
+    """Raw motion->light samples per room (oldest first); reset=true clears the window after dumping"""
+    room = str(room).lower() if room else None
+    dump = motion_latency.samples(room)
+    summaries = {name: motion_latency.summary(name) for name in dump}
+    for name, rows in dump.items():
+        log.info(f"[MotionLatency] {name}: {len(rows)} samples, "
+                 f"total p50={summaries[name]['total_p50_ms']} p95={summaries[name]['total_p95_ms']} "
+                 f"p99={summaries[name]['total_p99_ms']} ms")
+    if reset:
+        motion_latency.reset(room)
+        for name in [room] if room else ROOMS:
+            _publish(name)
+    return {"rooms": dump, "summary": summaries}
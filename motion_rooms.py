@@ -0,0 +1,543 @@
+"""
+PyScript: Motion Rooms
+
+One dispatcher for every room in modules/motion_room.py (kitchen, bathroom,
+closet, laundry, hallway). Occupancy, door and home-mode triggers are routed
+to the owning room, which runs the shared hot path: mode gating, debounce on
+clear, and per room (as each used to behave) brightness cached at motion
+start, skip-if-already-lit, mains off on Away, door hold, WLED presets, night
+hold and status sensors. Adding a room is a ROOMS entry there plus its
+brightness stack in modules/room_brightness.py. The old per-room service
+names remain as thin wrappers over the motion_room_* services.
+"""
+
+from datetime import datetime
+import asyncio
+
+import motion_latency
+import motion_room
+import room_brightness
+
+_rooms = {name: motion_room.RoomState(name) for name in motion_room.ROOMS}
+
+
+# --- helpers ---
+def _state(eid, d=None):
+    try:
+        v = state.get(eid)
+        return v if v not in (None, "unknown", "unavailable") else d
+    except Exception:
+        return d
+
+
+def _attrs(eid) -> dict:
+    try:
+        return state.getattr(eid) or {}
+    except Exception:
+        return {}
+
+
+def _now():
+    return datetime.now()
+
+
+def _info(room, msg):
+    if _rooms[room].verbose:
+        log.info(f"[{motion_room.settings(room)['tag']}] {msg}")
+
+
+def _warn(room, msg):
+    log.warning(f"[{motion_room.settings(room)['tag']}] {msg}")
+
+
+def _error(room, msg):
+    log.error(f"[{motion_room.settings(room)['tag']}] {msg}")
+
+
+def _room(room: str) -> str:
+    room = str(room or "").lower()
+    if room not in _rooms:
+        raise ValueError(f"unknown motion room '{room}' (known: {', '.join(_rooms)})")
+    return room
+
+
+def _target(room: str) -> tuple:
+    """(pct, source) for the room right now; one read of the resolver's entity on the hot path"""
+    rs = _rooms[room]
+    try:
+        return motion_room.target(room, rs, state.getattr(room_brightness.TARGETS_ENTITY), _state, _attrs)
+    except Exception as e:
+        _warn(room, f"Brightness resolution failed: {e}")
+        return room_brightness.fallback(room, motion_room.mode_of(room, _state))
+
+
+# --- service calls ---
+def _light_on(room: str, pct: int, temp: int | None = None):
+    data = motion_room.turn_on_data(room, pct, temp)
+    try:
+        timed = motion_latency.decided(room)
+        service.call("light", "turn_on", **data)
+        if timed and motion_latency.completed(room) is not None:
+            entity_id, value, attrs = motion_latency.sensor(room)
+            state.set(entity_id, value, attrs)
+        _info(room, f"Light ON -> {data['entity_id']} {data['brightness_pct']}%" + (f" @ {temp}K" if temp else ""))
+    except Exception as e:
+        _error(room, f"Light on error on {data['entity_id']}: {e}")
+
+
+def _light_off(room: str, entity_id=None):
+    cfg = motion_room.settings(room)
+    data = {"entity_id": entity_id or cfg["light"]}
+    if entity_id is None and cfg["off_transition"]:
+        data["transition"] = cfg["off_transition"]
+    try:
+        service.call("light", "turn_off", **data)
+        _info(room, f"Light OFF -> {data['entity_id']}")
+    except Exception as e:
+        _error(room, f"Light off error on {data['entity_id']}: {e}")
+
+
+def _presets(room: str, mode: str, active: bool):
+    """Extra strips (kitchen WLEDs): presets in their modes, off everywhere else"""
+    presets = motion_room.settings(room)["presets"]
+    if not presets:
+        return
+    if mode not in presets["modes"]:
+        _light_off(room, list(presets["lights"]))
+        return
+    for eid in ([] if active else presets["clear_off"]):
+        _light_off(room, eid)
+    for eid, option in (presets["active"] if active else presets["clear"]).items():
+        try:
+            service.call("select", "select_option", entity_id=eid, option=option)
+            _info(room, f"Preset -> {eid} = {option}")
+        except Exception as e:
+            _error(room, f"Preset error on {eid}: {e}")
+
+
+def _trigger_morning_ramp(room: str, mode: str, eid: str):
+    now = _now()
+    if not motion_room.wants_morning_ramp(room, mode, _state, now):
+        return
+    _warn(room, f"🔥 MORNING RAMP: Calling from {eid} at {now.strftime('%H:%M')}")
+    try:
+        service.call("pyscript", "morning_ramp_first_motion", sensor=eid)
+    except Exception as e:
+        _error(room, f"Failed to trigger morning ramp: {e}")
+
+
+# --- door hold ---
+def _door_closed(room: str) -> bool:
+    door = motion_room.settings(room)["door"]
+    return bool(door) and _state(door["sensor"]) == door["closed"]
+
+
+def _cancel_hold(room: str, reason: str):
+    rs = _rooms[room]
+    task_ref, rs.hold_task = rs.hold_task, None
+    if task_ref and not task_ref.done():
+        task_ref.cancel()
+        _info(room, f"Hold timer cancelled ({reason})")
+
+
+async def _hold_timeout(room: str):
+    rs = _rooms[room]
+    current_task = asyncio.current_task()
+    try:
+        await asyncio.sleep(motion_room.settings(room)["door"]["hold_minutes"] * 60)
+        if not motion_room.any_active(room, _state):
+            rs.hold = False
+            _light_off(room)
+            _info(room, "Hold timeout → off")
+    finally:
+        if rs.hold_task is current_task:
+            rs.hold_task = None
+
+
+def _hold_on(room: str, reason: str):
+    rs = _rooms[room]
+    _cancel_hold(room, reason)
+    if not rs.hold:
+        _info(room, f"Door closed -> hold ({reason})")
+    rs.hold = True
+    _light_on(room, motion_room.settings(room)["door"]["brightness"])
+
+
+# --- core behavior ---
+def _apply(room: str, active: bool, reason: str):
+    cfg = motion_room.settings(room)
+    rs = _rooms[room]
+    mode = motion_room.mode_of(room, _state)
+    skip = motion_room.skip_reason(room, mode)
+    if skip:
+        _info(room, f"🚫 SKIP - {skip} ({reason})")
+        return
+    _info(room, f"APPLY motion_active={active} mode={mode} reason={reason}")
+    held = motion_room.night_hold(room, mode, _now())
+    _presets(room, mode, active)
+
+    if not active:
+        if rs.hold:
+            _info(room, "Hold mode active → keep on")
+        elif held:
+            _info(room, "Leaving main lights alone – Night hold still active")
+        else:
+            _cancel_hold(room, "motion cleared")
+            _light_off(room)
+        return
+
+    if held:
+        _info(room, "SKIPPING main lights – Night hold active")
+        return
+    if cfg["door"]:
+        now_ts = _now().timestamp()
+        if _door_closed(room) and not now_ts < rs.grace_until:
+            _hold_on(room, reason)
+            return
+        if rs.hold:
+            _info(room, "Door opened -> exit hold")
+        rs.hold = False
+        rs.grace_until = max(rs.grace_until, now_ts + cfg["door"]["grace_seconds"])
+
+    if rs.cached is not None:
+        (pct, source), temp = rs.cached, rs.temperature
+    else:
+        pct, source = _target(room)
+        temp = motion_room.color_temperature(room, mode, _state, _attrs)
+    if motion_room.already_at(room, _state(cfg["light"]), _attrs(cfg["light"]), pct, temp):
+        _info(room, f"Light already at target {pct}% ({source}) - skipping")
+        return
+    _light_on(room, pct, temp)
+
+
+def _publish(room: str, force: bool = False):
+    """Target/status sensors for rooms that have them; written only when they change"""
+    cfg = motion_room.settings(room)
+    spec = cfg["publish"]
+    if not spec:
+        return
+    rs = _rooms[room]
+    try:
+        mode = motion_room.mode_of(room, _state)
+        if rs.cached is not None:
+            (pct, _), temp, source = rs.cached, rs.temperature, "CACHED"
+        else:
+            pct, source = _target(room)
+            temp = motion_room.color_temperature(room, mode, _state, _attrs)
+        motion = motion_room.any_active(room, _state)
+        error = _state(spec["error"]) if spec["error"] else None
+        text, icon = motion_room.status(room, mode, motion, pct, temp, source, error)
+        snapshot = (pct, temp, source, text, icon)
+        if snapshot == rs.published and not force:
+            return
+        rs.published = snapshot
+        attrs = {"friendly_name": f"{spec['name']} Target Brightness", "unit_of_measurement": "%",
+                 "calculation_source": source}
+        if temp:
+            attrs["temperature"] = temp
+        state.set(spec["target"], pct, attrs)
+        state.set(spec["status"], text, {"friendly_name": f"{spec['name']} ALS Status", "icon": icon})
+    except Exception as e:
+        _error(room, f"Failed to publish sensors: {e}")
+
+
+# --- dispatcher ---
+@state_trigger(*motion_room.sensors())
+async def motion_room_dispatch(**kwargs):
+    eid = kwargs.get("var_name")
+    room = motion_room.room_for(eid)
+    if room is None:
+        return
+    rs = _rooms[room]
+    cfg = motion_room.settings(room)
+    rs.seq += 1
+    seq = rs.seq
+    value = kwargs.get("value")
+    if value == "on":
+        motion_latency.received(room, eid, state.get(f"{eid}.last_changed"), _now())
+    _info(room, f"Listener: {eid} -> {value} @ {_now().strftime('%H:%M:%S')}")
+
+    if motion_room.any_active(room, _state):
+        _cancel_hold(room, "motion active")
+        if value == "on":
+            mode = motion_room.mode_of(room, _state)
+            if cfg["cache"]:
+                # new motion: one brightness/colour decision for the whole event
+                rs.cached = _target(room)
+                rs.temperature = motion_room.color_temperature(room, mode, _state, _attrs)
+            rs.motion_since = _now()
+            _trigger_morning_ramp(room, mode, eid)
+        _apply(room, True, f"{eid} active")
+        motion_latency.drop(room)
+        _publish(room)
+        return
+
+    await asyncio.sleep(cfg["clear_after"])
+    if rs.seq != seq or motion_room.any_active(room, _state):
+        _info(room, "Clear aborted (motion returned during debounce)")
+        return
+    rs.forget()
+    if _door_closed(room):
+        hold_minutes = cfg["door"]["hold_minutes"]
+        _info(room, f"Door closed → start {hold_minutes} min hold timer")
+        _cancel_hold(room, "restart")
+        rs.hold_task = task.create(_hold_timeout(room))
+    else:
+        _apply(room, False, "debounced clear")
+    _publish(room)
+
+
+@state_trigger(*motion_room.doors())
+def motion_room_door(**kwargs):
+    room = motion_room.room_for_door(kwargs.get("var_name"))
+    if room is None:
+        return
+    rs = _rooms[room]
+    light = motion_room.settings(room)["light"]
+    if _door_closed(room):
+        if _state(light) == "on":
+            rs.grace_until = 0.0
+            _hold_on(room, "door closed sensor")
+        return
+    _cancel_hold(room, "door opened")
+    rs.hold = False
+    rs.grace_until = _now().timestamp() + motion_room.settings(room)["door"]["grace_seconds"]
+    if motion_room.any_active(room, _state):
+        _apply(room, True, "door_open_refresh")
+    elif _state(light) == "on":
+        pct, source = _target(room)
+        _light_on(room, pct)
+        _info(room, f"Door opened → adjust to {pct}% ({source})")
+
+
+@state_trigger(*motion_room.mode_entities())
+def motion_room_mode_changed(**kwargs):
+    eid, value = kwargs.get("var_name"), kwargs.get("value")
+    for room, rs in _rooms.items():
+        if eid not in room_brightness.ROOMS[room]["mode"]:
+            continue
+        cfg = motion_room.settings(room)
+        if value == "Away":
+            _cancel_hold(room, "Away mode")
+            rs.hold = False
+            rs.forget()
+            _info(room, "Away mode → turning off lights")
+            if cfg["away_off"]:
+                _light_off(room)
+            if cfg["presets"]:
+                _light_off(room, list(cfg["presets"]["lights"]))
+        elif cfg["presets"] and value not in cfg["presets"]["modes"]:
+            _light_off(room, list(cfg["presets"]["lights"]))
+        if value in cfg["refresh_on"] and _state(cfg["light"]) == "on":
+            mode = motion_room.mode_of(room, _state)
+            pct, source = _target(room)
+            _light_on(room, pct, motion_room.color_temperature(room, mode, _state, _attrs))
+            _info(room, f"{value} mode: adjusted to {pct}% ({source})")
+        _publish(room)
+
+
+@time_trigger("startup")
+def motion_rooms_startup():
+    for room in _rooms:
+        _info(room, f"Startup: motion={motion_room.any_active(room, _state)} door_closed={_door_closed(room)}")
+        _publish(room, force=True)
+
+
+@time_trigger("cron(* * * * *)")
+def motion_rooms_minute_update():
+    for room in _rooms:
+        _publish(room)
+
+
+# --- manual services ---
+@service("pyscript.motion_room_force")
+def motion_room_force(room: str, mode: str = "on"):
+    """Force a room's light on (current target) or off, ignoring motion and mode gating;
+    "active"/"clear" run the room's motion path instead (presets included, mode gated)"""
+    room = _room(room)
+    if mode in ("active", "clear"):
+        _apply(room, mode == "active", f"forced {mode}")
+    elif mode == "on":
+        pct, _ = _target(room)
+        _light_on(room, pct, motion_room.color_temperature(room, motion_room.mode_of(room, _state), _state, _attrs))
+    else:
+        _light_off(room)
+    _publish(room)
+
+
+@service("pyscript.motion_room_override")
+def motion_room_override(room: str, enable: bool = True):
+    """Pin a room at its override brightness (rooms with override_brightness only)"""
+    room = _room(room)
+    if not motion_room.settings(room)["override_brightness"]:
+        raise ValueError(f"{room} has no manual override")
+    _rooms[room].override = bool(enable)
+    _info(room, f"Override {'ENABLED' if enable else 'DISABLED'}")
+    _publish(room)
+
+
+@service("pyscript.motion_room_debug")
+def motion_room_debug(room: str, enable: bool = True):
+    """Turn a room's info logging on or off"""
+    room = _room(room)
+    _rooms[room].verbose = bool(enable)
+    state.set(f"pyscript.{room}_debug_enabled", "on" if enable else "off")
+    log.info(f"[{motion_room.settings(room)['tag']}] Debug logging {'enabled' if enable else 'disabled'}")
+
+
+@service("pyscript.motion_room_smoke_test")
+async def motion_room_smoke_test(room: str, pct: int = 50, temp: int = None):
+    """Light a room at pct (and temp K) for two seconds, then off; strips run their active then clear presets"""
+    room = _room(room)
+    presets = motion_room.settings(room)["presets"]
+    _info(room, f"SMOKE TEST: light ON at {pct}%" + (f" @ {temp}K" if temp else "") + ", then OFF")
+    if presets:
+        _presets(room, presets["modes"][0], True)
+    _light_on(room, int(pct), temp)
+    await asyncio.sleep(2)
+    if presets:
+        _presets(room, presets["modes"][0], False)
+    _light_off(room)
+    _publish(room)
+
+
+@service("pyscript.motion_room_simulate")
+async def motion_room_simulate(room: str, sequence: list = None, delay: float = 1.0):
+    """Replay motion/door events into a room: motion_on, motion_off, door_open, door_closed, sleep"""
+    room = _room(room)
+    rs = _rooms[room]
+    cfg = motion_room.settings(room)
+    door = cfg["door"]
+    sequence = sequence or ["motion_on", "door_closed", "sleep", "door_open", "sleep", "motion_on",
+                            "sleep", "motion_off"]
+    steps = {"motion_on": (cfg["sensors"][0], "on"), "motion_off": (cfg["sensors"][0], "off")}
+    if door:
+        steps["door_closed"] = (door["sensor"], door["closed"])
+        steps["door_open"] = (door["sensor"], "on" if door["closed"] == "off" else "off")
+    prev_verbose, rs.verbose = rs.verbose, True
+    log.info(f"[{cfg['tag']}] Simulation start: {sequence}")
+    try:
+        for step in sequence:
+            if step in steps:
+                state.set(*steps[step])
+                _info(room, f"Sim: {step}")
+            elif step != "sleep":
+                _warn(room, f"Unknown simulation step: {step}")
+            if step == "sleep" or step not in steps:
+                await asyncio.sleep(delay)
+            await asyncio.sleep(delay)
+    finally:
+        rs.verbose = prev_verbose
+        log.info(f"[{cfg['tag']}] Simulation end")
+
+
+@service("pyscript.motion_room_status", supports_response="optional")
+def motion_room_status(room: str = None):
+    """Runtime state, sensors and current target per room"""
+    report = {}
+    for name in [_room(room)] if room else list(_rooms):
+        cfg = motion_room.settings(name)
+        pct, source = _target(name)
+        report[name] = {
+            **_rooms[name].as_dict(),
+            "mode": motion_room.mode_of(name, _state),
+            "sensors": {eid: _state(eid) for eid in cfg["sensors"]},
+            "light": _state(cfg["light"]),
+            "door_closed": _door_closed(name) if cfg["door"] else None,
+            "target": pct,
+            "source": source,
+        }
+        log.info(f"[{cfg['tag']}] STATUS {report[name]}")
+    return report
+
+
+# --- per-room service names (kept for existing automations and dashboards) ---
+@service("pyscript.bathroom_force")
+def bathroom_force(mode: str = "on"):
+    motion_room_force("bathroom", mode)
+
+
+@service("pyscript.bathroom_debug_toggle")
+def bathroom_debug_toggle(enable: bool = True):
+    motion_room_debug("bathroom", enable)
+
+
+@service("pyscript.bathroom_debug_status")
+def bathroom_debug_status():
+    return motion_room_status("bathroom")
+
+
+@service("pyscript.bathroom_simulate")
+async def bathroom_simulate(sequence: list = None, delay: float = 1.0):
+    """Simulate door/motion events. sequence accepts tokens like 'motion_on', 'motion_off', 'door_open', 'door_closed'."""
+    await motion_room_simulate("bathroom", sequence, delay)
+
+
+@service("pyscript.hallway_force")
+def hallway_force(mode: str = "on"):
+    motion_room_force("hallway", mode)
+
+
+@service("pyscript.hallway_override_on")
+def hallway_override_on():
+    motion_room_override("hallway", True)
+
+
+@service("pyscript.hallway_override_off")
+def hallway_override_off():
+    motion_room_override("hallway", False)
+
+
+@service("pyscript.hallway_smoke_test")
+async def hallway_smoke_test():
+    await motion_room_smoke_test("hallway", 50)
+
+
+@service("pyscript.kitchen_wled_force")
+def kitchen_wled_force(mode: str = "active"):
+    """Force 'active' or 'clear' immediately."""
+    if mode not in ("active", "clear"):
+        _warn("kitchen", f"force: unknown mode '{mode}'")
+        return
+    motion_room_force("kitchen", mode)
+
+
+@service("pyscript.kitchen_wled_smoke_test")
+async def kitchen_wled_smoke_test():
+    """Strips -> night-100 and mains on (Evening level), then sink OFF, fridge -> night, mains off."""
+    await motion_room_smoke_test("kitchen", room_brightness.fallback("kitchen", "Evening")[0])
+
+
+@service("pyscript.kitchen_debug_status")
+def kitchen_debug_status():
+    return motion_room_status("kitchen")
+
+
+@service("pyscript.closet_force")
+def closet_force(mode: str = "on"):
+    motion_room_force("closet", mode)
+
+
+@service("pyscript.closet_smoke_test")
+async def closet_smoke_test():
+    await motion_room_smoke_test("closet", 50, 3000)
+
+
+@service("pyscript.closet_debug_status")
+def closet_debug_status():
+    return motion_room_status("closet")
+
+
+@service("pyscript.laundry_force")
+def laundry_force(mode: str = "on"):
+    motion_room_force("laundry", mode)
+
+
+@service("pyscript.laundry_smoke_test")
+async def laundry_smoke_test():
+    await motion_room_smoke_test("laundry", 60)
+
+
+@service("pyscript.laundry_debug_status")
+def laundry_debug_status():
+    return motion_room_status("laundry")
@@ -0,0 +1,71 @@
+"""
+PyScript: Room Brightness Resolver
+
+Keeps every motion room's current brightness target precomputed in
+`pyscript.room_brightness` (attrs "<room>" and "<room>_source"). A room is
+re-resolved only when one of its own stack inputs changes, so the motion
+handlers answer with a single in-memory lookup instead of walking the
+ramp/learned/pyscript/intelligent entities on every trigger.
+
+The stack itself lives in modules/room_brightness.py.
+"""
+
+from datetime import datetime
+
+import room_brightness
+
+_targets = {}
+
+
+def _get(eid: str):
+    try:
+        v = state.get(eid)
+        return v if v not in (None, "unknown", "unavailable", "") else None
+    except Exception:
+        return None
+
+
+def _get_attrs(eid: str) -> dict:
+    try:
+        return state.getattr(eid) or {}
+    except Exception:
+        return {}
+
+
+def _refresh(rooms, reason: str):
+    """Re-resolve rooms; republish only when a target or its source moved"""
+    changed = []
+    for room in rooms:
+        try:
+            target = room_brightness.resolve(room, _get, _get_attrs)
+        except Exception as e:
+            log.warning(f"[RoomBrightness] {room} resolve failed: {e}")
+            continue
+        if _targets.get(room) != target:
+            _targets[room] = target
+            changed.append(room)
+    if not changed:
+        return
+    attrs = {"friendly_name": "Room Brightness Targets", "icon": "mdi:brightness-auto",
+             "reason": reason, "updated": datetime.now().replace(microsecond=0).isoformat()}
+    for room, (pct, source) in _targets.items():
+        attrs[room] = pct
+        attrs[f"{room}_source"] = source
+    state.set(room_brightness.TARGETS_ENTITY, len(_targets), attrs)
+
+
+@time_trigger("startup")
+def _room_brightness_startup():
+    _refresh(list(room_brightness.ROOMS), "startup")
+
+
+@state_trigger(*room_brightness.watched())
+def _room_brightness_input_changed(var_name=None, **kwargs):
+    rooms = room_brightness.rooms_for(var_name) or list(room_brightness.ROOMS)
+    _refresh(rooms, var_name or "input")
+
+
+@service("pyscript.room_brightness_refresh")
+def room_brightness_refresh():
+    """Re-resolve every room's brightness target now"""
+    _refresh(list(room_brightness.ROOMS), "service")
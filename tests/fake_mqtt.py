@@ -0,0 +1,69 @@
+"""In-process stand-in for an MQTT broker (no mosquitto needed).
+
+Keeps retained messages per topic and delivers publishes to subscribers whose
+filter matches (`+` and `#` wildcards), replaying retained messages on
+subscribe the way a real broker does.
+"""
+from __future__ import annotations
+
+import json
+from typing import Any, Callable
+
+
+def topic_matches(pattern: str, topic: str) -> bool:
+    """MQTT topic filter match"""
+    pattern_parts = pattern.split("/")
+    topic_parts = topic.split("/")
+    for index, part in enumerate(pattern_parts):
+        if part == "#":
+            return True
+        if index >= len(topic_parts):
+            return False
+        if part not in ("+", topic_parts[index]):
+            return False
+    return len(pattern_parts) == len(topic_parts)
+
+
+class FakeBroker:
+    def __init__(self):
+        self.retained: dict[str, str] = {}
+        self.published: list[tuple[str, str, bool]] = []
+        self.subscribers: list[tuple[str, Callable[[str, str], Any]]] = []
+
+    def publish(self, topic: str, payload: str, retain: bool = False, qos: int = 0):
+        self.published.append((topic, payload, retain))
+        if retain:
+            if payload in (None, ""):
+                self.retained.pop(topic, None)
+            else:
+                self.retained[topic] = payload
+        for pattern, callback in list(self.subscribers):
+            if topic_matches(pattern, topic):
+                callback(topic, payload)
+
+    def subscribe(self, pattern: str, callback: Callable[[str, str], Any]):
+        self.subscribers.append((pattern, callback))
+        for topic, payload in list(self.retained.items()):
+            if topic_matches(pattern, topic):
+                callback(topic, payload)
+
+    def payload(self, topic: str):
+        """Decoded retained payload for topic (None when nothing is retained)"""
+        raw = self.retained.get(topic)
+        return json.loads(raw) if raw else None
+
+    def topics(self, prefix: str = "") -> list[str]:
+        return [topic for topic, _payload, _retain in self.published if topic.startswith(prefix)]
+
+    def attach(self, service):
+        """Route a dummy `service` module's mqtt.publish calls to this broker"""
+        original_call = service.call
+
+        def call(domain: str, service_name: str, **data):
+            if domain == "mqtt" and service_name == "publish":
+                self.publish(data["topic"], data.get("payload", ""),
+                             retain=bool(data.get("retain")), qos=int(data.get("qos", 0)))
+            return original_call(domain, service_name, **data)
+
+        service.call = call
+        return self
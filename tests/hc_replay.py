@@ -0,0 +1,308 @@
+"""Replay Home Assistant recorder history through the controller offline.
+
+Streams `states` rows for the entities the controller reacts to (phones, TVs,
+kitchen motion, sun) out of `home-assistant_v2.db` in timestamp order and feeds
+them into a HomeSimulator, so months of real life run in minutes without HA:
+
+    python tests/hc_replay.py --db home-assistant_v2.db --days 90 --out replay/
+    python tests/hc_replay.py --db home-assistant_v2.db --days 90 --out replay/ \\
+        --against home_controller_candidate.py
+
+Each run writes `<label>_modes.csv` (mode timeline), `<label>_commands.csv`
+(service calls issued) and `<label>_events.csv` (per-row processing time);
+with --against the second controller replays the same rows and the first
+divergence in the mode timeline is reported.
+"""
+
+from __future__ import annotations
+
+import argparse
+import csv
+from datetime import datetime, timedelta, tzinfo
+import json
+from pathlib import Path
+import sqlite3
+import sys
+from time import perf_counter
+from typing import Any, Iterator
+from zoneinfo import ZoneInfo
+
+from hc_sim import HomeSimulator
+
+REPLAY_ENTITIES = (
+    "device_tracker.iphone15",
+    "device_tracker.work_iphone",
+    "media_player.bedroom",
+    "media_player.apple_tv_4k_livingroom",
+    "binary_sensor.aqara_motion_sensor_p1_occupancy",
+    "binary_sensor.kitchen_iris_frig_occupancy",
+    "sun.sun",
+    "pyscript.sunrise_today",
+    "pyscript.sunset_today",
+)
+MODE_ENTITY = "pyscript.home_state"
+
+# The house before the first replayed row; recorded states override these.
+DEFAULT_HOUSE = {
+    "device_tracker.iphone15": "home",
+    "device_tracker.work_iphone": "home",
+    "input_select.home_state": "Night",
+    "pyscript.home_state": "Night",
+    "input_boolean.sleep_in_ramp_system_enable": "on",
+    "media_player.bedroom": "off",
+    "media_player.apple_tv_4k_livingroom": "off",
+}
+
+_FETCH_SIZE = 5000
+_TRIM_EVERY = 2000
+
+
+# ----------------------------------------------------------------------------
+# Recorder reader
+# ----------------------------------------------------------------------------
+def _connect(db_path) -> sqlite3.Connection:
+    return sqlite3.connect(f"file:{Path(db_path)}?mode=ro", uri=True, timeout=10.0)
+
+
+def _modern_schema(conn: sqlite3.Connection) -> bool:
+    """True for the states_meta/last_updated_ts layout (HA 2023.4+)"""
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(states)")}
+    return "metadata_id" in columns and "last_updated_ts" in columns
+
+
+# pre-2023.4 recorders keep last_updated as UTC text
+_LEGACY_TS = ("(CAST(strftime('%s', s.last_updated) AS REAL)"
+              " + strftime('%f', s.last_updated) - strftime('%S', s.last_updated))")
+
+
+def _query(modern: bool, entity_count: int, where: str, order: str, limit: str = "") -> str:
+    marks = ",".join("?" * entity_count)
+    if modern:
+        return (
+            "SELECT m.entity_id, s.state, s.last_updated_ts, a.shared_attrs FROM states s "
+            "JOIN states_meta m ON m.metadata_id = s.metadata_id "
+            "LEFT JOIN state_attributes a ON a.attributes_id = s.attributes_id "
+            f"WHERE m.entity_id IN ({marks}) {where.format(ts='s.last_updated_ts')} "
+            f"ORDER BY s.last_updated_ts {order}, s.state_id {order} {limit}"
+        )
+    return (
+        f"SELECT s.entity_id, s.state, {_LEGACY_TS}, s.attributes FROM states s "
+        f"WHERE s.entity_id IN ({marks}) {where.format(ts=_LEGACY_TS)} "
+        f"ORDER BY s.last_updated {order}, s.state_id {order} {limit}"
+    )
+
+
+# tz=None means this machine's zone: naive local conversions follow its DST rules,
+# so a window across a DST change maps both ends correctly
+def _local(ts: float, tz: tzinfo | None) -> datetime:
+    if tz is None:
+        return datetime.fromtimestamp(ts)
+    return datetime.fromtimestamp(ts, tz).replace(tzinfo=None)
+
+
+def _epoch(when: datetime, tz: tzinfo | None) -> float:
+    if tz is None:
+        return when.timestamp()
+    return when.replace(tzinfo=tz).timestamp()
+
+
+def _attrs(raw) -> dict:
+    if not raw:
+        return {}
+    try:
+        parsed = json.loads(raw)
+    except ValueError:
+        return {}
+    return parsed if isinstance(parsed, dict) else {}
+
+
+def iter_recorder_states(db_path, start: datetime, end: datetime, entities=REPLAY_ENTITIES,
+                         tz: tzinfo | None = None) -> Iterator[tuple[datetime, str, str, dict]]:
+    """Yield (local time, entity_id, state, attributes) rows in timestamp order.
+
+    Rows are pulled from the cursor in batches, so a 90-day window never sits
+    in memory at once.
+    """
+    conn = _connect(db_path)
+    try:
+        cursor = conn.execute(
+            _query(_modern_schema(conn), len(entities), "AND {ts} >= ? AND {ts} < ?", "ASC"),
+            (*entities, _epoch(start, tz), _epoch(end, tz)))
+        while True:
+            rows = cursor.fetchmany(_FETCH_SIZE)
+            if not rows:
+                return
+            for entity_id, value, ts, raw_attrs in rows:
+                if value is None or ts is None:
+                    continue
+                yield _local(ts, tz), entity_id, value, _attrs(raw_attrs)
+    finally:
+        conn.close()
+
+
+def states_before(db_path, when: datetime, entities=REPLAY_ENTITIES,
+                  tz: tzinfo | None = None) -> tuple[dict[str, str], dict[str, dict]]:
+    """Last recorded state (and attributes) of each entity before `when`"""
+    values, attrs = {}, {}
+    conn = _connect(db_path)
+    try:
+        modern = _modern_schema(conn)
+        for entity_id in entities:
+            row = conn.execute(_query(modern, 1, "AND {ts} < ?", "DESC", "LIMIT 1"),
+                               (entity_id, _epoch(when, tz))).fetchone()
+            if row and row[1] is not None:
+                values[entity_id] = row[1]
+                attrs[entity_id] = _attrs(row[3])
+    finally:
+        conn.close()
+    return values, attrs
+
+
+def recorder_span(db_path, entities=REPLAY_ENTITIES, tz: tzinfo | None = None) -> tuple[datetime, datetime] | None:
+    """First and last timestamp recorded for the replayed entities"""
+    conn = _connect(db_path)
+    try:
+        modern = _modern_schema(conn)
+        first = conn.execute(_query(modern, len(entities), "", "ASC", "LIMIT 1"), entities).fetchone()
+        last = conn.execute(_query(modern, len(entities), "", "DESC", "LIMIT 1"), entities).fetchone()
+    finally:
+        conn.close()
+    if not first or not last:
+        return None
+    return _local(first[2], tz), _local(last[2], tz)
+
+
+# ----------------------------------------------------------------------------
+# Replay
+# ----------------------------------------------------------------------------
+class ReplayResult:
+    def __init__(self, label: str):
+        self.label = label
+        self.modes: list[tuple[datetime, Any, Any]] = []
+        self.commands: list[tuple[datetime, str, str, dict]] = []
+        self.events: list[tuple[datetime, str, str, float]] = []
+        self.failures: list[str] = []
+        self.wall_seconds = 0.0
+
+    def summary(self) -> dict:
+        timings = sorted(ms for *_row, ms in self.events)
+
+        def pct(q: float) -> float:
+            return round(timings[min(len(timings) - 1, int(q * len(timings)))], 3) if timings else 0.0
+
+        return {
+            "label": self.label,
+            "events": len(self.events),
+            "mode_changes": len(self.modes),
+            "commands": len(self.commands),
+            "failures": len(self.failures),
+            "event_ms_p50": pct(0.50),
+            "event_ms_p95": pct(0.95),
+            "event_ms_max": round(timings[-1], 3) if timings else 0.0,
+            "wall_seconds": round(self.wall_seconds, 2),
+        }
+
+    def write(self, out_dir):
+        out = Path(out_dir)
+        out.mkdir(parents=True, exist_ok=True)
+        _write_csv(out / f"{self.label}_modes.csv", ("time", "from", "to"), self.modes)
+        _write_csv(out / f"{self.label}_commands.csv", ("time", "domain", "service", "data"),
+                   ((when, domain, name, json.dumps(data, default=str, sort_keys=True))
+                    for when, domain, name, data in self.commands))
+        _write_csv(out / f"{self.label}_events.csv", ("time", "entity_id", "state", "ms"),
+                   ((when, entity, value, f"{ms:.3f}") for when, entity, value, ms in self.events))
+
+
+def _write_csv(path: Path, header, rows):
+    with path.open("w", newline="") as handle:
+        writer = csv.writer(handle)
+        writer.writerow(header)
+        for row in rows:
+            writer.writerow([cell.isoformat() if isinstance(cell, datetime) else cell for cell in row])
+
+
+def _trim(sim: HomeSimulator):
+    """Drop bookkeeping the replay does not need so long runs stay flat in memory"""
+    sim.log.messages[:] = [entry for entry in sim.log.messages if entry[0] == "error"]
+    sim.service.calls.clear()
+    sim.task.created.clear()
+
+
+def replay(db_path, start: datetime, end: datetime, script: str = "home_controller.py",
+           tz: tzinfo | None = None, label: str | None = None) -> ReplayResult:
+    """Run `script` against the recorded rows between start and end"""
+    result = ReplayResult(label or Path(script).stem)
+    values, attrs = states_before(db_path, start, tz=tz)
+    began = perf_counter()
+    with HomeSimulator(start, scripts=(script,)) as sim:
+        sim.prime({**DEFAULT_HOUSE, **values}, attrs)
+        sim.commands = result.commands
+        sim.observers.append(
+            lambda entity_id, old, new: entity_id == MODE_ENTITY and old != new
+            and result.modes.append((sim.now(), old, new)))
+        sim.settle()
+        for count, (when, entity_id, value, row_attrs) in enumerate(
+                iter_recorder_states(db_path, start, end, tz=tz), 1):
+            sim.run_until(when)
+            started = perf_counter()
+            sim.set(entity_id, value, row_attrs)
+            sim.settle()
+            result.events.append((when, entity_id, value, (perf_counter() - started) * 1000.0))
+            if count % _TRIM_EVERY == 0:
+                _trim(sim)
+        sim.run_until(end)
+        result.failures = list(sim.errors)
+    result.wall_seconds = perf_counter() - began
+    return result
+
+
+def first_divergence(a: ReplayResult, b: ReplayResult, slack: timedelta = timedelta(minutes=1)):
+    """First mode change that differs (by target mode, or time beyond `slack`), else None"""
+    for index in range(max(len(a.modes), len(b.modes))):
+        left = a.modes[index] if index < len(a.modes) else None
+        right = b.modes[index] if index < len(b.modes) else None
+        if left is None or right is None or left[2] != right[2] or abs(left[0] - right[0]) > slack:
+            return {"index": index, a.label: left, b.label: right}
+    return None
+
+
+# ----------------------------------------------------------------------------
+# CLI
+# ----------------------------------------------------------------------------
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--db", required=True, help="path to home-assistant_v2.db (opened read-only)")
+    parser.add_argument("--days", type=float, default=90.0, help="replay the last N recorded days")
+    parser.add_argument("--start", help="ISO start (local time); overrides --days")
+    parser.add_argument("--end", help="ISO end (local time); defaults to the last recorded row")
+    parser.add_argument("--script", default="home_controller.py", help="controller to replay (repo-relative)")
+    parser.add_argument("--against", help="second controller to A/B against --script")
+    parser.add_argument("--tz", help="IANA zone of the house (defaults to this machine's zone)")
+    parser.add_argument("--out", default="replay", help="directory for the CSV outputs")
+    args = parser.parse_args(argv)
+
+    tz = ZoneInfo(args.tz) if args.tz else None
+    span = recorder_span(args.db, tz=tz)
+    if span is None:
+        print("no recorder rows for the replayed entities", file=sys.stderr)
+        return 1
+    end = datetime.fromisoformat(args.end) if args.end else span[1] + timedelta(seconds=1)
+    start = datetime.fromisoformat(args.start) if args.start else max(span[0], end - timedelta(days=args.days))
+    start = start.replace(hour=0, minute=0, second=0, microsecond=0)
+
+    results = []
+    for script in filter(None, (args.script, args.against)):
+        label = Path(script).stem
+        if results and results[0].label == label:
+            label += "_b"
+        result = replay(args.db, start, end, script, tz=tz, label=label)
+        result.write(args.out)
+        results.append(result)
+        print(json.dumps(result.summary()))
+    if len(results) == 2:
+        print(json.dumps({"first_divergence": first_divergence(*results)}, default=str))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
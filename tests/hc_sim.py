@@ -0,0 +1,726 @@
+"""Offline discrete-event simulator for the pyscript controllers.
+
+Builds on the DummyState/DummyService harness from test_early_morning: the
+script is executed with trigger decorators that actually register, state
+writes dispatch to matching @state_trigger functions, cron/startup
+@time_trigger functions are scheduled, and everything runs on an event loop
+whose clock jumps straight to the next timer. A scripted 24 h day replays in
+a fraction of a second.
+
+    sim = HomeSimulator(datetime(2024, 1, 5))
+    sim.prime(PHONES_HOME)
+    sim.at("04:52", sim.set, "binary_sensor.kitchen_iris_frig_occupancy", "on")
+    sim.run_until("06:00")
+    assert sim.get("pyscript.home_state") == "Early Morning"
+"""
+
+from __future__ import annotations
+
+import asyncio
+from collections import deque
+import contextvars
+from datetime import datetime, time as dt_time, timedelta
+from functools import lru_cache, partial
+import heapq
+import inspect
+import math
+from pathlib import Path
+import re
+import sys
+import types
+from typing import Any, Callable
+
+from fake_mqtt import FakeBroker
+from test_early_morning import DummyLog, DummyService, DummyState
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+# pyscript puts <config>/pyscript/modules on the import path for scripts
+if str(REPO_ROOT / "modules") not in sys.path:
+    sys.path.insert(0, str(REPO_ROOT / "modules"))
+
+_ENTITY_RE = re.compile(r"\b[a-z_]+\.[a-z0-9_]+(?:\.[a-z0-9_]+)?\b")
+
+
+# ----------------------------------------------------------------------------
+# Virtual event loop
+# ----------------------------------------------------------------------------
+class _VirtualHandle:
+    """Scheduled callback on the virtual loop (the asyncio.TimerHandle surface tasks rely on)"""
+
+    __slots__ = ("_when", "_callback", "_args", "_context", "_cancelled")
+
+    def __init__(self, when: float, callback: Callable, args: tuple, context):
+        self._when = when
+        self._callback = callback
+        self._args = args
+        self._context = context
+        self._cancelled = False
+
+    def when(self) -> float:
+        return self._when
+
+    def cancel(self):
+        self._cancelled = True
+
+    def cancelled(self) -> bool:
+        return self._cancelled
+
+
+class VirtualEventLoop(asyncio.AbstractEventLoop):
+    """Event loop whose clock jumps to the next timer instead of waiting for it
+
+    Built only on the public AbstractEventLoop surface: asyncio's tasks,
+    futures, sleep and timeouts need call_soon/call_at/time/create_future
+    and the running-loop registration, nothing from a concrete loop class.
+    """
+
+    def __init__(self):
+        self._virtual_time = 0.0
+        self._ready: deque = deque()
+        self._timers: list = []
+        self._timer_seq = 0
+        self._running = False
+        self._stopping = False
+        self._closed = False
+        self._debug = False
+        self._exception_handler = None
+
+    # -- clock and scheduling ---------------------------------------------------
+    def time(self) -> float:
+        return self._virtual_time
+
+    def call_soon(self, callback, *args, context=None):
+        handle = _VirtualHandle(self._virtual_time, callback, args, context or contextvars.copy_context())
+        self._ready.append(handle)
+        return handle
+
+    call_soon_threadsafe = call_soon
+
+    def call_at(self, when, callback, *args, context=None):
+        handle = _VirtualHandle(when, callback, args, context or contextvars.copy_context())
+        self._timer_seq += 1
+        heapq.heappush(self._timers, (when, self._timer_seq, handle))
+        return handle
+
+    def call_later(self, delay, callback, *args, context=None):
+        return self.call_at(self._virtual_time + max(0.0, delay), callback, *args, context=context)
+
+    def has_ready(self) -> bool:
+        return any(not handle.cancelled() for handle in self._ready)
+
+    # -- futures and tasks --------------------------------------------------------
+    def create_future(self):
+        return asyncio.Future(loop=self)
+
+    def create_task(self, coro, *, name=None, context=None):
+        return asyncio.Task(coro, loop=self, name=name, context=context)
+
+    # -- running --------------------------------------------------------------------
+    def _run_once(self):
+        while self._timers and self._timers[0][2].cancelled():
+            heapq.heappop(self._timers)
+        if not self._ready and not self._stopping:
+            if not self._timers:
+                self._stopping = True  # nothing can ever run again
+                return
+            self._virtual_time = max(self._virtual_time, self._timers[0][0])
+        while self._timers and self._timers[0][0] <= self._virtual_time:
+            handle = heapq.heappop(self._timers)[2]
+            if not handle.cancelled():
+                self._ready.append(handle)
+        for _ in range(len(self._ready)):
+            handle = self._ready.popleft()
+            if handle.cancelled():
+                continue
+            try:
+                handle._context.run(handle._callback, *handle._args)
+            except (SystemExit, KeyboardInterrupt):
+                raise
+            except BaseException as exc:
+                self.call_exception_handler({"message": "Exception in callback", "exception": exc,
+                                             "handle": handle})
+
+    def run_forever(self):
+        if self._running:
+            raise RuntimeError("This event loop is already running")
+        self._running = True
+        asyncio._set_running_loop(self)
+        try:
+            while True:
+                self._run_once()
+                if self._stopping:
+                    break
+        finally:
+            self._stopping = False
+            self._running = False
+            asyncio._set_running_loop(None)
+
+    def run_until_complete(self, future):
+        future = asyncio.ensure_future(future, loop=self)
+        future.add_done_callback(lambda _: self.stop())
+        self.run_forever()
+        if not future.done():
+            raise RuntimeError("Event loop stopped before Future completed.")
+        return future.result()
+
+    def stop(self):
+        self._stopping = True
+
+    def is_running(self) -> bool:
+        return self._running
+
+    def is_closed(self) -> bool:
+        return self._closed
+
+    def close(self):
+        self._ready.clear()
+        self._timers.clear()
+        self._closed = True
+
+    async def shutdown_asyncgens(self):
+        return None
+
+    async def shutdown_default_executor(self):
+        return None
+
+    # -- errors and debug -----------------------------------------------------------
+    def get_debug(self) -> bool:
+        return self._debug
+
+    def set_debug(self, enabled: bool):
+        self._debug = enabled
+
+    def set_exception_handler(self, handler):
+        self._exception_handler = handler
+
+    def get_exception_handler(self):
+        return self._exception_handler
+
+    def default_exception_handler(self, context):
+        pass  # failures surface through HomeSimulator.failures
+
+    def call_exception_handler(self, context):
+        if self._exception_handler is not None:
+            self._exception_handler(self, context)
+        else:
+            self.default_exception_handler(context)
+
+
+# ----------------------------------------------------------------------------
+# Cron expressions (minute hour day-of-month month day-of-week)
+# ----------------------------------------------------------------------------
+def _cron_field(field: str, value: int, lo: int, hi: int) -> bool:
+    for part in field.split(","):
+        step = 1
+        if "/" in part:
+            part, step_text = part.split("/", 1)
+            step = int(step_text)
+        if part == "*":
+            start, end = lo, hi
+        elif "-" in part:
+            start, end = (int(x) for x in part.split("-", 1))
+        else:
+            start = int(part)
+            end = hi if step != 1 else start
+        if start <= value <= end and (value - start) % step == 0:
+            return True
+    return False
+
+
+def _cron_day_matches(fields: list[str], when: datetime) -> bool:
+    if not _cron_field(fields[3], when.month, 1, 12):
+        return False
+    cron_dow = (when.weekday() + 1) % 7  # cron: Sunday = 0
+    dom_ok = _cron_field(fields[2], when.day, 1, 31)
+    dow_ok = _cron_field(fields[4], cron_dow, 0, 7) or (cron_dow == 0 and _cron_field(fields[4], 7, 0, 7))
+    if fields[2] != "*" and fields[4] != "*":
+        return dom_ok or dow_ok
+    return dom_ok and dow_ok
+
+
+def next_cron_time(expr: str, after: datetime) -> datetime:
+    """First minute strictly after `after` matching a 5-field cron expression"""
+    fields = expr.split()
+    if len(fields) != 5:
+        raise ValueError(f"unsupported cron expression: {expr!r}")
+    when = after.replace(second=0, microsecond=0) + timedelta(minutes=1)
+    limit = when + timedelta(days=366 * 5)
+    while when < limit:
+        if not _cron_day_matches(fields, when):
+            when = (when + timedelta(days=1)).replace(hour=0, minute=0)
+        elif not _cron_field(fields[1], when.hour, 0, 23):
+            when = (when + timedelta(hours=1)).replace(minute=0)
+        elif not _cron_field(fields[0], when.minute, 0, 59):
+            when += timedelta(minutes=1)
+        else:
+            return when
+    raise ValueError(f"cron expression never fires: {expr!r}")
+
+
+# ----------------------------------------------------------------------------
+# Trigger registry
+# ----------------------------------------------------------------------------
+class StateTrigger:
+    """One @state_trigger expression: the entities it watches and its condition"""
+
+    def __init__(self, fn: Callable, expr: str):
+        self.fn = fn
+        self.expr = expr.strip()
+        self.names = list(dict.fromkeys(_ENTITY_RE.findall(self.expr)))
+        self.bare = self.names == [self.expr]
+        code = self.expr
+        for index, name in enumerate(sorted(self.names, key=len, reverse=True)):
+            code = re.sub(rf"\b{re.escape(name)}\b", f"_v{index}", code)
+        self._order = sorted(self.names, key=len, reverse=True)
+        self._code = None if self.bare else compile(code, f"<state_trigger {self.expr}>", "eval")
+
+    def holds(self, sim: "HomeSimulator") -> bool:
+        if self._code is None:
+            return True
+        scope = {f"_v{index}": sim.value_of(name) for index, name in enumerate(self._order)}
+        try:
+            return bool(eval(self._code, {}, scope))
+        except Exception:
+            return False
+
+
+class TriggerRegistry:
+    """Collects the decorators a pyscript file applies and hands them to the simulator"""
+
+    def __init__(self):
+        self.state: list[StateTrigger] = []
+        self.time: list[tuple[Callable, str]] = []
+        self.events: dict[str, list[Callable]] = {}
+        self.mqtt: list[tuple[Callable, str]] = []
+        self.services: dict[str, Callable] = {}
+
+    def state_trigger(self, *exprs, **_kwargs):
+        def decorator(fn):
+            for expr in exprs:
+                self.state.append(StateTrigger(fn, str(expr)))
+            return fn
+        return decorator
+
+    def time_trigger(self, *specs, **_kwargs):
+        def decorator(fn):
+            for spec in specs or ("startup",):
+                self.time.append((fn, str(spec)))
+            return fn
+        return decorator
+
+    def event_trigger(self, event_type, *_args, **_kwargs):
+        def decorator(fn):
+            self.events.setdefault(str(event_type), []).append(fn)
+            return fn
+        return decorator
+
+    def mqtt_trigger(self, topic, *_args, **_kwargs):
+        def decorator(fn):
+            self.mqtt.append((fn, str(topic)))
+            return fn
+        return decorator
+
+    def service_name(self, fn, name=None) -> str:
+        return str(name) if name else f"pyscript.{fn.__name__}"
+
+    def watching(self, entity_id: str, attrs_changed: set[str], value_changed: bool):
+        for trig in self.state:
+            for name in trig.names:
+                if name == entity_id and value_changed:
+                    yield trig, name
+                    break
+                if name.startswith(entity_id + ".") and name[len(entity_id) + 1:] in attrs_changed:
+                    yield trig, name
+                    break
+
+
+def _innermost(fn: Callable) -> Callable:
+    """The decorated def behind wrapper closures (pyscript matches kwargs against it)"""
+    seen = set()
+    while id(fn) not in seen:
+        seen.add(id(fn))
+        inner = [cell.cell_contents for cell in (getattr(fn, "__closure__", None) or ())
+                 if inspect.isfunction(cell.cell_contents)]
+        if not inner:
+            break
+        fn = inner[0]
+    return fn
+
+
+def _accepts(fn: Callable, kwargs: dict) -> dict:
+    """Trigger kwargs the decorated def can take (everything when it has **kwargs)"""
+    try:
+        params = inspect.signature(_innermost(fn)).parameters.values()
+    except (TypeError, ValueError):
+        return kwargs
+    if any(p.kind is p.VAR_KEYWORD for p in params):
+        return kwargs
+    names = {p.name for p in params}
+    return {k: v for k, v in kwargs.items() if k in names}
+
+
+# ----------------------------------------------------------------------------
+# pyscript runtime shims
+# ----------------------------------------------------------------------------
+class SimState(DummyState):
+    """State machine that dispatches changes to registered state triggers"""
+
+    def __init__(self, sim: "HomeSimulator"):
+        super().__init__()
+        self.sim = sim
+        self.writes = 0
+
+    def set(self, entity_id: str, value: Any, attrs: dict | None = None, **kwargs):
+        old_value = self.states.get(entity_id)
+        old_attrs = self.attrs.get(entity_id, {})
+        new_attrs = dict(old_attrs) if attrs is None else dict(attrs)
+        new_attrs.update(kwargs)
+        self.states[entity_id] = value
+        self.attrs[entity_id] = new_attrs
+        self.writes += 1
+        changed = {key for key in set(old_attrs) | set(new_attrs) if old_attrs.get(key) != new_attrs.get(key)}
+        self.sim._state_changed(entity_id, old_value, value, changed)
+
+
+class SimService(DummyService):
+    """Service registry plus the helper/light side effects the controllers rely on"""
+
+    def __init__(self, sim: "HomeSimulator", state: SimState):
+        super().__init__(state)
+        self.sim = sim
+
+    def _record(self, domain: str, service_name: str, data: dict):
+        self.calls.append((domain, service_name, data))
+        self.sim.commands.append((self.sim.now(), domain, service_name, data))
+
+    def __call__(self, *args, **_kwargs):
+        registry = self.sim.registry
+        if args and callable(args[0]):
+            fn = args[0]
+            registry.services[registry.service_name(fn)] = fn
+            return fn
+
+        def decorator(fn):
+            registry.services[registry.service_name(fn, args[0] if args else None)] = fn
+            return fn
+        return decorator
+
+    def call(self, domain: str, service_name: str, **data):
+        if domain == "pyscript":
+            self.calls.append((domain, service_name, data))
+            self.sim.call_soon_service(f"pyscript.{service_name}", **data)
+            return
+        if domain == "mqtt" and service_name == "publish":
+            self._record(domain, service_name, data)
+            self.sim.broker.publish(data["topic"], data.get("payload", ""),
+                                    retain=bool(data.get("retain")), qos=int(data.get("qos", 0)))
+            return
+        if domain == "light":
+            self._record(domain, service_name, data)
+            entities = data.get("entity_id") or []
+            for entity in [entities] if isinstance(entities, str) else entities:
+                if service_name == "turn_off":
+                    self.state.set(entity, "off", {})
+                    continue
+                attrs = dict(self.state.getattr(entity))
+                if "brightness_pct" in data:
+                    attrs["brightness"] = int(round(float(data["brightness_pct"]) * 255 / 100))
+                if "brightness" in data:
+                    attrs["brightness"] = int(data["brightness"])
+                for key in ("kelvin", "color_temp_kelvin"):
+                    if key in data:
+                        attrs["color_temp_kelvin"] = int(data[key])
+                self.state.set(entity, "on", attrs)
+            return
+        self.sim.commands.append((self.sim.now(), domain, service_name, data))
+        super().call(domain, service_name, **data)
+
+
+class SimTaskModule:
+    """pyscript `task` module backed by the virtual loop"""
+
+    def __init__(self, sim: "HomeSimulator"):
+        self.sim = sim
+        self.created = []
+
+    def create(self, coro):
+        self.created.append(coro)
+        return self.sim.spawn(coro)
+
+    async def sleep(self, seconds: float):
+        await asyncio.sleep(seconds)
+
+    async def executor(self, fn, *args, **kwargs):
+        return fn(*args, **kwargs)
+
+
+@lru_cache(maxsize=None)
+def _compiled(path: str):
+    return compile(Path(path).read_text(), path, "exec")
+
+
+# ----------------------------------------------------------------------------
+# Simulator
+# ----------------------------------------------------------------------------
+class HomeSimulator:
+    """Runs pyscript files against a scripted day on a virtual clock"""
+
+    def __init__(self, start: datetime, scripts=("home_controller.py",), broker: FakeBroker | None = None):
+        self.start = start
+        self.broker = broker or FakeBroker()
+        self.journal_path = ":memory:"
+        self.loop = VirtualEventLoop()
+        self.registry = TriggerRegistry()
+        self.state = SimState(self)
+        self.service = SimService(self, self.state)
+        self.task = SimTaskModule(self)
+        self.log = DummyLog()
+        self.failures: list[str] = []
+        self.commands: list[tuple[datetime, str, str, dict]] = []
+        self.observers: list[Callable[[str, Any, Any], Any]] = []
+        self.trigger_calls = 0
+        self.max_calls_per_instant = 500
+        self._instant = (None, 0)
+        self._started = False
+        self.modules = [self._load(REPO_ROOT / script) for script in scripts]
+
+    # -- loading ---------------------------------------------------------------
+    def _load(self, path: Path) -> types.ModuleType:
+        module = types.ModuleType(path.stem)
+        module.__file__ = str(path)
+        module.state = self.state
+        module.service = self.service
+        module.task = self.task
+        module.log = self.log
+        module.state_trigger = self.registry.state_trigger
+        module.time_trigger = self.registry.time_trigger
+        module.event_trigger = self.registry.event_trigger
+        module.service_trigger = self.registry.event_trigger
+        module.mqtt_trigger = self.registry.mqtt_trigger
+        module.pyscript_compile = lambda fn: fn
+        module.pyscript_executor = lambda fn: fn
+        exec(_compiled(str(path)), module.__dict__)
+        if hasattr(module, "_now"):
+            module._now = self.now
+        if hasattr(module, "_JOURNAL_PATH"):
+            module._JOURNAL_PATH = self.journal_path
+        if hasattr(module, "_EPHEMERIS_PATH"):
+            module._EPHEMERIS_PATH = str(REPO_ROOT / "modules" / "solar_ephemeris.py")
+        return module
+
+    @property
+    def controller(self) -> types.ModuleType:
+        return self.modules[0]
+
+    # -- clock -----------------------------------------------------------------
+    def now(self) -> datetime:
+        return self.start + timedelta(seconds=self.loop.time())
+
+    def _when(self, when) -> datetime:
+        if isinstance(when, datetime):
+            return when
+        if isinstance(when, timedelta):
+            return self.start + when
+        if isinstance(when, dt_time):
+            return datetime.combine(self.start.date(), when)
+        hour, minute, *rest = (int(part) for part in str(when).split(":"))
+        return self.start.replace(hour=hour, minute=minute, second=rest[0] if rest else 0, microsecond=0)
+
+    # -- state -----------------------------------------------------------------
+    def prime(self, values: dict[str, Any], attrs: dict[str, dict] | None = None):
+        """Seed entities without firing triggers (the world before the day starts)"""
+        for entity_id, value in values.items():
+            self.state.states[entity_id] = value
+            self.state.attrs[entity_id] = dict((attrs or {}).get(entity_id, {}))
+
+    def get(self, entity_id: str, default: Any = None):
+        return self.state.get(entity_id, default)
+
+    def set(self, entity_id: str, value: Any, attrs: dict | None = None):
+        self.state.set(entity_id, value, attrs)
+
+    def value_of(self, name: str):
+        if name in self.state.states:
+            return self.state.states[name]
+        entity_id, _, attr = name.rpartition(".")
+        if entity_id in self.state.attrs:
+            return self.state.attrs[entity_id].get(attr)
+        return None
+
+    @property
+    def errors(self) -> list[str]:
+        return self.failures + [message for level, message in self.log.messages if level == "error"]
+
+    # -- dispatch --------------------------------------------------------------
+    def spawn(self, coro) -> asyncio.Task:
+        """Schedule a coroutine on the virtual loop, recording it if it raises"""
+        created = self.loop.create_task(coro)
+        created.add_done_callback(self._task_done)
+        return created
+
+    def _task_done(self, finished: asyncio.Task):
+        if not finished.cancelled() and finished.exception() is not None:
+            self.failures.append(f"task: {finished.exception()!r}")
+
+    def _invoke(self, fn: Callable, kwargs: dict):
+        self.trigger_calls += 1
+        now = self.loop.time()
+        calls = self._instant[1] + 1 if self._instant[0] == now else 1
+        self._instant = (now, calls)
+        if calls > self.max_calls_per_instant:
+            # triggers feeding each other without time moving: fail instead of hanging
+            if calls == self.max_calls_per_instant + 1:
+                self.failures.append(f"runaway triggers at {self.now()} ({getattr(fn, '__name__', fn)})")
+            self.loop.stop()
+            return
+        try:
+            result = fn(**_accepts(fn, kwargs))
+            if inspect.iscoroutine(result):
+                self.spawn(result)
+        except Exception as exc:
+            self.failures.append(f"{getattr(fn, '__name__', fn)}: {exc!r}")
+
+    def _state_changed(self, entity_id: str, old_value, value, attrs_changed: set[str]):
+        if not self._started:
+            return
+        value_changed = old_value != value
+        if not value_changed and not attrs_changed:
+            return
+        for observer in self.observers:
+            observer(entity_id, old_value, value)
+        if self.registry.events.get("state_changed"):
+            new_state = types.SimpleNamespace(state=value, attributes=dict(self.state.attrs.get(entity_id, {})))
+            self.loop.call_soon(partial(
+                self.fire_event, "state_changed", entity_id=entity_id,
+                old_state=types.SimpleNamespace(state=old_value), new_state=new_state))
+        for trig, name in self.registry.watching(entity_id, attrs_changed, value_changed):
+            if name == entity_id:
+                payload = {"trigger_type": "state", "var_name": name, "value": value, "old_value": old_value}
+            else:
+                payload = {"trigger_type": "state", "var_name": name, "value": self.value_of(name),
+                           "old_value": None}
+            # pyscript runs triggers after the writer yields, not inline
+            self.loop.call_soon(self._fire_state, trig, payload)
+
+    def _fire_state(self, trig: StateTrigger, payload: dict):
+        if trig.holds(self):
+            self._invoke(trig.fn, payload)
+
+    def call_soon_service(self, name: str, **data):
+        fn = self.registry.services.get(name)
+        if fn is None:
+            self.failures.append(f"unknown service {name}")
+            return
+        self.loop.call_soon(self._invoke, fn, data)
+
+    def fire_event(self, event_type: str, **data):
+        for fn in self.registry.events.get(event_type, []):
+            self._invoke(fn, {"trigger_type": "event", "event_type": event_type, **data})
+
+    def _mqtt_received(self, fn: Callable, topic: str, payload: str):
+        self.loop.call_soon(self._invoke, fn, {"trigger_type": "mqtt", "topic": topic, "payload": payload})
+
+    async def _cron(self, fn: Callable, expr: str):
+        while True:
+            now = self.now()
+            wake = next_cron_time(expr, now)
+            await asyncio.sleep((wake - now).total_seconds())
+            self._invoke(fn, {"trigger_type": "time"})
+
+    def _start(self):
+        self._started = True
+        for fn, topic in self.registry.mqtt:
+            # broker callbacks run like triggers: after the publisher yields
+            self.broker.subscribe(topic, partial(self._mqtt_received, fn))
+        for fn, spec in self.registry.time:
+            if spec == "startup":
+                self.loop.call_soon(self._invoke, fn, {"trigger_type": "time"})
+            elif spec.startswith("cron(") and spec.endswith(")"):
+                self.spawn(self._cron(fn, spec[5:-1]))
+            else:
+                self.failures.append(f"unsupported time_trigger {spec}")
+
+    # -- scripting -------------------------------------------------------------
+    def at(self, when, action: Callable, *args, **kwargs):
+        """Run action(*args, **kwargs) at a virtual time ("HH:MM", time, datetime or offset)"""
+        delay = max(0.0, (self._when(when) - self.now()).total_seconds())
+
+        def run():
+            try:
+                action(*args, **kwargs)
+            except Exception as exc:
+                self.failures.append(f"scripted {getattr(action, '__name__', action)}: {exc!r}")
+
+        self.loop.call_later(delay, run)
+
+    def call_service(self, name: str, **data):
+        """Invoke a registered pyscript service (use with at() to script it)"""
+        self.call_soon_service(name, **data)
+
+    def sun_profile(self, sunrise: datetime, sunset: datetime, peak: float = 30.0,
+                    every: timedelta = timedelta(minutes=5), days: int = 1):
+        """Publish sunrise/sunset helpers and schedule sun.sun elevation updates"""
+        self.prime({
+            "pyscript.sunrise_today": sunrise.isoformat(),
+            "pyscript.sunset_today": sunset.isoformat(),
+            "sun.sun": "above_horizon" if sunrise <= self.start < sunset else "below_horizon",
+        }, {"sun.sun": {"elevation": _elevation(self.start, sunrise, sunset, peak)}})
+        when = self.start + every
+        end = self.start + timedelta(days=days)
+        while when <= end:
+            elev = _elevation(when, sunrise, sunset, peak)
+            label = "above_horizon" if elev > 0 else "below_horizon"
+            self.at(when, self.set, "sun.sun", label, {"elevation": elev})
+            when += every
+
+    def run_until(self, when):
+        """Advance virtual time to `when`, running every trigger and timer due on the way"""
+        if not self._started:
+            self._start()
+        delay = max(0.0, (self._when(when) - self.now()).total_seconds())
+        try:
+            self.loop.run_until_complete(asyncio.sleep(delay))
+        except RuntimeError:
+            if not self.failures:
+                raise
+
+    def settle(self, limit: int = 10_000):
+        """Run everything runnable at the current instant without advancing the clock"""
+        if not self._started:
+            self._start()
+        for _ in range(limit):
+            try:
+                self.loop.run_until_complete(asyncio.sleep(0))
+            except RuntimeError:
+                if not self.failures:
+                    raise
+                return
+            if not self.loop.has_ready():
+                return
+
+    def run_for(self, duration: timedelta):
+        self.run_until(self.now() + duration)
+
+    def close(self):
+        pending = [t for t in asyncio.all_tasks(self.loop) if not t.done()]
+        for pending_task in pending:
+            pending_task.cancel()
+        if pending:
+            self.loop.run_until_complete(asyncio.gather(*pending, return_exceptions=True))
+        self.loop.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_exc):
+        self.close()
+
+
+def _elevation(when: datetime, sunrise: datetime, sunset: datetime, peak: float) -> float:
+    """Half-sine elevation between sunrise and sunset, mirrored below the horizon at night"""
+    day = (sunset - sunrise).total_seconds()
+    t = (when - sunrise).total_seconds() % 86400
+    if t <= day:
+        return round(peak * math.sin(math.pi * t / day), 2)
+    night = 86400 - day
+    return round(-peak * math.sin(math.pi * (t - day) / night), 2)
@@ -0,0 +1,875 @@
+import asyncio
+from collections import Counter
+import sys
+import threading
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+from fake_mqtt import FakeBroker
+from test_early_morning import classify, hc_env, prime_defaults  # noqa: F401 (fixture)
+
+
+def _count_reads(state):
+    counts: Counter = Counter()
+    original_get = state.get
+    original_getattr = state.getattr
+
+    def counting_get(entity_id, default=None):
+        counts[entity_id] += 1
+        return original_get(entity_id, default)
+
+    def counting_getattr(entity_id):
+        counts[f"attr:{entity_id}"] += 1
+        return original_getattr(entity_id)
+
+    state.get = counting_get
+    state.getattr = counting_getattr
+    return counts
+
+
+def test_minutely_tick_reads_each_entity_once(hc_env):
+    module, state = hc_env
+    prime_defaults(state)
+    state.set("pyscript.sunrise_today", "2024-01-05T07:10:00")
+    state.set("pyscript.sunset_today", "2024-01-05T17:05:00")
+    state.set("binary_sensor.in_evening_window", "on")
+
+    module._now = lambda: datetime(2024, 1, 5, 17, 30)
+    module._refresh_daily_constants()
+
+    counts = _count_reads(state)
+    module._minutely_tick()
+
+    assert state.get("pyscript.home_state") == "Evening"
+    assert counts["input_select.home_state"] <= 2  # re-read once after the mode write
+    assert counts["binary_sensor.in_evening_window"] <= 1
+    assert module._snapshot_stats["hits"] > 0
+    assert module._state_snapshots == {}
+
+
+def test_snapshot_invalidates_controller_writes(hc_env):
+    module, state = hc_env
+    prime_defaults(state)
+
+    @module.with_hc_snapshot
+    def evaluation():
+        before = module._get("sensor.night_last_reason")
+        module._set_sensor("sensor.night_last_reason", "failsafe_23")
+        return before, module._get("sensor.night_last_reason")
+
+    assert evaluation() == (None, "failsafe_23")
+
+
+def test_set_sensor_drops_noop_writes(hc_env):
+    module, state = hc_env
+    writes = []
+    original_set = state.set
+
+    def tracking_set(entity_id, value, attrs=None):
+        writes.append(entity_id)
+        original_set(entity_id, value, attrs)
+
+    state.set = tracking_set
+    attrs = {"friendly_name": "Morning Ramp Brightness", "ramp_type": "work"}
+
+    module._set_sensor("sensor.sleep_in_ramp_brightness", 12, attrs)
+    module._set_sensor("sensor.sleep_in_ramp_brightness", 12, dict(attrs))
+    module._set_sensor("sensor.sleep_in_ramp_brightness", 13, attrs)
+
+    assert writes == ["sensor.sleep_in_ramp_brightness"] * 2
+    assert module._write_stats["suppressed"] == 1
+    assert module._write_stats["emitted"] == 2
+
+
+def test_evaluation_coalesces_writes_into_one_flush(hc_env):
+    module, state = hc_env
+    prime_defaults(state)
+    writes = []
+    original_set = state.set
+
+    def tracking_set(entity_id, value, attrs=None):
+        writes.append((entity_id, value))
+        original_set(entity_id, value, attrs)
+
+    state.set = tracking_set
+
+    @module.with_hc_snapshot
+    def evaluation():
+        module._set_sensor("sensor.day_ready_reason", "first")
+        module._set_sensor("sensor.day_ready_reason", "second")
+        module._set_input_text("input_text.em_route_key", "work")
+        module._set_input_text("input_text.em_route_key", "day_off")
+        assert module._get("sensor.day_ready_reason") == "second"
+        assert writes == []
+
+    evaluation()
+
+    assert writes == [
+        ("sensor.day_ready_reason", "second"),
+        ("input_text.em_route_key", "day_off"),
+    ]
+    assert module._write_stats["coalesced"] == 2
+
+
+def test_mqtt_contract_skips_unchanged_payload(hc_env):
+    module, state = hc_env
+    prime_defaults(state)
+
+    module._publish_em_contract()
+    module._publish_em_contract()
+
+    publishes = [call for call in module.service.calls
+                 if call[:2] == ("mqtt", "publish") and call[2]["topic"].endswith("/em/contract")]
+    assert len(publishes) == 1
+
+
+def test_mqtt_outbox_collapses_publishes_within_window(hc_env, monkeypatch):
+    module, state = hc_env
+    prime_defaults(state)
+    monkeypatch.setattr(module, "_MQTT_DEBOUNCE_SECONDS", 0.01)
+    broker = FakeBroker().attach(module.service)
+
+    async def burst():
+        for route in ("work", "day_off", "work"):
+            state.set("input_text.em_route_key", route)
+            module._publish_em_contract()
+        assert broker.published == []
+        await module._mqtt_outbox_task
+
+    asyncio.run(burst())
+
+    assert broker.topics() == ["home/rework/controller/em/contract", module._MQTT_SNAPSHOT_TOPIC]
+    assert broker.payload("home/rework/controller/em/contract")["route"] == "work"
+    assert module._write_stats["coalesced"] == 2
+
+
+def _restart_with_snapshot(module):
+    """Publish the current helpers as the retained snapshot, then let the helpers change"""
+    broker = FakeBroker().attach(module.service)
+    module._mqtt_mark_snapshot_dirty()
+    broker.subscribe(module._MQTT_SNAPSHOT_TOPIC,
+                     lambda _topic, payload: module._retained_snapshot_received(payload=payload))
+    assert module._retained_snapshot["em_route"] == "work"
+
+
+def _run_startup(module):
+    async def restart():
+        module._evaluate_startup_state()
+        for pending in asyncio.all_tasks() - {asyncio.current_task()}:
+            pending.cancel()
+
+    asyncio.run(restart())
+
+
+def test_startup_fills_missing_helpers_from_retained_snapshot(hc_env):
+    module, state = hc_env
+    prime_defaults(state)
+    module._now = lambda: datetime(2024, 1, 5, 5, 20)
+    state.set("input_text.em_route_key", "work")
+    state.set("input_datetime.em_start_ts", "2024-01-05T04:55:00")
+    state.set("input_boolean.em_active", "on")
+    state.set("device_tracker.iphone15", "home")
+    state.set("device_tracker.work_iphone", "home")
+    _restart_with_snapshot(module)
+
+    # helpers not restored yet after the restart
+    state.set("input_text.em_route_key", "unavailable")
+    state.set("input_datetime.em_start_ts", "unknown")
+    _run_startup(module)
+
+    assert state.get("pyscript.home_state") == "Early Morning"
+
+
+def test_retained_snapshot_arriving_after_startup_reruns_the_restore(hc_env):
+    module, state = hc_env
+    prime_defaults(state)
+    module._now = lambda: datetime(2024, 1, 5, 5, 20)
+    state.set("input_text.em_route_key", "work")
+    state.set("input_datetime.em_start_ts", "2024-01-05T04:55:00")
+    state.set("input_boolean.em_active", "on")
+    state.set("device_tracker.iphone15", "home")
+    state.set("device_tracker.work_iphone", "home")
+    broker = FakeBroker().attach(module.service)
+    module._mqtt_mark_snapshot_dirty()  # retained on the broker before the restart
+
+    state.set("input_text.em_route_key", "unavailable")
+    state.set("input_datetime.em_start_ts", "unknown")
+
+    async def restart_then_connect():
+        module._evaluate_startup_state()
+        before = state.get("pyscript.home_state")
+        # MQTT connects after startup: the retained snapshot is delivered now
+        broker.subscribe(module._MQTT_SNAPSHOT_TOPIC,
+                         lambda _topic, payload: module._retained_snapshot_received(payload=payload))
+        for pending in asyncio.all_tasks() - {asyncio.current_task()}:
+            pending.cancel()
+        return before
+
+    before = asyncio.run(restart_then_connect())
+
+    assert before != "Early Morning"
+    assert state.get("pyscript.home_state") == "Early Morning"
+    assert module._startup_awaiting_snapshot is False
+
+
+def test_startup_keeps_helpers_over_a_disagreeing_snapshot(hc_env):
+    module, state = hc_env
+    prime_defaults(state)
+    module._now = lambda: datetime(2024, 1, 5, 5, 20)
+    state.set("input_text.em_route_key", "work")
+    state.set("input_datetime.em_start_ts", "2024-01-05T04:55:00")
+    state.set("input_boolean.em_active", "on")
+    state.set("device_tracker.iphone15", "home")
+    state.set("device_tracker.work_iphone", "home")
+    _restart_with_snapshot(module)
+
+    # Early Morning was ended after the snapshot was retained
+    state.set("input_boolean.em_active", "off")
+    assert module._startup_facts()["em_active"] == "off"
+    _run_startup(module)
+
+    assert state.get("pyscript.home_state") != "Early Morning"
+
+
+def test_ramp_engine_runs_concurrent_ramps_on_one_task(hc_env, monkeypatch):
+    module, state = hc_env
+    prime_defaults(state)
+
+    clock = {"now": datetime(2024, 1, 5, 19, 0)}
+    module._now = lambda: clock["now"]
+
+    async def fake_sleep(seconds):
+        clock["now"] += timedelta(seconds=seconds)
+
+    monkeypatch.setattr(module, "_ramp_supervisor_sleep", fake_sleep)
+
+    outputs = {"kitchen": [], "hallway": []}
+    outcomes = {}
+    status = {}
+
+    def spec(name, minutes):
+        return {
+            "name": name,
+            "start": clock["now"],
+            "end": clock["now"] + timedelta(minutes=minutes),
+            "channels": {"brightness": (80, 40, 1)},
+            "sinks": [lambda s, values, now: outputs[s["name"]].append(values["brightness"])],
+            "on_complete": lambda s, outcome: outcomes.setdefault(s["name"], outcome),
+        }
+
+    async def run_ramps():
+        module._ramp_engine_start(spec("kitchen", 10))
+        module._ramp_engine_start(spec("hallway", 20))
+        status.update(module._ramp_engine_status())
+        await module._ramp_supervisor_task
+
+    asyncio.run(run_ramps())
+
+    assert [coro.__name__ for coro in module.task.created if "ramp" in coro.__name__] == ["_ramp_supervisor"]
+    assert set(status["active"]) == {"kitchen", "hallway"}
+    assert status["active"]["kitchen"]["values"] == {"brightness": 80}
+    assert outcomes == {"kitchen": "complete", "hallway": "complete"}
+    assert outputs["kitchen"] == list(range(80, 39, -1))
+    assert module._ramp_specs == {}
+
+
+def test_failing_ramp_runs_its_hook_and_leaves_the_others(hc_env, monkeypatch):
+    module, state = hc_env
+    prime_defaults(state)
+
+    clock = {"now": datetime(2024, 1, 5, 19, 0)}
+    module._now = lambda: clock["now"]
+
+    async def fake_sleep(seconds):
+        clock["now"] += timedelta(seconds=seconds)
+
+    monkeypatch.setattr(module, "_ramp_supervisor_sleep", fake_sleep)
+    outcomes = {}
+
+    def broken_guard(spec):
+        if clock["now"] > spec["start"]:
+            raise RuntimeError("sensor gone")
+        return True
+
+    def spec(name, guard=None):
+        return {
+            "name": name,
+            "start": clock["now"],
+            "end": clock["now"] + timedelta(minutes=10),
+            "channels": {"brightness": (80, 40, 1)},
+            "guard": guard,
+            "on_complete": lambda s, outcome: outcomes.setdefault(s["name"], outcome),
+        }
+
+    async def run_ramps():
+        module._ramp_engine_start(spec("kitchen", broken_guard))
+        module._ramp_engine_start(spec("hallway"))
+        await module._ramp_supervisor_task
+
+    asyncio.run(run_ramps())
+
+    assert outcomes == {"kitchen": "failed", "hallway": "complete"}
+    assert module._ramp_specs == {}
+
+
+def test_failed_nonwork_ramp_clears_active_flag_without_day_handoff(hc_env):
+    module, state = hc_env
+    prime_defaults(state)
+    state.set("input_boolean.sleep_in_ramp_active", "on")
+    state.set("pyscript.home_state", "Early Morning")
+    start = datetime(2024, 1, 5, 6, 3)
+    module._now = lambda: start + timedelta(minutes=5)
+
+    module._finish_nonwork_ramp({"ramp_type": "nonwork", "start": start, "end": start + timedelta(minutes=60),
+                                 "channels": {"brightness": (10, 70, 1)}}, "failed")
+
+    assert state.get("input_boolean.sleep_in_ramp_active") == "off"
+    assert state.get("sensor.sleep_in_ramp_brightness") == 70
+    assert state.get("pyscript.home_state") == "Early Morning"
+
+
+def test_sun_updates_still_verify_an_armed_day_ready_plan(hc_env, monkeypatch):
+    module, state = hc_env
+    prime_defaults(state)
+    state.set("pyscript.sunrise_today", "2024-01-05T08:06:00")
+    state.set("pyscript.sunset_today", "2024-01-05T16:10:00")
+    state.set("zone.home", "0", {"latitude": 51.48, "longitude": 0.0})
+    module._now = lambda: datetime(2024, 1, 5, 12, 0)
+    module._refresh_daily_constants()
+    plan = module._day_ready_plan_for(datetime(2024, 1, 5).date(), 10.0)
+    assert plan["location"] == (51.48, 0.0)
+
+    evaluations = []
+    monkeypatch.setattr(module, "_run_transition_evaluation", evaluations.append)
+    state.set("sun.sun", "above_horizon", {"elevation": 2.0})
+    module._sun_elevation_changed(value="above_horizon")
+    module._sun_elevation_changed(value="above_horizon")
+
+    assert evaluations == []
+    warnings = [message for level, message in module.log.messages if "check latitude/longitude" in message]
+    assert len(warnings) == 1
+
+    # a moved home is a different plan
+    state.set("zone.home", "0", {"latitude": -33.87, "longitude": 151.21})
+    assert module._day_ready_plan_for(datetime(2024, 1, 5).date(), 10.0)["location"] == (-33.87, 151.21)
+
+
+def test_next_transition_picks_nearest_boundary(hc_env):
+    module, state = hc_env
+    prime_defaults(state)
+    state.set("pyscript.sunrise_today", "2024-01-05T07:10:00")
+    state.set("pyscript.sunset_today", "2024-01-05T17:05:00")
+
+    module._now = lambda: datetime(2024, 1, 5, 12, 0)
+    module._refresh_daily_constants()
+
+    assert module._next_transition(datetime(2024, 1, 5, 5, 0)) == (
+        datetime(2024, 1, 5, 5, 40), "work_ramp_end")
+    assert module._next_transition(datetime(2024, 1, 5, 12, 0)) == (
+        datetime(2024, 1, 5, 16, 50), "evening_window_open")
+    assert module._next_transition(datetime(2024, 1, 5, 17, 0)) == (
+        datetime(2024, 1, 5, 23, 0), "evening_cutoff")
+
+    state.set("zone.home", "0", {"latitude": 51.48, "longitude": 0.0})
+    on_at, off_at = module._day_ready_window(datetime(2024, 1, 5, 8, 0))
+    assert module._next_transition(on_at - timedelta(seconds=30)) == (on_at, "day_ready_on")
+    assert module._next_transition(off_at - timedelta(seconds=30)) == (off_at, "day_ready_off")
+
+
+def test_transition_timer_is_armed_once_per_boundary(hc_env):
+    module, state = hc_env
+    prime_defaults(state)
+    state.set("pyscript.sunset_today", "2024-01-05T17:05:00")
+    module._now = lambda: datetime(2024, 1, 5, 12, 0)
+    module._refresh_daily_constants()
+
+    async def arm_twice():
+        module._arm_transition_timer()
+        module._arm_transition_timer()
+        module._transition_timer_task.cancel()
+
+    asyncio.run(arm_twice())
+
+    assert len(module.task.created) == 1
+    assert state.get("sensor.pys_next_transition") == "2024-01-05T16:50:00"
+
+
+def test_transition_timer_rearms_after_a_failing_tick(hc_env, monkeypatch):
+    module, state = hc_env
+    prime_defaults(state)
+    state.set("pyscript.sunset_today", "2024-01-05T17:05:00")
+    module._now = lambda: datetime(2024, 1, 5, 12, 0)
+    module._refresh_daily_constants()
+    failures = []
+
+    def failing_tick():
+        failures.append("tick")
+        raise RuntimeError("input_select.home_state unavailable")
+
+    monkeypatch.setattr(module, "_minutely_tick", failing_tick)
+    monkeypatch.setattr(module, "_clock_sleep", lambda seconds: asyncio.sleep(0))
+
+    async def fire_once():
+        await module._transition_timer_runner(datetime(2024, 1, 5, 12, 0), "evening_window_open")
+        rearmed = module._transition_timer_task
+        rearmed.cancel()
+        return rearmed
+
+    rearmed = asyncio.run(fire_once())
+
+    assert failures == ["tick"]
+    assert rearmed is not None
+    assert state.get("sensor.pys_next_transition") == "2024-01-05T16:50:00"
+
+
+def test_clock_caches_simulation_anchor_and_scales_time(hc_env):
+    module, state = hc_env
+    prime_defaults(state)
+    state.set("input_boolean.time_freeze_active", "on")
+    state.set("input_datetime.sim_time_override", "04:50:00")
+    state.set("input_number.hc_clock_speed", 60)
+
+    first = module._now()
+    assert first.time().replace(microsecond=0) == datetime(2024, 1, 1, 4, 50).time()
+
+    counts = _count_reads(state)
+    module._clock_cache["anchor_real"] -= timedelta(seconds=10)
+    assert module._now() - first >= timedelta(minutes=10)
+    assert counts["input_boolean.time_freeze_active"] == 0
+    assert module._clock_real_seconds(600) == 10
+
+    # a missing or zero speed helper is real time, never a frozen clock that stalls every timer
+    for speed in (None, 0, "unavailable"):
+        state.set("input_number.hc_clock_speed", speed)
+        module._clock_invalidate()
+        assert module._clock_real_seconds(30) == 30
+
+    state.set("input_boolean.hc_clock_frozen", "on")
+    module._clock_invalidate()
+    assert module._clock_real_seconds(600) == module._CLOCK_FROZEN_POLL_SECONDS
+
+
+def test_boolean_flags_resolve_once_per_registry_build(hc_env):
+    module, state = hc_env
+    prime_defaults(state)
+    state.set("input_boolean.em_active", "off")
+    module._ensure_entities()
+
+    counts = _count_reads(state)
+    module._set_boolean_state("em_active", "on")
+    assert module._get_boolean_state("em_active") == "on"
+    module._get_boolean_state("sleep_in_ramp_active")
+
+    assert counts["binary_sensor.em_active"] == 0
+    assert counts["pyscript.em_active"] == 0
+    assert counts["binary_sensor.sleep_in_ramp_active"] == 0
+    assert ("input_boolean", "turn_on") in [call[:2] for call in module.service.calls]
+
+    state.set("binary_sensor.em_active", "off")
+    module._entity_registry_updated()
+    assert module._get_boolean_state("em_active") == "off"
+
+
+def test_boolean_flag_rebinds_when_its_helper_loads_late(hc_env):
+    module, state = hc_env
+    prime_defaults(state)
+    state.set("input_boolean.em_active", "unavailable")
+    state.set("pyscript.em_active", "off")
+    module._ensure_entities()
+    assert "em_active" not in module._boolean_registry
+
+    state.set("input_boolean.em_active", "on")
+    assert module._get_boolean_state("em_active") == "on"
+    assert module._boolean_registry["em_active"][0] == "input_boolean.em_active"
+
+    # a cached helper that goes unavailable is dropped and probed again
+    state.set("input_boolean.em_active", "unavailable")
+    assert module._get_boolean_state("em_active") == "off"
+    assert "em_active" not in module._boolean_registry
+
+
+def test_night_cutover_turns_lights_off_in_one_call(hc_env):
+    module, state = hc_env
+    prime_defaults(state)
+    for entity, value in {"light.lamp_1": "on", "light.lamp_2": "on",
+                          "light.wled_strip": "on", "light.closet": "off"}.items():
+        state.set(entity, value)
+
+    module._run_night_cutover()
+
+    light_calls = [call for call in module.service.calls if call[0] == "light"]
+    assert light_calls == [("light", "turn_off", {"entity_id": ["light.lamp_1", "light.lamp_2"]})]
+
+
+def test_light_dispatch_reports_per_entity_failures(hc_env):
+    module, state = hc_env
+    original_call = module.service.call
+
+    def flaky_call(domain, service_name, **data):
+        if isinstance(data.get("entity_id"), list) or data.get("entity_id") == "light.broken":
+            raise RuntimeError("unavailable")
+        original_call(domain, service_name, **data)
+
+    module.service.call = flaky_call
+    result = module._dispatch_lights("turn_off", ["light.lamp_1", "light.broken"], "test")
+
+    assert result["sent"] == ["light.lamp_1"]
+    assert set(result["failed"]) == {"light.broken"}
+    assert result["calls"] == 3
+
+
+def test_on_light_index_tracks_state_changed_events(hc_env):
+    module, state = hc_env
+    state.set("light.lamp_1", "on")
+    state.set("light.wled_strip", "on")
+    module._rebuild_on_light_index()
+
+    counts = _count_reads(state)
+    state.set("light.closet", "on")
+    module._light_index_changed(entity_id="light.closet", new_state=SimpleNamespace(state="on"))
+    module._light_index_changed(entity_id="light.lamp_1", new_state=SimpleNamespace(state="off"))
+
+    assert module._lights_on(exclude=("wled",)) == ["light.closet"]
+    assert module._get_on_temp_capable_lights() == ["light.closet"]
+    assert sum(counts.values()) == 0
+
+
+def test_error_storm_sends_one_alert_then_summaries(hc_env):
+    module, state = hc_env
+
+    @module.catch_hc_trigger_error("tick")
+    def tick(entity_id):
+        raise ValueError(f"helper {entity_id} unavailable since 12:{entity_id[-2:]}")
+
+    for minute in range(60):
+        tick(f"sensor.helper_{minute:02d}")
+
+    notifications = [call for call in module.service.calls if call[0] in ("notify", "persistent_notification")]
+    assert len(notifications) == len(module.NOTIFY_TARGETS) + 1
+
+    group = next(iter(module._error_groups.values()))
+    assert group["count"] == 60 and group["pending"] == 59
+    group["notified_at"] -= module._ERROR_SUMMARY_INTERVAL
+    tick("sensor.helper_99")
+
+    summaries = [call for call in module.service.calls if call[0] == "persistent_notification"]
+    assert len(summaries) == 2
+    assert summaries[0][2]["notification_id"] == summaries[1][2]["notification_id"]
+    assert "60 more" in summaries[1][2]["message"]
+    assert len(module._error_status()["recent"]) == module._ERROR_RING_SIZE
+
+
+def test_error_groups_expire_and_stay_capped(hc_env, monkeypatch):
+    module, state = hc_env
+    monkeypatch.setattr(module, "_ERROR_GROUPS_MAX", 5)
+
+    def fail(name):
+        module._send_home_controller_error_alert(name, ValueError("boom"))
+
+    for n in range(8):
+        fail(f"fn_{n}")
+    assert [key[0] for key in module._error_groups] == [f"fn_{n}" for n in range(3, 8)]
+
+    fail("fn_3")  # a repeat counts as recent use
+    fail("fn_8")
+    assert [key[0] for key in module._error_groups] == ["fn_5", "fn_6", "fn_7", "fn_3", "fn_8"]
+
+    for group in module._error_groups.values():
+        group["last"] -= module._ERROR_GROUP_TTL
+    module._flush_error_summaries()  # fn_3's pending repeat is summarised, then everything is quiet
+    assert module._error_groups == {}
+
+
+def test_perf_counters_record_only_when_enabled(hc_env):
+    module, state = hc_env
+    prime_defaults(state)
+    state.set("pyscript.sunset_today", "2024-01-05T17:05:00")
+    module._now = lambda: datetime(2024, 1, 5, 12, 0)
+
+    module._minutely_tick()
+    assert module._perf_stats == {}
+
+    module.home_controller_perf(action="enable")
+    module._minutely_tick()
+    module._minutely_tick()
+    report = module.home_controller_perf()
+
+    assert report["enabled"] is True
+    assert report["functions"]["_minutely_tick"]["calls"] == 2
+    assert sum(module._perf_stats["_minutely_tick"]["buckets"]) == 2
+    assert state.get("sensor.pys_controller_perf") in report["functions"]
+    assert module.home_controller_perf(action="reset")["functions"] == {}
+
+
+def test_startup_computes_constants_once_and_records_phases(hc_env, monkeypatch):
+    module, state = hc_env
+    prime_defaults(state)
+    state.set("device_tracker.iphone15", "home")
+    state.set("device_tracker.work_iphone", "home")
+    state.set("pyscript.sunset_today", "2024-01-05T17:05:00")
+    module._now = lambda: datetime(2024, 1, 5, 12, 0)
+    monkeypatch.setattr(module, "_arm_transition_timer", lambda: None)
+
+    refreshes = []
+    original_refresh = module._refresh_daily_constants
+    monkeypatch.setattr(module, "_refresh_daily_constants", lambda: refreshes.append(1) or original_refresh())
+    counts = _count_reads(state)
+
+    module._startup_initialization()
+
+    assert refreshes == [1]
+    assert counts["sensor.day_commit_time"] <= 1
+    timing = state.getattr("sensor.pys_startup_timing")
+    assert {"prefetch_ms", "ensure_entities_ms", "evaluate_ms", "flush_writes_ms"} <= set(timing)
+    assert state.get("sensor.pys_last_action").startswith("startup_complete")
+
+
+def test_day_commit_time_recomputes_only_when_inputs_change(hc_env):
+    module, state = hc_env
+    prime_defaults(state)
+    module._now = lambda: datetime(2024, 1, 5, 6, 0)
+    state.set("input_datetime.day_earliest_time", "07:30:00")
+    state.set("sensor.day_min_start", "2024-01-05T07:40:00")
+    state.set("sensor.learned_day_start", "unknown")
+
+    first = module._compute_day_commit_time()
+    state.set("sensor.learned_day_start", "unavailable")
+    assert module._compute_day_commit_time() == first == datetime(2024, 1, 5, 7, 40)
+    assert module._memo_stats["day_commit_time"] == {"hits": 1, "misses": 1}
+
+    state.set("sensor.learned_day_start", "2024-01-05T07:55:00")
+    assert module._compute_day_commit_time() == datetime(2024, 1, 5, 7, 55)
+    state.set("sensor.learned_day_start", "unknown")
+    assert module._compute_day_commit_time() == first
+    assert module._memo_stats["day_commit_time"] == {"hits": 2, "misses": 2}
+
+    module._now = lambda: datetime(2024, 1, 5, 8, 0)
+    assert module._compute_day_commit_time() == datetime(2024, 1, 5, 8, 0)
+
+    state.set("sensor.day_target_brightness_adaptive", 64)
+    assert module._resolve_day_target_brightness() == (64, "sensor.day_target_brightness_adaptive")
+    module._resolve_day_target_brightness()
+    assert module._memo_stats["day_target_brightness"] == {"hits": 1, "misses": 1}
+
+
+def test_transition_table_dispatch_traces_and_replays(hc_env):
+    module, state = hc_env
+    prime_defaults(state)
+    module._now = lambda: datetime(2024, 1, 5, 17, 30)
+    state.set("binary_sensor.in_evening_window", "on")
+    state.set("binary_sensor.day_ready_now", "on")
+    counts = _count_reads(state)
+
+    assert module._dispatch_transition("tick", "test") == "Evening"
+    assert state.get("pyscript.home_state") == "Evening"
+    assert counts["binary_sensor.in_evening_window"] == 1
+
+    record = module._transition_trace[-1]
+    assert (record["from"], record["to"]) == ("Day", "Evening")
+    assert record["guards"] == {"in_evening_window": True, "night_started_today": False, "evening_done": False}
+    assert module._replay_transition(record) == "Evening"
+    assert module._replay_transition(dict(record, guards=dict(record["guards"], evening_done=True))) is None
+
+    assert module._dispatch_transition("presence_home", "test") is None
+    assert ("Evening", "tick") not in module._TRANSITION_TABLE
+
+
+def test_manual_day_leaves_evening_from_previous_mode(hc_env):
+    module, state = hc_env
+    prime_defaults(state)
+    module._now = lambda: datetime(2024, 1, 5, 18, 0)
+    state.set("input_select.home_state", "Evening")
+    module._enter_evening("test", force=True)
+    state.set("input_select.home_state", "Day")
+
+    module._handle_manual_home_state(value="Day", old_value="Evening")
+
+    assert state.get("pyscript.home_state") == "Day"
+    assert module._get_boolean_state("evening_mode_active") == "off"
+
+
+def test_journal_batches_events_into_sqlite(hc_env, tmp_path, monkeypatch):
+    module, state = hc_env
+    prime_defaults(state)
+    monkeypatch.setattr(module, "_JOURNAL_PATH", str(tmp_path / "journal.db"))
+    module._now = lambda: datetime(2024, 1, 5, 17, 30)
+    batches = []
+    original_write = module._journal_write_batch
+    monkeypatch.setattr(module, "_journal_write_batch",
+                        lambda *args: batches.append(len(args[1])) or original_write(*args))
+
+    @module.catch_hc_trigger_error("test_trigger")
+    def trigger():
+        module._set_home_state("Evening")
+        module._dispatch_lights("turn_off", ["light.lamp_1"], "test")
+
+    trigger()
+    assert module._journal_pending and batches == []
+
+    async def flush_and_query():
+        await module._journal_flush()
+        recent = await module.home_controller_journal(last=2)
+        ranged = await module.home_controller_journal(since="2024-01-05T17:00:00", kind="mode")
+        return recent, ranged
+
+    recent, ranged = asyncio.run(flush_and_query())
+
+    assert len(batches) == 1 and module._journal_pending == []
+    assert recent["source"] == "memory"
+    assert [event["name"] for event in recent["events"]] == ["Evening", "light.turn_off"]
+    assert recent["events"][0]["cause"].startswith("test_trigger#")
+    assert ranged["source"] == "sqlite"
+    assert [(event["kind"], event["name"]) for event in ranged["events"]] == [("mode", "Evening")]
+
+
+def test_interleaved_triggers_keep_their_own_journal_cause(hc_env):
+    module, state = hc_env
+    prime_defaults(state)
+    module._now = lambda: datetime(2024, 1, 5, 17, 30)
+
+    def make(name):
+        @module.catch_hc_trigger_error(name)
+        async def trigger():
+            module._journal("probe", f"{name}-before")
+            await asyncio.sleep(0)  # the other trigger runs in between
+            module._journal("probe", f"{name}-after")
+        return trigger
+
+    first, second = make("first"), make("second")
+
+    async def run_both():
+        await asyncio.gather(first(), second())
+
+    asyncio.run(run_both())
+    causes = {row[4]: row[5] for row in module._journal_ring if row[3] == "probe"}
+    for name in ("first", "second"):
+        assert causes[f"{name}-before"].startswith(f"{name}#")
+        assert causes[f"{name}-after"] == causes[f"{name}-before"]
+    assert module._journal_cause.get() is None
+
+
+def test_kitchen_sensors_firing_together_share_one_classification(hc_env):
+    module, state = hc_env
+    prime_defaults(state)
+    now = datetime(2024, 1, 5, 6, 3)
+    module._now = lambda: now
+    ramps = []
+
+    async def fake_nonwork(start_time_override=None):
+        ramps.append(start_time_override)
+
+    module._start_nonwork_ramp = fake_nonwork
+
+    assert classify(module, "binary_sensor.aqara_motion_sensor_p1_occupancy") == "day_off"
+    reads = _count_reads(state)
+    now = datetime(2024, 1, 5, 6, 3, 1)
+    assert classify(module, "binary_sensor.kitchen_iris_frig_occupancy") == "day_off"
+
+    assert sum(reads.values()) == 0
+    assert len(ramps) == 1
+    assert state.getattr("sensor.pys_morning_ramp_profile")["sources"] == [
+        "binary_sensor.aqara_motion_sensor_p1_occupancy", "binary_sensor.kitchen_iris_frig_occupancy"]
+    assert [row[3] for row in module._journal_ring if row[3].startswith("classification")] == [
+        "classification", "classification_merge"]
+
+
+def test_kitchen_sensor_joining_while_classification_yields_waits_for_it(hc_env):
+    module, state = hc_env
+    prime_defaults(state)
+    module._now = lambda: datetime(2024, 1, 5, 6, 3)
+
+    async def fake_nonwork(start_time_override=None):
+        return None
+
+    module._start_nonwork_ramp = fake_nonwork
+    original = module._run_kitchen_classification
+
+    async def yielding_classification(entity_id, now):
+        await asyncio.sleep(0)  # pyscript can switch tasks anywhere in here
+        await asyncio.sleep(0)
+        return await original(entity_id, now)
+
+    module._run_kitchen_classification = yielding_classification
+
+    async def both_sensors():
+        return await asyncio.gather(
+            module._classify_kitchen_motion("binary_sensor.aqara_motion_sensor_p1_occupancy"),
+            module._classify_kitchen_motion("binary_sensor.kitchen_iris_frig_occupancy"))
+
+    assert asyncio.run(both_sensors()) == ["day_off", "day_off"]
+    assert state.getattr("sensor.pys_morning_ramp_profile")["sources"] == [
+        "binary_sensor.aqara_motion_sensor_p1_occupancy", "binary_sensor.kitchen_iris_frig_occupancy"]
+    merges = [row for row in module._journal_ring if row[3] == "classification_merge"]
+    assert [row[4] for row in merges] == ["day_off"]
+
+
+class _InterpretedOnly:
+    """Stands in for pyscript's import of a module: callable on the event loop, not from a worker thread"""
+
+    def __init__(self, module):
+        self._module = module
+
+    def __getattr__(self, name):
+        target = getattr(self._module, name)
+
+        def call(*args, **kwargs):
+            assert threading.current_thread() is threading.main_thread(), \
+                f"executor code called pyscript-interpreted {self._module.__name__}.{name}"
+            return target(*args, **kwargs)
+        return call
+
+
+def test_year_schedule_builds_maps_and_answers_daily_constants(hc_env, tmp_path, monkeypatch):
+    import solar_ephemeris
+
+    module, state = hc_env
+    prime_defaults(state)
+    monkeypatch.setattr(module, "_SCHEDULE_PATH", str(tmp_path / "schedule.bin"))
+    monkeypatch.setattr(module, "solar_ephemeris", _InterpretedOnly(solar_ephemeris))
+    today = datetime(2024, 1, 5, 3, 0)
+    module._now = lambda: today
+    state.set("zone.home", "0", {"latitude": 40.7128, "longitude": -74.0060})
+
+    asyncio.run(module._schedule_rebuild(today.date(), module._schedule_params()))
+
+    # the worker thread computed with its own native copy of the module
+    assert sys.modules[module._EPHEMERIS_NATIVE] is not solar_ephemeris
+    assert (tmp_path / "schedule.bin").stat().st_size == module._SCHEDULE_HEADER.size + 366 * 6 * 4
+    day = today.date() + timedelta(days=200)
+    row = module._schedule_row(day)
+    tz = datetime(day.year, day.month, day.day, 12).astimezone().tzinfo
+    sunset = solar_ephemeris.sun_events(day, 40.7128, -74.0060, tz)["sunset"].replace(tzinfo=None)
+    assert abs(row["evening_start"] - (sunset - timedelta(minutes=15))) < timedelta(seconds=1)
+    assert row["projected_commit"] >= max(row["day_ready"], row["day_min_start"])
+    assert module._schedule_row(today.date() + timedelta(days=366)) is None
+
+    # already refreshed from the table once the build finished
+    assert state.getattr("sensor.day_min_start")["source"] == "year_schedule"
+    assert module._cached_evening_start == module._schedule_row(today.date())["evening_start"]
+
+    # a restart maps the file (on a worker thread) instead of rebuilding it
+    module._schedule_attach(None)
+    map_threads, rebuilds = [], []
+    original_map = module._schedule_map
+    monkeypatch.setattr(module, "_schedule_map",
+                        lambda path: map_threads.append(threading.current_thread()) or original_map(path))
+
+    async def no_rebuild(*args):
+        rebuilds.append(args)
+
+    monkeypatch.setattr(module, "_schedule_rebuild", no_rebuild)
+
+    async def restart():
+        module._schedule_ensure()
+        await module._schedule_build_task
+
+    asyncio.run(restart())
+    assert rebuilds == [] and module._schedule["days"] == 366
+    assert map_threads and threading.main_thread() not in map_threads
+
+    # a mapped, current table needs no background task at all
+    created = []
+    module.task.create = lambda coro: created.append(coro) or coro.close()
+    module._schedule_ensure()
+    assert created == []
+    assert module.home_controller_schedule(days=3)["rows"][0]["date"] == "2024-01-05"
@@ -1,5 +1,5 @@
 import asyncio
-from datetime import datetime, time as dt_time
+from datetime import datetime, time as dt_time, timedelta
 import importlib.util
 from pathlib import Path
 import sys
@@ -106,12 +106,14 @@ class DummyTaskModule:
     def create(self, coro):
         self.created.append(coro)
         try:
-            asyncio.run(coro)
+            loop = asyncio.get_running_loop()
         except RuntimeError:
-            loop = asyncio.new_event_loop()
-            loop.run_until_complete(coro)
-            loop.close()
-        return DummyTaskHandle()
+            asyncio.run(coro)
+            return DummyTaskHandle()
+        return loop.create_task(coro)
+
+    async def executor(self, fn, *args, **kwargs):
+        return await asyncio.to_thread(fn, *args, **kwargs)
 
 
 class DummyLog:
@@ -142,6 +144,10 @@ class DummyLog:
 @pytest.fixture()
 def hc_env():
     sys.modules.pop("home_controller", None)
+    # pyscript puts <config>/pyscript/modules on the import path for scripts
+    modules_dir = str(Path(__file__).resolve().parents[1] / "modules")
+    if modules_dir not in sys.path:
+        sys.path.insert(0, modules_dir)
     spec = importlib.util.spec_from_file_location(
         "home_controller", Path(__file__).resolve().parents[1] / "home_controller.py"
     )
@@ -162,8 +168,11 @@ def hc_env():
     module.state_trigger = decorator
     module.event_trigger = decorator
     module.service_trigger = decorator
+    module.mqtt_trigger = decorator
+    module.pyscript_compile = lambda fn: fn
 
     spec.loader.exec_module(module)
+    module._EPHEMERIS_PATH = str(Path(modules_dir) / "solar_ephemeris.py")
 
     return module, dummy_state
 
@@ -184,6 +193,15 @@ def prime_defaults(state: DummyState):
     state.set("pyscript.home_state", "Day")
 
 
+def classify(module, entity_id: str):
+    """Run the async classifier to completion, including the ramp task it starts"""
+    async def run():
+        profile = await module._classify_kitchen_motion(entity_id)
+        await asyncio.sleep(0)
+        return profile
+    return asyncio.run(run())
+
+
 def test_day_off_classification_at_603(hc_env):
     module, state = hc_env
     prime_defaults(state)
@@ -209,7 +227,7 @@ def test_day_off_classification_at_603(hc_env):
     module._work_ramp_task = None
     module._nonwork_ramp_task = None
 
-    module._classify_kitchen_motion("binary_sensor.aqara_motion_sensor_p1_occupancy")
+    classify(module, "binary_sensor.aqara_motion_sensor_p1_occupancy")
 
     assert module._morning_motion_profile == "day_off"
     assert state.get("pyscript.home_state") == "Early Morning"
@@ -236,7 +254,7 @@ def test_work_prework_motion_holds_until_450(hc_env):
     module._work_ramp_task = None
     module._nonwork_ramp_task = None
 
-    module._classify_kitchen_motion("binary_sensor.kitchen_iris_frig_occupancy")
+    classify(module, "binary_sensor.kitchen_iris_frig_occupancy")
 
     assert module._morning_motion_profile == "work"
     assert state.get("sensor.pys_morning_ramp_profile") == "work"
@@ -334,3 +352,50 @@ def test_nonwork_ramp_resume_uses_progress_metadata(hc_env):
     assert first_temperature_attrs.get("ramp_type") == "nonwork"
     assert first_temperature_attrs.get("target") == module.NONWORK_RAMP_END_TEMP
     assert first_temperature_attrs.get("end_time") == commit_time.isoformat()
+
+
+def test_work_ramp_wakes_only_on_visible_steps(hc_env, monkeypatch):
+    module, state = hc_env
+    prime_defaults(state)
+
+    clock = {"now": datetime(2024, 1, 5, 4, 50)}
+    module._now = lambda: clock["now"]
+    sleeps = []
+
+    async def fake_sleep(seconds):
+        sleeps.append(seconds)
+        clock["now"] += timedelta(seconds=seconds)
+
+    monkeypatch.setattr(module, "_ramp_supervisor_sleep", fake_sleep)
+
+    brightness_values = []
+    write_times = []
+    original_set_sensor = module._set_sensor
+
+    def tracking_set_sensor(entity_id, value, attrs=None):
+        if entity_id == "sensor.sleep_in_ramp_brightness":
+            brightness_values.append(value)
+            write_times.append(clock["now"])
+        return original_set_sensor(entity_id, value, attrs)
+
+    module._set_sensor = tracking_set_sensor
+
+    start = clock["now"]
+
+    async def run_ramp():
+        await module._start_work_ramp(restore_from_time=clock["now"])
+        await module._ramp_supervisor_task
+
+    asyncio.run(run_ramp())
+
+    # each visible step lands just after the instant its rounded value flips, not on a poll
+    total = (datetime.combine(start.date(), module.WORK_RAMP_END_TIME) - start).total_seconds()
+    span = module.WORK_RAMP_END_BRIGHTNESS - module.WORK_RAMP_START_BRIGHTNESS
+    for value, at in list(zip(brightness_values, write_times))[1:-1]:
+        flip = start + timedelta(seconds=(value - 0.5 - module.WORK_RAMP_START_BRIGHTNESS) / span * total)
+        assert timedelta(0) <= at - flip < timedelta(seconds=1), (value, at, flip)
+    assert brightness_values == sorted(brightness_values)
+    stepped = brightness_values[:-1]  # last entry is the completion hold write
+    assert len(stepped) == len(set(stepped))
+    assert brightness_values[-1] == module.WORK_RAMP_END_BRIGHTNESS
+    assert state.get("sensor.sleep_in_ramp_kelvin") == module.WORK_RAMP_END_TEMP
@@ -0,0 +1,59 @@
+from datetime import datetime
+
+import pytest
+
+from hc_sim import HomeSimulator
+import motion_latency
+
+
+@pytest.fixture(autouse=True)
+def _fresh_window():
+    motion_latency.reset()
+    yield
+    motion_latency.reset()
+
+
+def test_percentiles_use_nearest_rank():
+    values = list(range(1, 101))
+    assert [motion_latency.percentile(values, p) for p in motion_latency.PERCENTILES] == [50, 95, 99]
+    assert motion_latency.percentile([], 50) is None
+
+
+def test_sample_splits_lag_decide_and_call():
+    received = datetime(2024, 1, 5, 7, 0, 0, 250000)
+    motion_latency.received("closet", "binary_sensor.closet_occupancy", "2024-01-05T07:00:00", received)
+    assert motion_latency.decided("closet")
+    sample = motion_latency.completed("closet")
+    assert sample["lag"] == 250.0
+    assert sample["total"] >= sample["lag"] + sample["decide"]
+    assert motion_latency.completed("closet") is None
+
+    # a gated trigger never reaches the service call and leaves no sample
+    motion_latency.received("closet", "binary_sensor.closet_occupancy", None, received)
+    motion_latency.drop("closet")
+    assert not motion_latency.decided("closet")
+    entity_id, value, attrs = motion_latency.sensor("closet")
+    assert (entity_id, attrs["count"], value) == ("sensor.motion_latency_closet", 1, attrs["total_p95_ms"])
+
+
+def test_kitchen_motion_publishes_latency_and_dumps_samples():
+    with HomeSimulator(datetime(2024, 1, 5, 18, 0),
+                       scripts=("motion_rooms.py", "motion_latency_report.py")) as sim:
+        sim.prime({"pyscript.home_state": "Evening", "input_select.home_state": "Evening"})
+        sim.run_until("18:00:01")
+        assert sim.state.getattr("sensor.motion_latency_kitchen")["count"] == 0
+
+        sim.at("18:01", sim.set, "binary_sensor.kitchen_iris_frig_occupancy", "on")
+        sim.at("18:02", sim.set, "binary_sensor.kitchen_iris_frig_occupancy", "off")
+        sim.at("18:05", sim.set, "binary_sensor.kitchen_iris_frig_occupancy", "on")
+        sim.run_until("18:10")
+
+        attrs = sim.state.getattr("sensor.motion_latency_kitchen")
+        assert attrs["count"] == 2 and attrs["unit_of_measurement"] == "ms"
+        assert sim.get("sensor.motion_latency_kitchen") == attrs["total_p95_ms"]
+
+        dump = sim.registry.services["pyscript.motion_latency_samples"](room="kitchen", reset=True)
+        rows = dump["rooms"]["kitchen"]
+        assert [row["entity_id"] for row in rows] == ["binary_sensor.kitchen_iris_frig_occupancy"] * 2
+        assert sim.state.getattr("sensor.motion_latency_kitchen")["count"] == 0
+        assert sim.failures == []
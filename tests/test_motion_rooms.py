@@ -0,0 +1,159 @@
+from datetime import datetime
+
+import pytest
+
+from hc_sim import HomeSimulator
+import motion_room
+
+KITCHEN_P1 = "binary_sensor.aqara_motion_sensor_p1_occupancy"
+KITCHEN_FRIG = "binary_sensor.kitchen_iris_frig_occupancy"
+BATH_MOTION = "binary_sensor.bathroom_iris_occupancy"
+BATH_DOOR = "binary_sensor.bathroom_contact_contact"
+
+
+def _lights(sim, service_name):
+    return [(at.strftime("%H:%M:%S"), data["entity_id"], data.get("brightness_pct"))
+            for at, domain, name, data in sim.commands if domain == "light" and name == service_name]
+
+
+def _sim(start, values):
+    sim = HomeSimulator(start, scripts=("motion_rooms.py",))
+    sim.prime(values)
+    return sim
+
+
+def test_every_sensor_routes_to_one_room_and_state_is_slotted():
+    assert {motion_room.room_for(eid) for eid in motion_room.sensors()} == set(motion_room.ROOMS)
+    assert motion_room.room_for(KITCHEN_FRIG) == "kitchen"
+    assert motion_room.doors() == [BATH_DOOR]
+    rs = motion_room.RoomState("hallway")
+    with pytest.raises(AttributeError):
+        rs.brightness = 10
+    assert motion_room.settings("bathroom")["clear_after"] == 30
+    assert motion_room.settings("kitchen")["clear_after"] == 5
+
+
+@pytest.mark.parametrize("room, mode, values, attrs, expected", [
+    ("closet", "Day", {}, {}, 4000),
+    ("closet", "Day", {"input_boolean.evening_mode_active": "on"}, {}, 2000),
+    ("closet", "Night", {"input_boolean.sleep_in_ramp_active": "on", "sensor.sleep_in_ramp_progress": "50"}, {}, 3000),
+    ("closet", "Day", {"input_boolean.all_rooms_use_pyscript": "on"},
+     {"pyscript.test_bedroom_brightness": {"temperature": 3300}}, 3300),
+    ("laundry", "Day", {}, {}, None),
+])
+def test_color_temperature(room, mode, values, attrs, expected):
+    assert motion_room.color_temperature(room, mode, values.get, lambda eid: attrs.get(eid, {})) == expected
+
+
+def test_kitchen_presets_night_hold_and_debounced_clear():
+    with _sim(datetime(2024, 1, 5, 3, 0), {"pyscript.home_state": "Night", "input_select.home_state": "Night",
+                                           KITCHEN_P1: "off", KITCHEN_FRIG: "off"}) as sim:
+        sim.at("03:00:10", sim.set, KITCHEN_P1, "on")
+        sim.at("03:00:20", sim.set, KITCHEN_P1, "off")
+        sim.at("04:50:00", sim.set, KITCHEN_FRIG, "on")
+        sim.at("04:50:01", sim.set, KITCHEN_P1, "on")
+        sim.at("04:50:02", sim.set, KITCHEN_FRIG, "off")
+        sim.at("04:50:03", sim.set, KITCHEN_P1, "off")
+        sim.at("04:50:05", sim.set, KITCHEN_P1, "on")
+        sim.at("04:50:06", sim.set, KITCHEN_P1, "off")
+        sim.run_until("05:00")
+
+        # 03:00 is inside the night hold: WLED presets only, mains untouched either way; from 04:50 the
+        # kitchen re-sends its target on every trigger while motion is active (no tolerance skip)
+        assert _lights(sim, "turn_on") == [(at, "light.kitchen_main_lights", 10)
+                                           for at in ("04:50:00", "04:50:01", "04:50:02", "04:50:05")]
+        selects = [(data["entity_id"], data["option"]) for _, domain, _, data in sim.commands if domain == "select"]
+        assert selects[:3] == [("select.sink_wled_preset", "night-100"), ("select.frig_strip_preset", "night-100"),
+                               ("select.frig_strip_preset", "night")]
+        # the 04:50:03 clear was superseded by motion at :05; only the final clear turns the mains off
+        offs = [(at, eid) for at, eid, _ in _lights(sim, "turn_off")]
+        assert offs == [("03:00:25", "light.sink_wled"), ("04:50:11", "light.sink_wled"),
+                        ("04:50:11", "light.kitchen_main_lights")]
+        assert sim.failures == []
+
+
+def test_bathroom_door_hold_and_grace():
+    with _sim(datetime(2024, 1, 5, 20, 0), {"input_select.home_state": "Evening", BATH_MOTION: "off",
+                                            BATH_DOOR: "on"}) as sim:
+        sim.at("20:00:05", sim.set, BATH_MOTION, "on")
+        sim.at("20:00:06", sim.set, "light.bathroom_2_main_lights", "on", {"brightness": 128})
+        sim.at("20:00:30", sim.set, BATH_DOOR, "off")
+        sim.at("20:01:00", sim.set, BATH_MOTION, "off")
+        sim.run_until("20:20")
+        assert _lights(sim, "turn_on") == [("20:00:05", "light.bathroom_2_main_lights", 50),
+                                           ("20:00:30", "light.bathroom_2_main_lights", 100)]
+        assert _lights(sim, "turn_off") == []
+        rooms = sim.modules[0]
+        assert rooms._rooms["bathroom"].hold and rooms._rooms["bathroom"].hold_task is not None
+
+        sim.run_until("20:32")
+        assert _lights(sim, "turn_off") == [("20:31:30", "light.bathroom_2_main_lights", None)]
+        assert not rooms._rooms["bathroom"].hold
+        assert sim.failures == []
+
+
+def test_hallway_override_status_sensors_and_away():
+    with _sim(datetime(2024, 1, 5, 12, 0), {"input_select.home_state": "Day",
+                                            "binary_sensor.hallway_iris_occupancy": "off"}) as sim:
+        sim.run_until("12:00:01")
+        assert sim.get("sensor.hallway_target_brightness") == 20
+        assert sim.get("sensor.hallway_als_status") == "🚪 Ready (Fallback Day)"
+        assert sim.state.getattr("sensor.hallway_als_status")["icon"] == "mdi:door"
+
+        writes = []
+        sim.observers.append(lambda eid, old, new: writes.append(eid) if eid.startswith("sensor.hallway") else None)
+        sim.run_until("12:05")
+        assert writes == []  # the minute refresh only writes when something moved
+
+        sim.call_service("pyscript.motion_room_override", room="hallway", enable=True)
+        sim.at("12:06", sim.set, "binary_sensor.hallway_iris_occupancy", "on")
+        sim.at("12:07", sim.set, "input_select.home_state", "Away")
+        sim.run_until("12:08")
+        assert _lights(sim, "turn_on") == [("12:06:00", "light.hallway", 100)]
+        assert ("12:07:00", "light.hallway", None) in _lights(sim, "turn_off")
+        assert sim.get("sensor.hallway_als_status") == "🚪 Away Mode"
+        status = sim.modules[0].motion_room_status(room="hallway")["hallway"]
+        assert (status["override"], status["target"], status["source"]) == (True, 100, "Manual Override")
+        assert sim.failures == []
+
+
+def test_per_room_defaults_match_the_old_controllers():
+    assert motion_room.settings("kitchen")["tolerance"] is None
+    assert motion_room.already_at("kitchen", "on", {"brightness": 26}, 10, None) is False
+    assert motion_room.already_at("laundry", "on", {"brightness": 26}, 10, None) is True
+    assert [room for room in motion_room.ROOMS if motion_room.settings(room)["cache"]] == [
+        "closet", "laundry", "hallway"]
+
+    with _sim(datetime(2024, 1, 5, 20, 0), {"input_select.home_state": "Evening", KITCHEN_P1: "on",
+                                            "light.kitchen_main_lights": "on", "light.laundry_room": "on"}) as sim:
+        sim.at("20:00:05", sim.set, "input_select.home_state", "Away")
+        sim.run_until("20:00:10")
+        offs = [eid for _, eid, _ in _lights(sim, "turn_off")]
+        # Away only shuts the kitchen strips; the other rooms' mains go off as before
+        assert "light.kitchen_main_lights" not in offs
+        assert ["light.sink_wled", "light.frig_strip"] in offs and "light.laundry_room" in offs
+        assert sim.failures == []
+
+
+def test_old_service_names_wrap_the_motion_room_services():
+    with _sim(datetime(2024, 1, 5, 20, 0), {"input_select.home_state": "Evening"}) as sim:
+        for name in ("bathroom_simulate", "bathroom_debug_toggle", "bathroom_force", "bathroom_debug_status",
+                     "hallway_override_on", "hallway_override_off", "hallway_force", "hallway_smoke_test",
+                     "kitchen_wled_force", "kitchen_wled_smoke_test", "kitchen_debug_status", "closet_force",
+                     "closet_smoke_test", "closet_debug_status", "laundry_force", "laundry_smoke_test",
+                     "laundry_debug_status"):
+            assert f"pyscript.{name}" in sim.registry.services, name
+
+        sim.call_service("pyscript.hallway_override_on")
+        sim.call_service("pyscript.closet_smoke_test")
+        sim.call_service("pyscript.kitchen_wled_force", mode="active")
+        sim.run_until("20:00:05")
+        rooms = sim.modules[0]
+        assert rooms._rooms["hallway"].override
+        ons = [(data["entity_id"], data.get("brightness_pct"), data.get("color_temp_kelvin"))
+               for _, domain, name, data in sim.commands if domain == "light" and name == "turn_on"]
+        assert ("light.closet", 50, 3000) in ons and "light.kitchen_main_lights" in [eid for eid, *_ in ons]
+        assert ("light.closet", None) in [(eid, pct) for _, eid, pct in _lights(sim, "turn_off")]
+        assert rooms.bathroom_debug_status()["bathroom"]["sensors"] == {BATH_MOTION: None}
+        assert sim.failures == []
+
@@ -0,0 +1,101 @@
+from datetime import datetime, timedelta, timezone
+import json
+import sqlite3
+import time
+
+import pytest
+
+from hc_replay import first_divergence, iter_recorder_states, replay
+
+DAY = datetime(2024, 1, 5)
+
+
+def _rows():
+    rows = [("sun.sun", "below_horizon", DAY.replace(hour=0, minute=5), {"elevation": -40.0})]
+    for minutes in range(7 * 60, 17 * 60 + 1, 30):
+        when = DAY + timedelta(minutes=minutes)
+        rows.append(("sun.sun", "above_horizon", when, {"elevation": 10.0 + (minutes % 90) / 10}))
+    rows += [
+        ("sun.sun", "below_horizon", DAY.replace(hour=17, minute=10), {"elevation": -1.0}),
+        ("binary_sensor.kitchen_iris_frig_occupancy", "on", DAY.replace(hour=4, minute=52), {}),
+        ("binary_sensor.kitchen_iris_frig_occupancy", "off", DAY.replace(hour=4, minute=55), {}),
+        ("device_tracker.iphone15", "not_home", DAY.replace(hour=6, minute=30), {"source_type": "gps"}),
+        ("device_tracker.iphone15", "home", DAY.replace(hour=17, minute=30), {"source_type": "gps"}),
+        ("media_player.bedroom", "on", DAY.replace(hour=23, minute=25), {}),
+        ("light.not_replayed", "on", DAY.replace(hour=12), {}),
+    ]
+    return rows
+
+
+def _recorder(path, modern: bool, rows=None):
+    rows = rows if rows is not None else _rows()
+    conn = sqlite3.connect(path)
+    if modern:
+        conn.executescript(
+            "CREATE TABLE states_meta (metadata_id INTEGER PRIMARY KEY, entity_id TEXT);"
+            "CREATE TABLE state_attributes (attributes_id INTEGER PRIMARY KEY, shared_attrs TEXT);"
+            "CREATE TABLE states (state_id INTEGER PRIMARY KEY, state TEXT, last_updated_ts REAL,"
+            " metadata_id INTEGER, attributes_id INTEGER);")
+        meta = {}
+        for entity_id, value, when, attrs in sorted(rows, key=lambda row: row[0]):
+            if entity_id not in meta:
+                meta[entity_id] = conn.execute("INSERT INTO states_meta (entity_id) VALUES (?)",
+                                               (entity_id,)).lastrowid
+            attrs_id = conn.execute("INSERT INTO state_attributes (shared_attrs) VALUES (?)",
+                                    (json.dumps(attrs),)).lastrowid
+            conn.execute("INSERT INTO states (state, last_updated_ts, metadata_id, attributes_id) VALUES (?, ?, ?, ?)",
+                         (value, when.replace(tzinfo=timezone.utc).timestamp(), meta[entity_id], attrs_id))
+    else:
+        conn.execute("CREATE TABLE states (state_id INTEGER PRIMARY KEY, entity_id TEXT, state TEXT,"
+                     " attributes TEXT, last_updated DATETIME)")
+        for entity_id, value, when, attrs in sorted(rows, key=lambda row: row[0]):
+            conn.execute("INSERT INTO states (entity_id, state, attributes, last_updated) VALUES (?, ?, ?, ?)",
+                         (entity_id, value, json.dumps(attrs), when.isoformat(sep=" ")))
+    conn.commit()
+    conn.close()
+    return path
+
+
+@pytest.mark.parametrize("modern", [True, False])
+def test_recorder_rows_stream_in_time_order(tmp_path, modern):
+    db = _recorder(tmp_path / "home-assistant_v2.db", modern)
+    rows = list(iter_recorder_states(db, DAY, DAY + timedelta(days=1), tz=timezone.utc))
+    assert [when for when, *_rest in rows] == sorted(when for when, *_rest in rows)
+    assert len(rows) == len(_rows()) - 1
+    assert rows[0] == (DAY.replace(hour=0, minute=5), "sun.sun", "below_horizon", {"elevation": -40.0})
+
+
+@pytest.fixture
+def new_york_local(monkeypatch):
+    if not hasattr(time, "tzset"):
+        pytest.skip("needs time.tzset")
+    monkeypatch.setenv("TZ", "America/New_York")
+    time.tzset()
+    yield
+    monkeypatch.undo()
+    time.tzset()
+
+
+def test_default_zone_follows_dst_across_the_window(tmp_path, new_york_local):
+    # UTC rows either side of the 2024-03-10 spring-forward (02:00 EST -> 03:00 EDT)
+    rows = [("sun.sun", "below_horizon", datetime(2024, 3, 10, 6, 30), {}),
+            ("sun.sun", "above_horizon", datetime(2024, 3, 10, 12, 0), {})]
+    db = _recorder(tmp_path / "home-assistant_v2.db", modern=True, rows=rows)
+    found = [when for when, *_rest in iter_recorder_states(db, datetime(2024, 3, 10), datetime(2024, 3, 10, 8, 5))]
+    assert found == [datetime(2024, 3, 10, 1, 30), datetime(2024, 3, 10, 8, 0)]
+
+
+def test_replay_writes_timeline_commands_and_timings(tmp_path):
+    db = _recorder(tmp_path / "home-assistant_v2.db", modern=True)
+    result = replay(db, DAY, DAY + timedelta(days=1), tz=timezone.utc)
+    assert result.failures == []
+    modes = [new for _when, _old, new in result.modes]
+    assert modes[:2] == ["Early Morning", "Away"]
+    assert modes[-1] == "Night"
+    assert len(result.events) == len(_rows()) - 1
+    assert ("input_select", "select_option") in {(domain, name) for _when, domain, name, _data in result.commands}
+
+    result.write(tmp_path / "out")
+    assert sorted(p.name for p in (tmp_path / "out").iterdir()) == [
+        "home_controller_commands.csv", "home_controller_events.csv", "home_controller_modes.csv"]
+    assert first_divergence(result, replay(db, DAY, DAY + timedelta(days=1), tz=timezone.utc, label="b")) is None
@@ -0,0 +1,80 @@
+from datetime import datetime
+
+import pytest
+
+from hc_sim import HomeSimulator
+import room_brightness
+
+TARGETS = room_brightness.TARGETS_ENTITY
+
+
+def _resolve(room, values, attrs=None):
+    return room_brightness.resolve(room, values.get, lambda eid: (attrs or {}).get(eid, {}))
+
+
+@pytest.mark.parametrize("room, values, attrs, expected", [
+    ("kitchen", {"pyscript.home_state": "Early Morning"}, None, (35, "Fallback Early Morning")),
+    ("kitchen", {"input_select.home_state": "Night"}, None, (10, "Fallback Night")),
+    ("bathroom", {"input_select.home_state": "Night", "input_boolean.sleep_in_ramp_active": "on",
+                  "sensor.sleep_in_ramp_brightness": "37.6"}, None, (37, "Morning Ramp")),
+    ("laundry", {"input_select.home_state": "Night", "input_boolean.all_rooms_use_pyscript": "on",
+                 "pyscript.test_laundry_brightness": "90"}, None, (1, "Night Mode Lock")),
+    ("closet", {"input_select.home_state": "Night", "input_boolean.bedroom_adaptive_override": "on",
+                "input_number.bedroom_override_brightness": "80.0"}, None, (80, "Manual Override")),
+    ("closet", {"input_select.home_state": "Day", "input_boolean.adaptive_learning_enabled": "on",
+                "sensor.learned_brightness_bedroom": "45", "input_boolean.all_rooms_use_pyscript": "on",
+                "pyscript.test_bedroom_brightness": "55"},
+     {"sensor.learned_brightness_bedroom": {"using_learned": True}}, (55, "PyScript Engine")),
+    ("hallway", {"input_select.home_state": "Day", "input_boolean.adaptive_learning_enabled": "on",
+                 "sensor.learned_brightness_hallway": "45"},
+     {"sensor.learned_brightness_hallway": {"using_learned": False}}, (20, "Fallback Day")),
+    ("hallway", {"input_select.home_state": "Away"}, None, (15, "Fallback Default")),
+])
+def test_stack_priorities_per_room(room, values, attrs, expected):
+    assert _resolve(room, values, attrs) == expected
+
+
+def test_unusable_source_falls_through_to_next_step():
+    values = {"input_select.home_state": "Day", "input_boolean.all_rooms_use_pyscript": "on",
+              "pyscript.test_bathroom_brightness": "n/a", "input_boolean.intelligent_lighting_enable": "on",
+              "sensor.intelligent_brightness_bathroom": "64"}
+    assert _resolve("bathroom", values) == (64, "Intelligent System")
+    assert room_brightness.rooms_for("sensor.learned_brightness_laundry.using_learned") == ["laundry"]
+    assert set(room_brightness.rooms_for("input_boolean.sleep_in_ramp_active")) == set(room_brightness.ROOMS)
+
+
+def test_resolver_updates_only_on_inputs_and_rooms_read_one_entity(monkeypatch):
+    with HomeSimulator(datetime(2024, 1, 5, 18, 0),
+                       scripts=("room_brightness_resolver.py", "motion_rooms.py")) as sim:
+        sim.prime({"input_select.home_state": "Evening", "pyscript.home_state": "Evening",
+                   "input_boolean.adaptive_learning_enabled": "on", "sensor.learned_brightness_bathroom": "42"},
+                  {"sensor.learned_brightness_bathroom": {"using_learned": False}})
+        writes = []
+        sim.observers.append(lambda eid, old, new: writes.append(new) if eid == TARGETS else None)
+        sim.run_until("18:01")
+        targets = sim.state.getattr(TARGETS)
+        assert (targets["bathroom"], targets["bathroom_source"]) == (50, "Fallback Evening")
+        assert (targets["kitchen"], targets["hallway"]) == (60, 15)
+
+        before = dict(sim.state.getattr(TARGETS))
+        sim.set("sensor.learned_brightness_bathroom", "42", {"using_learned": True})
+        sim.settle()
+        targets = sim.state.getattr(TARGETS)
+        assert (targets["bathroom"], targets["bathroom_source"]) == (42, "Adaptive Learning")
+        assert targets["reason"] == "sensor.learned_brightness_bathroom.using_learned"
+        assert {room: targets[room] for room in room_brightness.ROOMS if room != "bathroom"} == \
+            {room: before[room] for room in room_brightness.ROOMS if room != "bathroom"}
+
+        published = len(writes)
+        sim.set("pyscript.test_bathroom_brightness", "77")  # pyscript step is off: no republish
+        sim.settle()
+        assert len(writes) == published == 2
+
+        rooms = sim.modules[1]
+        reads = []
+        real_get, real_getattr = sim.state.get, sim.state.getattr
+        monkeypatch.setattr(sim.state, "get", lambda *a, **k: reads.append(a[0]) or real_get(*a, **k))
+        monkeypatch.setattr(sim.state, "getattr", lambda *a, **k: reads.append(a[0]) or real_getattr(*a, **k))
+        assert rooms._target("bathroom") == (42, "Adaptive Learning")
+        assert reads == [TARGETS]
+        assert sim.failures == []
@@ -0,0 +1,103 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from hc_sim import HomeSimulator, next_cron_time
+
+DAY = datetime(2024, 1, 5)
+KITCHEN_MOTION = "binary_sensor.kitchen_iris_frig_occupancy"
+HOUSE = {
+    "device_tracker.iphone15": "home",
+    "device_tracker.work_iphone": "home",
+    "input_select.home_state": "Night",
+    "pyscript.home_state": "Night",
+    "input_boolean.sleep_in_ramp_system_enable": "on",
+    "input_datetime.day_earliest_time": "07:30:00",
+    "media_player.bedroom": "off",
+    "media_player.apple_tv_4k_livingroom": "off",
+    "light.lamp_1": "off",
+    "light.lamp_2": "off",
+    "light.closet": "off",
+}
+
+
+def _scripted_day(profile: str, sunset_hm: tuple[int, int], away_mid_ramp: bool) -> HomeSimulator:
+    sim = HomeSimulator(DAY)
+    sim.prime(HOUSE)
+    sim.sun_profile(DAY.replace(hour=7, minute=10), DAY.replace(hour=sunset_hm[0], minute=sunset_hm[1]))
+    sim.at("04:52" if profile == "work" else "07:00", sim.set, KITCHEN_MOTION, "on")
+    if away_mid_ramp:
+        sim.at("05:20" if profile == "work" else "07:20", sim.set, "device_tracker.work_iphone", "not_home")
+        sim.at("12:00", sim.set, "device_tracker.work_iphone", "home")
+    sim.at("19:30", sim.set, "light.lamp_1", "on", {"brightness": 200})
+    sim.at("22:45", sim.set, "media_player.apple_tv_4k_livingroom", "playing")
+    sim.at("23:20", sim.set, "media_player.apple_tv_4k_livingroom", "off")
+    sim.at("23:25", sim.set, "media_player.bedroom", "on")
+    return sim
+
+
+def test_cron_expressions():
+    after = datetime(2024, 1, 5, 23, 59, 30)
+    assert next_cron_time("* * * * *", after) == datetime(2024, 1, 6, 0, 0)
+    assert next_cron_time("*/15 * * * *", datetime(2024, 1, 5, 10, 7)) == datetime(2024, 1, 5, 10, 15)
+    assert next_cron_time("50 19 * * *", datetime(2024, 1, 5, 19, 50)) == datetime(2024, 1, 6, 19, 50)
+    assert next_cron_time("0 6 * * 1-5", datetime(2024, 1, 5, 7, 0)) == datetime(2024, 1, 8, 6, 0)
+
+
+def test_workday_replays_through_triggers_and_timers():
+    with _scripted_day("work", (17, 5), away_mid_ramp=False) as sim:
+        sim.run_until("05:00")
+        assert sim.get("pyscript.home_state") == "Early Morning"
+        assert sim.get("sensor.pys_morning_ramp_profile") == "work"
+
+        sim.run_until("05:41")
+        assert sim.get("sensor.sleep_in_ramp_brightness") == 50
+        assert sim.get("sensor.sleep_in_ramp_kelvin") == 4000
+
+        sim.at("06:30", sim.set, "device_tracker.iphone15", "not_home")
+        sim.at("17:30", sim.set, "device_tracker.iphone15", "home")
+        sim.run_until("07:00")
+        assert sim.get("pyscript.home_state") == "Away"
+        sim.run_until("17:31")
+        assert sim.get("pyscript.home_state") == "Evening"
+        sim.run_until("23:30")
+        assert sim.get("pyscript.home_state") == "Night"
+        assert sim.errors == []
+
+
+def test_day_off_ramp_hands_over_to_day_at_commit_time():
+    with _scripted_day("day_off", (17, 5), away_mid_ramp=False) as sim:
+        sim.run_until("07:39")
+        assert sim.get("pyscript.home_state") == "Early Morning"
+        sim.run_until("07:41")
+        assert sim.get("pyscript.home_state") == "Day"
+        assert sim.get("sensor.pys_em_end_reason") == "nonwork_ramp_complete"
+        assert sim.errors == []
+
+
+@pytest.mark.parametrize("profile", ["work", "day_off"])
+@pytest.mark.parametrize("sunset_hm", [(16, 30), (17, 5), (20, 45)])
+@pytest.mark.parametrize("away_mid_ramp", [False, True])
+def test_day_scenarios_sweep(profile, sunset_hm, away_mid_ramp):
+    with _scripted_day(profile, sunset_hm, away_mid_ramp) as sim:
+        sim.run_until(DAY.replace(day=6))
+        assert sim.get("pyscript.home_state") == "Night"
+        assert sim.get("sensor.night_started_on") == DAY.date().isoformat()
+        assert sim.errors == []
+
+
+def test_day_ready_flips_at_predicted_crossing_without_sun_updates():
+    with HomeSimulator(DAY) as sim:
+        sim.prime({**HOUSE, "zone.home": "0", "input_datetime.day_earliest_time": "07:00:00",
+                   "pyscript.sunrise_today": DAY.replace(hour=8, minute=6).isoformat(),
+                   "pyscript.sunset_today": DAY.replace(hour=16, minute=10).isoformat()},
+                  {"zone.home": {"latitude": 51.48, "longitude": 0.0}})
+        sim.run_until("06:00")
+        on_at, _off_at = sim.controller._day_ready_window(sim.now())
+        sim.run_until(on_at - timedelta(seconds=1))
+        assert sim.get("binary_sensor.day_ready_now") == "off"
+        assert sim.get("sensor.pys_next_transition") == on_at.isoformat()
+        sim.run_until(on_at + timedelta(seconds=1))
+        assert sim.get("binary_sensor.day_ready_now") == "on"
+        assert sim.get("pyscript.home_state") == "Day"
+        assert sim.errors == []
@@ -0,0 +1,64 @@
+from datetime import date, datetime, timedelta
+from zoneinfo import ZoneInfo
+
+import pytest
+
+from hc_sim import HomeSimulator
+import solar_ephemeris
+
+LONDON = (51.5074, -0.1278, ZoneInfo("Europe/London"))
+NEW_YORK = (40.7128, -74.0060, ZoneInfo("America/New_York"))
+
+
+@pytest.mark.parametrize("where, day, sunrise, sunset", [
+    (LONDON, date(2024, 6, 21), (4, 43), (21, 21)),
+    (LONDON, date(2024, 12, 21), (8, 4), (15, 53)),
+    (NEW_YORK, date(2024, 1, 5), (7, 20), (16, 42)),
+])
+def test_sun_events_match_published_tables(where, day, sunrise, sunset):
+    lat, lon, tz = where
+    events = solar_ephemeris.sun_events(day, lat, lon, tz)
+    for key, (hour, minute) in (("sunrise", sunrise), ("sunset", sunset)):
+        expected = datetime(day.year, day.month, day.day, hour, minute, tzinfo=tz)
+        assert abs(events[key] - expected) < timedelta(minutes=1)
+    assert abs(solar_ephemeris.solar_elevation(events["sunset"], lat, lon, refraction=False) + 0.833) < 0.05
+
+
+@pytest.mark.parametrize("lat, lon, zone", [
+    (1.87, -157.4, "Pacific/Kiritimati"),   # UTC+14
+    (-21.2, -175.2, "Pacific/Tongatapu"),   # UTC+13
+    (0.2, -176.5, "Etc/GMT+12"),            # UTC-12
+    (-43.9, 170.0, "Etc/GMT-14"),           # offset and longitude a day apart
+])
+def test_sun_events_stay_on_the_local_day_at_extreme_offsets(lat, lon, zone):
+    tz, day = ZoneInfo(zone), date(2024, 3, 1)
+    events = solar_ephemeris.sun_events(day, lat, lon, tz)
+    for key in ("sunrise", "solar_noon", "sunset"):
+        assert events[key].date() == day, key
+    assert events["sunrise"] < events["solar_noon"] < events["sunset"]
+    assert abs(solar_ephemeris.solar_elevation(events["sunrise"], lat, lon, refraction=False) + 0.833) < 0.05
+
+
+def test_elevation_crossing_and_polar_day():
+    lat, lon, tz = NEW_YORK
+    crossing = solar_ephemeris.elevation_crossing(date(2024, 1, 5), lat, lon, tz, 10.0)
+    assert abs(solar_ephemeris.solar_elevation(crossing, lat, lon) - 10.0) < 0.01
+    assert solar_ephemeris.elevation_crossing(date(2024, 1, 5), lat, lon, tz, 40.0) is None
+    svalbard = solar_ephemeris.sun_events(date(2024, 6, 21), 78.2, 15.6, ZoneInfo("Arctic/Longyearbyen"))
+    assert svalbard["sunrise"] is None and svalbard["sunset"] is None
+
+
+def test_day_schedule_publishes_once_and_ignores_sun_churn():
+    lat, lon, tz = NEW_YORK
+    with HomeSimulator(datetime(2024, 1, 5), scripts=("day_schedule(1).py",)) as sim:
+        sim.controller._now_local = lambda: datetime(2024, 1, 5, 3, 0, tzinfo=tz)
+        sim.prime({"zone.home": "0"}, {"zone.home": {"latitude": lat, "longitude": lon}})
+        sim.run_until("00:02")
+        writes = sim.state.writes
+        assert sim.get("pyscript.sunset_today").startswith("2024-01-05T16:42")
+        for minute in range(0, 60, 5):
+            sim.at(f"10:{minute:02d}", sim.set, "sun.sun", "above_horizon", {"elevation": 20 + minute / 10})
+        sim.run_until("11:00")
+        assert sim.state.writes - writes == 12  # only the sun.sun writes themselves
+        assert sim.registry.services["pyscript.solar_elevation"](when="2024-01-05T12:01:17-05:00")["elevation"] \
+            == pytest.approx(26.7, abs=0.1)